@@ -0,0 +1,84 @@
+from database.mongodb import USERS
+from database.async_repository import get_async_repository
+from auth.auth_service import LOGIN_PROJECTION, session_claims, user_from_document
+from auth.session_token import issue_token
+from auth.password_hasher import get_password_hasher_async
+from datetime import datetime
+
+
+class AsyncAuthService:
+    """Asyncio counterpart of AuthService"""
+    _instance = None
+    
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = AsyncAuthService()
+        return cls._instance
+
+    def __init__(self, repository=None, hasher=None):
+        self._repository = repository
+        self._hasher = hasher
+
+    @property
+    def repository(self):
+        """Injected repository, or the one of the active backend"""
+        return self._repository or get_async_repository(USERS)
+
+    async def get_hasher(self):
+        """Injected hasher, or the process-wide one, calibrated without blocking the loop"""
+        return self._hasher or await get_password_hasher_async()
+    
+    async def register_user(self, user):
+        if await self.repository.find_one({"email": user.getEmail()}):
+            return "User already exists!"
+        hasher = await self.get_hasher()
+        result = await self.repository.insert_one({
+            "name": user.getName(),
+            "email": user.getEmail(),
+            "password": await hasher.hash_async(user.getPassword()),
+            "user_type": user.getUserType(),
+            "created_at": datetime.now()
+        })
+        user.setId(str(result.inserted_id))
+        
+        return f"User {user.getName()} registered successfully as {user.getUserType()}."
+    
+    async def _authenticate(self, email, password):
+        """The user document if the password matches, else None; see AuthService"""
+        hasher = await self.get_hasher()
+        user = await self.repository.find_one({"email": email}, LOGIN_PROJECTION)
+        if not user:
+            await hasher.verify_async(password or "", await hasher.dummy_hash_async())
+            return None
+        valid, needs_rehash = await hasher.verify_async(password or "", user.get("password"))
+        if not valid:
+            return None
+        if needs_rehash:
+            await self.repository.update_one(
+                {"_id": user["_id"], "password": user["password"]},
+                {"$set": {"password": await hasher.hash_async(password)}}
+            )
+        return user
+    
+    async def login_user(self, user):
+        if await self._authenticate(user.getEmail(), user.getPassword()):
+            return True, f"User {user.getName()} logged in successfully."
+        return False, "Invalid credentials!"
+    
+    async def get_user(self, email, password):
+        user = await self._authenticate(email, password)
+        if user:
+            return user_from_document(user), "User found!"
+        return None, "User not found!"
+
+    async def login(self, email, password):
+        """(token, user, message); see AuthService.login.
+
+        Tokens resolve with AuthService.user_from_token, which needs no I/O.
+        """
+        user = await self._authenticate(email, password)
+        if not user:
+            return None, None, "Invalid credentials!"
+        user_obj = user_from_document(user)
+        return issue_token(session_claims(user_obj)), user_obj, f"User {user_obj.getName()} logged in successfully."
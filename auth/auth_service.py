@@ -1,6 +1,41 @@
-from database.mongodb import users_collection
+from database.mongodb import USERS
+from database.repository import get_repository
 from auth.user_factory import UserFactory
+from auth.password_hasher import get_password_hasher
+from auth.session_token import issue_token, read_token
+from database.cache import LRUTTLCache
 from users.user_type import UserType
+from datetime import datetime
+import os
+import time
+
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "1024"))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "300"))
+
+# Everything login needs, so it reads each user document once
+LOGIN_PROJECTION = {"name": 1, "email": 1, "password": 1, "user_type": 1}
+
+
+def user_from_document(user):
+    """Build a User from a stored document; shared by the sync and async services.
+
+    The password hash stays in the database: the User carries no password.
+    """
+    user_obj = UserFactory.create_user(user["user_type"],user["name"],user["email"],None)
+    user_obj.setId(str(user["_id"]))
+    return user_obj
+
+
+def session_claims(user):
+    """Token claims identifying a signed-in User"""
+    return {"sub": user.getId(), "name": user.getName(), "email": user.getEmail(), "type": user.getUserType()}
+
+
+def user_from_claims(claims):
+    """Rebuild the User a session token was issued for"""
+    return user_from_document({"_id": claims["sub"], "name": claims["name"],
+                               "email": claims["email"], "user_type": claims["type"]})
+
 
 class AuthService:
     _instance = None
@@ -10,33 +45,99 @@ class AuthService:
         if cls._instance is None:
             cls._instance = AuthService()
         return cls._instance   
+
+    def __init__(self, repository=None, hasher=None, session_cache=None):
+        self._repository = repository
+        self._hasher = hasher
+        # token -> (User, expiry), so reruns skip decoding and building the user
+        self._sessions = session_cache if session_cache is not None else LRUTTLCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL)
+
+    @property
+    def repository(self):
+        """Injected repository, or the one of the active backend"""
+        return self._repository or get_repository(USERS)
+
+    @property
+    def hasher(self):
+        return self._hasher or get_password_hasher()
     
     def register_user(self,user):
-        if users_collection.find_one({
+        if self.repository.find_one({
             "email":user.getEmail()
         }):
             return "User already exists!"
-        users_collection.insert_one({
+        result = self.repository.insert_one({
             "name":user.getName(),
             "email":user.getEmail(),
-            "password":user.getPassword(),
-            "user_type":user.getUserType()
+            "password":self.hasher.hash(user.getPassword()),
+            "user_type":user.getUserType(),
+            "created_at":datetime.now()
         }) 
+        user.setId(str(result.inserted_id))
         
         return f"User {user.getName()} registered successfully as {user.getUserType()}."
     
+    def _authenticate(self,email,password):
+        """The user document if the password matches, else None"""
+        user = self.repository.find_one({"email":email},LOGIN_PROJECTION)
+        if not user:
+            # As slow as a real check, so timing does not reveal registered emails
+            self.hasher.verify(password or "",self.hasher.dummy_hash())
+            return None
+        valid,needs_rehash = self.hasher.verify(password or "",user.get("password"))
+        if not valid:
+            return None
+        if needs_rehash:
+            # Legacy plaintext or an outdated cost; the filter skips it if it changed meanwhile
+            self.repository.update_one(
+                {"_id":user["_id"],"password":user["password"]},
+                {"$set":{"password":self.hasher.hash(password)}}
+            )
+        return user
+    
     def login_user(self,user):
-        if users_collection.find_one({
-            "email":user.getEmail(),
-            "password":user.getPassword()
-        }):
+        if self._authenticate(user.getEmail(),user.getPassword()):
             return True,f"User {user.getName()} logged in successfully." 
         return False,"Invalid credentials!"
     
     def get_user(self,email,password):
-        user = users_collection.find_one({"email":email , "password":password})
+        user = self._authenticate(email,password)
         if user:
-            return UserFactory.create_user(user["user_type"],user["name"],user["email"],user["password"]),"User found!"
+            return user_from_document(user),"User found!"
         return None,"User not found!"
-        
-        
\ No newline at end of file
+
+    def login(self,email,password):
+        """(token, user, message): authenticate with one query and start a session.
+
+        The token is signed and expires after SESSION_TTL seconds; pass it
+        to user_from_token() to get the User back on later requests.
+        """
+        user = self._authenticate(email,password)
+        if not user:
+            return None,None,"Invalid credentials!"
+        user_obj = user_from_document(user)
+        token = issue_token(session_claims(user_obj))
+        self._sessions.set(token,(user_obj,read_token(token)["exp"]))
+        return token,user_obj,f"User {user_obj.getName()} logged in successfully."
+
+    def user_from_token(self,token):
+        """The User of a valid session token, else None; never reads the database"""
+        if not token:
+            return None
+        cached = self._sessions.get(token)
+        if cached is not None:
+            user_obj,expires_at = cached
+            if expires_at > time.time():
+                return user_obj
+            self._sessions.invalidate(token)
+            return None
+        claims = read_token(token)
+        if not claims:
+            return None
+        user_obj = user_from_claims(claims)
+        self._sessions.set(token,(user_obj,claims["exp"]))
+        return user_obj
+
+    def logout(self,token):
+        """Forget a session in this process; the token itself stays valid until it expires"""
+        self._sessions.invalidate(token)
@@ -0,0 +1,140 @@
+# auth/password_hasher.py
+"""Salted scrypt password hashes.
+
+Stored hashes look like "scrypt$<n>$<r>$<p>$<salt>$<hash>", with salt and
+hash in base64, so each record carries the cost it was made with and
+can be verified after the cost changes. Anything else in the password
+field is a legacy plaintext password; verify() still accepts it and
+reports that the record needs rehashing.
+
+The cost n is calibrated once per process so a hash takes about
+PASSWORD_HASH_TARGET_MS, unless PASSWORD_SCRYPT_N pins it. Hashing runs in
+a small shared thread pool (hashlib.scrypt releases the GIL): at most
+PASSWORD_HASH_WORKERS hashes run at once, which bounds the CPU and the
+128 * r * n bytes of memory each one takes, and asyncio callers await the
+pool instead of blocking their event loop.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEME = "scrypt"
+PASSWORD_HASH_TARGET_MS = float(os.getenv("PASSWORD_HASH_TARGET_MS", "100"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", "0"))
+
+# Never calibrate below 2**14, the long-standing interactive-login minimum
+MIN_N = 2 ** 14
+MAX_N = 2 ** 20
+BLOCK_SIZE = 8
+PARALLELISM = 1
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * r * n, dklen=KEY_BYTES)
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def calibrate(target_ms=PASSWORD_HASH_TARGET_MS, r=BLOCK_SIZE, p=PARALLELISM):
+    """Largest power-of-two n whose hash should take at most target_ms"""
+    started = time.perf_counter()
+    _scrypt("calibration", b"\0" * SALT_BYTES, MIN_N, r, p)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    n = MIN_N
+    # scrypt time grows linearly with n
+    while n < MAX_N and elapsed_ms * 2 <= target_ms:
+        n *= 2
+        elapsed_ms *= 2
+    return n
+
+
+class PasswordHasher:
+    def __init__(self, n=None, r=BLOCK_SIZE, p=PARALLELISM, max_workers=PASSWORD_HASH_WORKERS):
+        self.n = n or calibrate(r=r, p=p)
+        self.r = r
+        self.p = p
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        # Computed on the pool right away, so no caller ever waits on its own thread
+        self._dummy = self._pool.submit(self._hash, secrets.token_urlsafe(16))
+
+    def dummy_hash(self):
+        """A hash at the current cost to verify against for unknown emails.
+
+        Answering those as slowly as real ones keeps login timing from
+        revealing which emails are registered.
+        """
+        return self._dummy.result()
+
+    async def dummy_hash_async(self):
+        return await asyncio.wrap_future(self._dummy)
+
+    def _hash(self, password):
+        salt = secrets.token_bytes(SALT_BYTES)
+        key = _scrypt(password, salt, self.n, self.r, self.p)
+        return f"{SCHEME}${self.n}${self.r}${self.p}${_b64(salt)}${_b64(key)}"
+
+    def _verify(self, password, stored):
+        if not stored:
+            return False, False
+        if not stored.startswith(f"{SCHEME}$"):
+            # Legacy plaintext record
+            return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8")), True
+        try:
+            _, n, r, p, salt, key = stored.split("$")
+            n, r, p = int(n), int(r), int(p)
+            expected = base64.b64decode(salt), base64.b64decode(key)
+        except ValueError:
+            return False, False
+        valid = hmac.compare_digest(_scrypt(password, expected[0], n, r, p), expected[1])
+        return valid, valid and (n, r, p) != (self.n, self.r, self.p)
+
+    def hash(self, password):
+        """Hash of a new password, computed on the pool"""
+        return self._pool.submit(self._hash, password).result()
+
+    def verify(self, password, stored):
+        """(valid, needs_rehash) for a password against a stored hash or legacy plaintext.
+
+        needs_rehash is True when a valid record is plaintext or was
+        hashed with another cost than the current one.
+        """
+        return self._pool.submit(self._verify, password, stored).result()
+
+    async def hash_async(self, password):
+        return await asyncio.wrap_future(self._pool.submit(self._hash, password))
+
+    async def verify_async(self, password, stored):
+        return await asyncio.wrap_future(self._pool.submit(self._verify, password, stored))
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher():
+    """The process-wide hasher, calibrated on first use"""
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                _hasher = PasswordHasher(PASSWORD_SCRYPT_N or None)
+    return _hasher
+
+
+async def get_password_hasher_async():
+    """get_password_hasher() for coroutines; the first call calibrates off the event loop"""
+    if _hasher is not None:
+        return _hasher
+    return await asyncio.to_thread(get_password_hasher)
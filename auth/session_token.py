@@ -0,0 +1,61 @@
+# auth/session_token.py
+"""Signed, expiring session tokens.
+
+A token is "<payload>.<signature>": the payload is the base64url JSON of
+the signed-in user's id, name, email and type plus an expiry time, and
+the signature an HMAC-SHA256 of it. Any worker holding SESSION_SECRET
+can check a token and rebuild the user from it without reading the
+users collection. Tokens are not encrypted, so the payload carries
+nothing secret.
+
+Set SESSION_SECRET to the same value on every worker; without it each
+process signs with a random key of its own and its tokens are only
+valid there until it restarts.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(12 * 60 * 60)))
+_SECRET = (os.getenv("SESSION_SECRET") or secrets.token_hex(32)).encode("utf-8")
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(payload, secret):
+    return _b64encode(hmac.new(secret, payload.encode("ascii"), hashlib.sha256).digest())
+
+
+def issue_token(claims, ttl=SESSION_TTL, secret=None, now=None):
+    """A token carrying claims that expires ttl seconds from now"""
+    expires_at = int((now if now is not None else time.time()) + ttl)
+    payload = _b64encode(json.dumps(dict(claims, exp=expires_at), separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{_sign(payload, secret or _SECRET)}"
+
+
+def read_token(token, secret=None, now=None):
+    """The claims of a valid, unexpired token, else None"""
+    try:
+        payload, signature = token.split(".")
+        if not hmac.compare_digest(signature, _sign(payload, secret or _SECRET)):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except (AttributeError, TypeError, ValueError, UnicodeError):
+        return None
+    if not isinstance(claims, dict) or claims.get("exp", 0) <= (now if now is not None else time.time()):
+        return None
+    return claims
@@ -0,0 +1,112 @@
+# benchmarks/booking_latency.py
+"""Per-booking latency of create_booking against the previous flow.
+
+The previous flow looked the guest up by email, read the property,
+inserted the booking and then updated it with its booking_id: four round
+trips. The current one resolves the guest from the signed-in User, reads
+the price from the property cache and writes once. Every repository call
+here sleeps --rtt-ms to stand in for the network round trip of a real
+deployment, so the difference shows up as it would against MongoDB.
+
+Usage:
+    python -m benchmarks.booking_latency [--bookings 200] [--rtt-ms 2]
+"""
+import argparse
+import statistics
+import time
+from datetime import date, timedelta
+
+from auth.auth_service import AuthService
+from auth.user_factory import UserFactory
+from booking.booking_service import BookingService, build_booking_document
+from database.indexes import ensure_indexes
+from database.mongodb import BOOKING, PROPERTIES, USERS
+from database.repository import configure_backend, get_repository
+from property.property_service import PropertyService
+
+
+class RoundTripRepository:
+    """Repository wrapper that counts calls and adds a fixed delay to each"""
+
+    def __init__(self, repository, rtt):
+        self._repository = repository
+        self._rtt = rtt
+        self.calls = 0
+
+    def __getattr__(self, name):
+        method = getattr(self._repository, name)
+
+        def call(*args, **kwargs):
+            self.calls += 1
+            time.sleep(self._rtt)
+            return method(*args, **kwargs)
+        return call
+
+
+def legacy_create_booking(booking_service, property_service, guest_email, property_id, check_in, check_out):
+    """create_booking as it was: email lookup, uncached read, insert, then update"""
+    guest_id = booking_service.get_user_id_by_email(guest_email)
+    property_obj, _ = property_service._load_property(property_id)
+    booking_data = build_booking_document(guest_id, property_obj, check_in, check_out, 1)
+    del booking_data["_id"], booking_data["booking_id"], booking_data["nights"]
+    result = booking_service.booking_repository.insert_one(booking_data)
+    booking_service.booking_repository.update_one(
+        {"_id": result.inserted_id}, {"$set": {"booking_id": str(result.inserted_id)}}
+    )
+    return str(result.inserted_id)
+
+
+def measure(label, create, stays, repositories):
+    before = sum(r.calls for r in repositories)
+    timings = []
+    for check_in, check_out in stays:
+        started = time.perf_counter()
+        booking_id, *_ = create(check_in, check_out)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert booking_id
+    calls = (sum(r.calls for r in repositories) - before) / len(stays)
+    print(f"{label:>8}: median {statistics.median(timings):.2f} ms, "
+          f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:.2f} ms, {calls:.1f} calls/booking")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.booking_latency")
+    parser.add_argument("--bookings", type=int, default=200)
+    parser.add_argument("--rtt-ms", type=float, default=2.0, help="simulated round trip per call")
+    args = parser.parse_args(argv)
+
+    configure_backend("memory")
+    ensure_indexes(force=True)
+    rtt = args.rtt_ms / 1000
+    users, properties, bookings = (
+        RoundTripRepository(get_repository(name), rtt) for name in (USERS, PROPERTIES, BOOKING)
+    )
+    guest = UserFactory.create_user("guest", "Benchmark Guest", "benchmark-guest@example.com", "secret")
+    AuthService(users).register_user(guest)
+
+    property_service = PropertyService(properties)
+    PropertyService._instance = property_service
+    booking_service = BookingService(bookings, users)
+    property_id, _ = property_service.create_property("benchmark-host@example.com", "villa", {
+        "title": "Benchmark Villa", "location": "Benchmark City", "price": 250,
+        "has_pool": True, "has_private_access": False,
+    })
+
+    # Back-to-back one-night stays, so every attempt succeeds
+    first = date.today() + timedelta(days=365)
+    nights = [first + timedelta(days=i) for i in range(2 * args.bookings + 1)]
+    stays = list(zip(nights, nights[1:]))
+    legacy_stays, current_stays = stays[:args.bookings], stays[args.bookings:]
+
+    measure("previous", lambda check_in, check_out: (legacy_create_booking(
+        booking_service, property_service, guest.getEmail(), property_id, check_in, check_out
+    ),), legacy_stays, (users, properties, bookings))
+    # Warm the property and calendar caches the way earlier page views would
+    booking_service.get_calendar(property_id)
+    measure("current", lambda check_in, check_out: booking_service.create_booking(
+        guest, property_id, check_in, check_out, 1
+    ), current_stays, (users, properties, bookings))
+
+
+if __name__ == "__main__":
+    main()
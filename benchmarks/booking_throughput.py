@@ -0,0 +1,113 @@
+# benchmarks/booking_throughput.py
+"""Concurrent booking stress test.
+
+Worker threads book random stays on a small set of listings as fast as
+they can, so many attempts collide. Prints attempts per second, how many
+succeeded or were refused as conflicts, and checks that no night ended
+up booked twice.
+
+Usage:
+    python -m benchmarks.booking_throughput [--threads 16] [--attempts 200]
+        [--properties 10] [--backend memory]
+
+The mongo backend writes to the database configured in .env; point
+MONGODB_DATABASE at a scratch database first.
+"""
+import argparse
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from auth.auth_service import AuthService
+from auth.user_factory import UserFactory
+from booking.booking_service import BookingService, BOOKING_CONFLICT_MESSAGE
+from database.indexes import ensure_indexes
+from database.repository import configure_backend
+from property.property_service import PropertyService
+
+GUEST_EMAIL = "benchmark-guest@example.com"
+
+
+def setup(properties):
+    ensure_indexes(force=True)
+    AuthService().register_user(UserFactory.create_user("guest", "Benchmark Guest", GUEST_EMAIL, "secret"))
+    property_service = PropertyService.get_instance()
+    return [
+        property_service.create_property("benchmark-host@example.com", "apartment", {
+            "title": f"Benchmark Apartment {i}", "location": "Benchmark City", "price": 100,
+            "floor_number": 1, "has_elevator": True,
+        })[0]
+        for i in range(properties)
+    ]
+
+
+def worker(property_ids, attempts, start, outcomes, barrier):
+    # One service per thread: each keeps its own calendars, like separate app workers
+    service = BookingService()
+    rng = random.Random()
+    barrier.wait()
+    for _ in range(attempts):
+        check_in = start + timedelta(days=rng.randrange(60))
+        check_out = check_in + timedelta(days=rng.randint(1, 7))
+        booking_id, message = service.create_booking(
+            GUEST_EMAIL, rng.choice(property_ids), check_in, check_out, 1
+        )
+        if booking_id:
+            outcomes["booked"] += 1
+        elif message in (BOOKING_CONFLICT_MESSAGE, "Property is not available for the selected dates."):
+            outcomes["conflict"] += 1
+        else:
+            outcomes["error"] += 1
+
+
+def count_double_booked_nights(property_ids):
+    service = BookingService()
+    doubled = 0
+    for property_id in property_ids:
+        nights = Counter()
+        for booking in service.get_property_bookings(property_id):
+            if booking.get("status") in ("confirmed", "pending"):
+                nights.update(booking.get("nights", []))
+        doubled += sum(1 for count in nights.values() if count > 1)
+    return doubled
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.booking_throughput")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--attempts", type=int, default=200, help="bookings attempted per thread")
+    parser.add_argument("--properties", type=int, default=10)
+    parser.add_argument("--backend", choices=["memory", "mongo"], default="memory")
+    args = parser.parse_args(argv)
+
+    configure_backend(args.backend)
+    property_ids = setup(args.properties)
+    start = date.today() + timedelta(days=365)
+
+    barrier = threading.Barrier(args.threads + 1)
+    per_thread = [Counter() for _ in range(args.threads)]
+    threads = [
+        threading.Thread(target=worker, args=(property_ids, args.attempts, start, outcomes, barrier))
+        for outcomes in per_thread
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    outcomes = sum(per_thread, Counter())
+    total = args.threads * args.attempts
+    print(f"{total} attempts by {args.threads} threads in {elapsed:.2f}s ({total / elapsed:.0f}/s)")
+    print(f"  booked: {outcomes['booked']}  conflicts: {outcomes['conflict']}  errors: {outcomes['error']}")
+    doubled = count_double_booked_nights(property_ids)
+    print(f"  double-booked nights: {doubled}")
+    return 1 if doubled else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,179 @@
+# booking/async_booking_service.py
+import asyncio
+
+from database.mongodb import BOOKING, HOST_DAILY_STATS, PRICING_RULES, USERS
+from database.async_repository import get_async_repository
+from datetime import datetime
+
+from booking.booking_service import (
+    build_booking_document, build_calendar, calendar_query, availability_error, booking_created_message,
+    BOOKING_CONFLICT_MESSAGE, BOOKING_HOLD_MINUTES, CALENDAR_PROJECTION, ROLLUP_PROJECTION
+)
+from booking.booking_archive import AsyncBookingArchive
+from booking.host_analytics import rollup_updates
+from booking.booking_status import PENDING, CONFIRMED, CANCELLED, EXPIRED
+from database.pagination import combine_filters
+from pymongo.errors import DuplicateKeyError
+from property.async_property_service import AsyncPropertyService
+
+
+class AsyncBookingService:
+    """Asyncio counterpart of BookingService for API handlers and batch jobs"""
+    _instance = None
+    
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = AsyncBookingService()
+        return cls._instance
+
+    def __init__(self, booking_repository=None, user_repository=None, property_service=None,
+                 stats_repository=None, archive=None):
+        self._booking_repository = booking_repository
+        self._user_repository = user_repository
+        self._property_service = property_service
+        self._stats_repository = stats_repository
+        self._archive = archive if archive is not None else AsyncBookingArchive(booking_repository)
+
+    @property
+    def booking_repository(self):
+        """Injected repository, or the one of the active backend"""
+        return self._booking_repository or get_async_repository(BOOKING)
+
+    @property
+    def user_repository(self):
+        return self._user_repository or get_async_repository(USERS)
+
+    @property
+    def property_service(self):
+        return self._property_service or AsyncPropertyService.get_instance()
+
+    @property
+    def pricing_repository(self):
+        return get_async_repository(PRICING_RULES)
+
+    @property
+    def stats_repository(self):
+        """Host daily rollups, kept in step with confirmed bookings"""
+        return self._stats_repository or get_async_repository(HOST_DAILY_STATS)
+
+    @property
+    def archive(self):
+        """Cold store of finished bookings, read together with booking_repository"""
+        return self._archive
+    
+    async def get_user_id_by_email(self, email):
+        """Get MongoDB _id of a user by email"""
+        user = await self.user_repository.find_one({"email": email})
+        if user:
+            return str(user["_id"])
+        return None
+    
+    async def resolve_guest_id(self, guest):
+        """Id of a guest given as a signed-in User or an email"""
+        if hasattr(guest, "getId"):
+            return guest.getId() or await self.get_user_id_by_email(guest.getEmail())
+        return await self.get_user_id_by_email(guest)
+    
+    async def create_booking(self, guest, property_id, check_in, check_out, guests, special_requests="",
+                             hold_minutes=BOOKING_HOLD_MINUTES):
+        """Create a new booking for guest, a signed-in User or an email; pending for hold_minutes"""
+        # The guest, property, pricing and booking lookups are independent, so run them together
+        guest_id, (property_obj, _), pricing_rules, bookings = await asyncio.gather(
+            self.resolve_guest_id(guest),
+            self.property_service.get_property(property_id),
+            self.pricing_repository.find_one({"_id": str(property_id)}),
+            self.booking_repository.find(calendar_query(property_id), CALENDAR_PROJECTION)
+        )
+        
+        if not guest_id:
+            return None, "Guest not found."
+        if not property_obj:
+            return None, "Property not found."
+        
+        booking_data = build_booking_document(
+            guest_id, property_obj, check_in, check_out, guests, special_requests, hold_minutes, pricing_rules
+        )
+        if booking_data["num_days"] <= 0:
+            return None, "Check-out must be after check-in."
+        error = availability_error(build_calendar(property_obj, bookings), booking_data)
+        if error:
+            return None, error
+        try:
+            await self.booking_repository.insert_one(booking_data)
+        except DuplicateKeyError:
+            # The nights may belong to a hold that expired but was not swept yet
+            if not await self.release_expired_holds({"property_id": booking_data["property_id"]}):
+                return None, BOOKING_CONFLICT_MESSAGE
+            try:
+                await self.booking_repository.insert_one(booking_data)
+            except DuplicateKeyError:
+                return None, BOOKING_CONFLICT_MESSAGE
+        if booking_data["status"] == CONFIRMED:
+            await self.stats_repository.bulk_update(rollup_updates(booking_data), ordered=False)
+        return booking_data["booking_id"], booking_created_message(booking_data)
+    
+    async def confirm_booking(self, booking_id):
+        """Confirm a pending booking after payment, if its hold has not expired"""
+        now = datetime.now()
+        booking_data = await self.booking_repository.find_one_and_update(
+            {"booking_id": booking_id, "status": PENDING, "expires_at": {"$gt": now}},
+            {"$set": {"status": CONFIRMED, "confirmed_at": now}, "$unset": {"expires_at": ""}},
+            projection=ROLLUP_PROJECTION
+        )
+        if booking_data:
+            await self.stats_repository.bulk_update(rollup_updates(booking_data), ordered=False)
+            return True, "Booking confirmed."
+        return False, "Booking not found or its hold has expired."
+    
+    async def release_expired_holds(self, filters=None, batch_size=500, now=None):
+        """Expire pending bookings whose hold ran out and free their nights; see BookingService"""
+        now = now or datetime.now()
+        query = combine_filters(filters, {"status": PENDING, "expires_at": {"$lte": now}})
+        released = []
+        while True:
+            expired = await self.booking_repository.find(
+                query, {"booking_id": 1, "property_id": 1, "expires_at": 1}, limit=batch_size
+            )
+            if not expired:
+                return released
+            await self.booking_repository.update_many(
+                {"_id": {"$in": [b["_id"] for b in expired]}, "status": PENDING, "expires_at": {"$lte": now}},
+                {"$set": {"status": EXPIRED}, "$rename": {"nights": "released_nights"}}
+            )
+            released.extend(expired)
+            if len(expired) < batch_size:
+                return released
+    
+    async def get_booking(self, booking_id):
+        """Get booking by ID, from the archive if it was moved there"""
+        booking_data = await self.booking_repository.find_one({"booking_id": booking_id})
+        if not booking_data:
+            booking_data = next(iter(await self.archive.find({"booking_id": booking_id})), None)
+        
+        if not booking_data:
+            return None, "Booking not found."
+        
+        return booking_data, "Booking found."
+    
+    async def get_guest_bookings(self, guest_id):
+        """Get all bookings for a specific guest, archived ones included"""
+        return await self.archive.find({"guest_id": guest_id})
+    
+    async def get_property_bookings(self, property_id):
+        """Get all bookings for a specific property, archived ones included"""
+        return await self.archive.find({"property_id": property_id})
+    
+    async def cancel_booking(self, booking_id):
+        """Cancel a booking"""
+        booking_data = await self.booking_repository.find_one_and_update(
+            {"booking_id": booking_id, "status": {"$in": [PENDING, CONFIRMED]}},
+            {"$set": {"status": CANCELLED, "cancelled_at": datetime.now()}, "$rename": {"nights": "released_nights"}},
+            projection=dict(ROLLUP_PROJECTION, status=1)
+        )
+        
+        if booking_data:
+            if booking_data["status"] == CONFIRMED and "host_id" in booking_data:
+                await self.stats_repository.bulk_update(rollup_updates(booking_data, -1), ordered=False)
+            return True, "Booking cancelled successfully."
+        return False, "Booking not found or could not be cancelled."
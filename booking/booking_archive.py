@@ -0,0 +1,214 @@
+# booking/booking_archive.py
+"""Cold storage for finished bookings.
+
+Bookings whose stay ended more than ARCHIVE_AFTER_DAYS ago, and that are
+no longer pending, move out of the booking collection into one archive
+collection per check-out year (booking_archive_2024, ...). On MongoDB
+the archive collections are created with the zstd block compressor, and
+a whole year can be dropped or exported once it is no longer needed.
+The booking collection and its indexes keep only recent and upcoming
+stays.
+
+Reads stay transparent: archive_stages() returns $unionWith stages that
+BookingService appends to its queries, so lookups and history pages see
+archived bookings in the same result. AsyncBookingArchive offers the
+same read path to AsyncBookingService.
+
+Usage:
+    python -m booking.booking_archive run [--days 365] [--batch-size 500]
+    python -m booking.booking_archive status
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, DESCENDING
+
+from booking.booking_status import PENDING
+from database.async_repository import get_async_repository
+from database.cache import LRUTTLCache
+from database.indexes import META_COLLECTION
+from database.mongodb import BOOKING
+from database.repository import get_repository, transaction
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("BOOKING_ARCHIVE_AFTER_DAYS", "365"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("BOOKING_ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_COMPRESSOR = os.getenv("BOOKING_ARCHIVE_COMPRESSOR", "zstd")
+# Other workers start reading a newly created archive year within this many seconds
+ARCHIVE_YEARS_TTL = float(os.getenv("BOOKING_ARCHIVE_YEARS_TTL", "60"))
+
+ARCHIVE_PREFIX = "booking_archive_"
+# Remembers which archive years exist, so reads only union those
+ARCHIVE_META_ID = "booking_archive"
+
+ARCHIVE_INDEXES = [
+    ([("booking_id", ASCENDING)], {"name": "booking_id"}),
+    ([("guest_id", ASCENDING), ("check_in", DESCENDING), ("_id", DESCENDING)], {"name": "guest_id_check_in_id"}),
+    ([("property_id", ASCENDING), ("check_in", ASCENDING)], {"name": "property_id_check_in"}),
+]
+
+
+def archive_collection(year):
+    return f"{ARCHIVE_PREFIX}{year}"
+
+
+def union_stages(years, match, pipeline=()):
+    """$unionWith stages adding the bookings of each archive year that match, run through pipeline"""
+    return [
+        {"$unionWith": {"coll": archive_collection(year), "pipeline": [{"$match": match}, *pipeline]}}
+        for year in years
+    ]
+
+
+def years_from_meta(meta):
+    """Archived years recorded in the registry document, newest first"""
+    return sorted(meta.get("years", []), reverse=True) if meta else []
+
+
+class BookingArchive:
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = BookingArchive()
+        return cls._instance
+
+    def __init__(self, booking_repository=None):
+        self._booking_repository = booking_repository
+        self._years = LRUTTLCache(1, ARCHIVE_YEARS_TTL)
+
+    @property
+    def booking_repository(self):
+        """Injected repository, or the one of the active backend"""
+        return self._booking_repository or get_repository(BOOKING)
+
+    def years(self):
+        """Archived check-out years, newest first"""
+        years = self._years.get(ARCHIVE_META_ID)
+        if years is None:
+            years = years_from_meta(get_repository(META_COLLECTION).find_one({"_id": ARCHIVE_META_ID}))
+            self._years.set(ARCHIVE_META_ID, years)
+        return years
+
+    def archive_stages(self, match, pipeline=()):
+        """$unionWith stages adding the archived bookings that match, each run through pipeline"""
+        return union_stages(self.years(), match, pipeline)
+
+    def find(self, match, projection=None):
+        """Bookings matching match from the booking collection and every archive year"""
+        pipeline = [{"$project": projection}] if projection else []
+        return self.booking_repository.aggregate(
+            [{"$match": match}, *pipeline, *self.archive_stages(match, pipeline)]
+        )
+
+    def _ensure_year(self, year):
+        repository = get_repository(archive_collection(year))
+        options = {}
+        if ARCHIVE_COMPRESSOR:
+            options["storageEngine"] = {"wiredTiger": {"configString": f"block_compressor={ARCHIVE_COMPRESSOR}"}}
+        repository.create_collection(**options)
+        for keys, index_options in ARCHIVE_INDEXES:
+            repository.create_index(keys, **index_options)
+        get_repository(META_COLLECTION).update_one(
+            {"_id": ARCHIVE_META_ID}, {"$addToSet": {"years": year}}, upsert=True
+        )
+        self._years.clear()
+        return repository
+
+    def run(self, older_than_days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE, now=None):
+        """Move finished bookings that checked out before the cutoff; returns {year: moved}.
+
+        Each batch is copied and deleted in one transaction, so readers
+        never see a booking twice or not at all, and an interrupted run
+        leaves whole batches either moved or untouched.
+        """
+        cutoff = (now or datetime.now()) - timedelta(days=older_than_days)
+        query = {"check_out": {"$lt": cutoff}, "status": {"$ne": PENDING}}
+        moved = {}
+        known_years = set(self.years())
+        while True:
+            batch = list(self.booking_repository.find(query, sort=[("_id", 1)], limit=batch_size))
+            if not batch:
+                return moved
+            by_year = {}
+            for booking_data in batch:
+                by_year.setdefault(booking_data["check_out"].year, []).append(booking_data)
+            # Collections and indexes cannot be created inside the transaction
+            for year in by_year.keys() - known_years:
+                self._ensure_year(year)
+                known_years.add(year)
+            with transaction():
+                for year, bookings in by_year.items():
+                    get_repository(archive_collection(year)).insert_many(bookings)
+                self.booking_repository.delete_many({"_id": {"$in": [b["_id"] for b in batch]}})
+            for year, bookings in by_year.items():
+                moved[year] = moved.get(year, 0) + len(bookings)
+
+    def status(self):
+        """{collection: documents} for the booking collection and each archive year"""
+        counts = {BOOKING: self.booking_repository.count_documents({})}
+        for year in self.years():
+            counts[archive_collection(year)] = get_repository(archive_collection(year)).count_documents({})
+        return counts
+
+
+class AsyncBookingArchive:
+    """Asyncio counterpart of the BookingArchive read path"""
+
+    def __init__(self, booking_repository=None):
+        self._booking_repository = booking_repository
+        self._years = LRUTTLCache(1, ARCHIVE_YEARS_TTL)
+
+    @property
+    def booking_repository(self):
+        """Injected repository, or the one of the active backend"""
+        return self._booking_repository or get_async_repository(BOOKING)
+
+    async def years(self):
+        """Archived check-out years, newest first"""
+        years = self._years.get(ARCHIVE_META_ID)
+        if years is None:
+            years = years_from_meta(await get_async_repository(META_COLLECTION).find_one({"_id": ARCHIVE_META_ID}))
+            self._years.set(ARCHIVE_META_ID, years)
+        return years
+
+    async def archive_stages(self, match, pipeline=()):
+        return union_stages(await self.years(), match, pipeline)
+
+    async def find(self, match, projection=None):
+        """Bookings matching match from the booking collection and every archive year"""
+        pipeline = [{"$project": projection}] if projection else []
+        return await self.booking_repository.aggregate(
+            [{"$match": match}, *pipeline, *await self.archive_stages(match, pipeline)]
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m booking.booking_archive",
+                                     description="Move finished bookings to the archive")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="archive bookings past the cutoff")
+    run_parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS,
+                            help="archive stays that checked out more than this many days ago")
+    run_parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    commands.add_parser("status", help="count bookings per collection")
+    args = parser.parse_args(argv)
+
+    archive = BookingArchive.get_instance()
+    if args.command == "run":
+        moved = archive.run(args.days, args.batch_size)
+        if not moved:
+            print("Nothing to archive.")
+        for year, count in sorted(moved.items()):
+            print(f"{archive_collection(year)}: {count} archived")
+        return 0
+
+    for collection, count in archive.status().items():
+        print(f"{collection}: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,128 @@
-from database.mongodb import booking_collection
-from datetime import datetime, date
+from database.mongodb import BOOKING, USERS, PROPERTIES
+from database.repository import get_repository, transaction
+from database.cache import LRUTTLCache
+from database.pagination import parse_sort, keyset_filter, encode_cursor, decode_cursor, combine_filters
+from pymongo.errors import DuplicateKeyError, BulkWriteError, OperationFailure
+from bson import ObjectId
+from datetime import datetime, date, timedelta
+from booking.booking_status import PENDING, CONFIRMED, CANCELLED, EXPIRED, active_booking_filter
+from booking.booking_archive import BookingArchive
+from booking.host_analytics import HostAnalyticsService
 from property.property_service import PropertyService
+from property.pricing import PricingService, quote_stay
+from property.property_summary import PropertySummary, SUMMARY_PROJECTION
+import os
 import uuid
-from database.mongodb import db
-from database.mongodb import users_collection
 
+# Availability calendars kept per process; the TTL bounds staleness from other workers
+CALENDAR_CACHE_SIZE = int(os.getenv("CALENDAR_CACHE_SIZE", "1024"))
+CALENDAR_CACHE_TTL = float(os.getenv("CALENDAR_CACHE_TTL", "60"))
 
+BOOKING_CONFLICT_MESSAGE = "Property is already booked for some of the selected dates."
+UNAVAILABLE_MESSAGE = "Property is not available for the selected dates."
+
+# Fields an availability calendar needs from a booking
+CALENDAR_PROJECTION = {"booking_id": 1, "check_in": 1, "check_out": 1}
+
+# How long a booking holds its nights while the guest pays
+BOOKING_HOLD_MINUTES = float(os.getenv("BOOKING_HOLD_MINUTES", "15"))
+# How long a hold is guaranteed to last once payment starts
+PAYMENT_WINDOW_MINUTES = float(os.getenv("BOOKING_PAYMENT_WINDOW_MINUTES", "10"))
+
+# Fields the host analytics rollups need from a booking
+ROLLUP_PROJECTION = {
+    "property_id": 1, "host_id": 1, "check_in": 1, "check_out": 1, "price_per_night": 1, "nightly_prices": 1
+}
+
+DEFAULT_HISTORY_PAGE_SIZE = 20
+HISTORY_SORTS = ("check_in", "-check_in", "created_at", "-created_at")
+
+
+def to_datetime(value):
+    """Normalize a stay date given as str, date or datetime to a datetime"""
+    if isinstance(value, str):
+        return datetime.strptime(value, "%Y-%m-%d")
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    return value
+
+
+def build_booking_document(guest_id, property_obj, check_in, check_out, guests, special_requests="",
+                           hold_minutes=None, pricing_rules=None):
+    """Build the booking document stored for a stay; shared by the sync and async services.
+
+    With hold_minutes the booking is pending and holds its nights until
+    expires_at; otherwise it is confirmed right away. The stay is priced
+    night by night with the listing's pricing_rules.
+    """
+    check_in = to_datetime(check_in)
+    check_out = to_datetime(check_out)
+    
+    # Calculate number of days
+    num_days = (check_out - check_in).days
+    
+    property_details = property_obj.get_details()
+    quote = quote_stay(property_details.get('price', 0), pricing_rules, check_in, check_out)
+    
+    # The id is generated here so the booking is complete in a single insert
+    booking_oid = ObjectId()
+    created_at = datetime.now()
+    booking_data = {
+        "_id": booking_oid,
+        "booking_id": str(booking_oid),
+        "guest_id": guest_id,
+        "property_id": str(property_obj.get_id()),
+        "host_id": property_obj.get_host_id(),
+        "property_type": property_details.get("type"),
+        "check_in": check_in,
+        "check_out": check_out,
+        "num_days": num_days,
+        # Average over the stay; nightly_prices has the rate of every night
+        "price_per_night": round(quote["total_price"] / num_days, 2) if num_days > 0 else 0,
+        "nightly_prices": quote["nightly_prices"],
+        "total_price": quote["total_price"],
+        # Day ordinals of the booked nights; a unique index on them rejects double bookings
+        "nights": list(range(check_in.toordinal(), check_out.toordinal())),
+        "guests": guests,
+        "special_requests": special_requests,
+        "status": CONFIRMED,
+        "created_at": created_at,
+    }
+    if hold_minutes:
+        booking_data.update(status=PENDING, expires_at=created_at + timedelta(minutes=hold_minutes))
+    else:
+        booking_data["confirmed_at"] = created_at
+    return booking_data
+
+
+def booking_created_message(booking_data):
+    """Message for a newly inserted booking, telling a pending guest to pay"""
+    if booking_data["status"] == PENDING:
+        return f"Booking held until {booking_data['expires_at']:%H:%M}. Complete payment to confirm it."
+    return "Booking created successfully."
+
+
+def calendar_query(property_id):
+    """Bookings of property_id that can still conflict with a new stay"""
+    # Stays that ended before today cannot conflict, so they are left out
+    today = datetime.combine(date.today(), datetime.min.time())
+    return {"property_id": str(property_id), "check_out": {"$gt": today}, **active_booking_filter()}
+
+
+def build_calendar(property_obj, bookings):
+    """AvailabilityCalendar of a property given the bookings matching calendar_query"""
+    return property_obj.get_calendar(
+        (b.get("booking_id") or str(b["_id"]), b["check_in"], b["check_out"]) for b in bookings
+    )
+
+
+def availability_error(calendar, booking_data):
+    """Error message if the stay of booking_data does not fit the calendar, else None"""
+    if not calendar.is_available(booking_data["check_in"], booking_data["check_out"]):
+        return UNAVAILABLE_MESSAGE
+    return None
 
 
 class BookingService:
@@ -16,83 +133,298 @@ class BookingService:
         if cls._instance is None:
             cls._instance = BookingService()
         return cls._instance
+
+    def __init__(self, booking_repository=None, user_repository=None, calendars=None, analytics=None,
+                 pricing=None, archive=None):
+        self._booking_repository = booking_repository
+        self._user_repository = user_repository
+        self._analytics = analytics
+        self._pricing = pricing
+        self._archive = archive if archive is not None else BookingArchive(booking_repository)
+        self._calendars = calendars if calendars is not None else LRUTTLCache(CALENDAR_CACHE_SIZE, CALENDAR_CACHE_TTL)
+
+    @property
+    def booking_repository(self):
+        """Injected repository, or the one of the active backend"""
+        return self._booking_repository or get_repository(BOOKING)
+
+    @property
+    def user_repository(self):
+        return self._user_repository or get_repository(USERS)
+    
+    @property
+    def analytics(self):
+        """Host analytics whose daily rollups follow confirmed bookings"""
+        return self._analytics or HostAnalyticsService.get_instance()
+    
+    @property
+    def pricing(self):
+        """Pricing rules of the listings, cached like the listings themselves"""
+        return self._pricing or PricingService.get_instance()
+    
+    @property
+    def archive(self):
+        """Cold store of finished bookings, read together with booking_repository"""
+        return self._archive
     
     def get_user_id_by_email(self, email):
         """Get MongoDB _id of a user by email"""
-        user = users_collection.find_one({"email": email})
+        user = self.user_repository.find_one({"email": email})
         if user:
             return str(user["_id"])
         return None
     
-    def create_booking(self, guest_email, property_id, check_in, check_out, guests, special_requests=""):
-        """Create a new booking"""
-        # Convert dates to datetime objects if they're not already
-        if isinstance(check_in, str):
-            check_in = datetime.strptime(check_in, "%Y-%m-%d")
-        elif isinstance(check_in, date):
-            # Convert date to datetime
-            check_in = datetime.combine(check_in, datetime.min.time())
-            
-        if isinstance(check_out, str):
-            check_out = datetime.strptime(check_out, "%Y-%m-%d")
-        elif isinstance(check_out, date):
-            # Convert date to datetime
-            check_out = datetime.combine(check_out, datetime.min.time())
-        guest_id =  self.get_user_id_by_email(guest_email)
+    def get_calendar(self, property_id):
+        """AvailabilityCalendar of a property with its current confirmed bookings"""
+        property_obj, _ = PropertyService.get_instance().get_property(property_id)
+        if not property_obj:
+            return None
+        return self._calendar_for(property_obj)
+    
+    def _calendar_for(self, property_obj):
+        key = str(property_obj.get_id())
+        calendar = self._calendars.get(key)
+        if calendar is None:
+            calendar = build_calendar(property_obj, self.booking_repository.find(calendar_query(key), CALENDAR_PROJECTION))
+            self._calendars.set(key, calendar)
+        return calendar
+    
+    def invalidate_calendar(self, property_id):
+        """Drop the cached calendar of a property, e.g. after its availability changed"""
+        self._calendars.invalidate(str(property_id))
+    
+    def is_available(self, property_id, check_in, check_out):
+        """Whether the property can be booked from check_in to check_out"""
+        calendar = self.get_calendar(property_id)
+        return calendar is not None and calendar.is_available(check_in, check_out)
+    
+    def resolve_guest_id(self, guest):
+        """Id of a guest given as a signed-in User or an email; only a User without an id costs a query"""
+        if hasattr(guest, "getId"):
+            return guest.getId() or self.get_user_id_by_email(guest.getEmail())
+        return self.get_user_id_by_email(guest)
+    
+    def create_booking(self, guest, property_id, check_in, check_out, guests, special_requests="",
+                       hold_minutes=BOOKING_HOLD_MINUTES):
+        """Create a new booking for guest, a signed-in User or an email.
+
+        The booking is pending for hold_minutes, until confirm_booking is
+        called after payment; pass hold_minutes=None to confirm at once.
+        With a User that has its id and a cached property and calendar,
+        the only database operation is the insert.
+        """
+        guest_id = self.resolve_guest_id(guest)
         
         if not guest_id:
             return None, "Guest not found."
         
-        # Calculate number of days
-        delta = check_out - check_in
-        num_days = delta.days
-        
-        # Get property price
+        # Get property price; served from the property cache when warm
         property_service = PropertyService.get_instance()
         property_obj, _ = property_service.get_property(property_id)
         if not property_obj:
             return None, "Property not found."
         
-        property_details = property_obj.get_details()
-        price_per_night = property_details.get('price', 0)
-        
-        # Calculate total price
-        total_price = price_per_night * num_days
-        
-        # Create booking document
-        booking_data = {
-            "guest_id": guest_id,
-            "property_id": property_id,
-            "check_in": check_in,
-            "check_out": check_out,
-            "num_days": num_days,
-            "price_per_night": price_per_night,
-            "total_price": total_price,
-            "guests": guests,
-            "special_requests": special_requests,
-            "status": "confirmed",
-            "created_at": datetime.now()
-        }
+        booking_data = build_booking_document(
+            guest_id, property_obj, check_in, check_out, guests, special_requests, hold_minutes,
+            self.pricing.get_rules(property_id)
+        )
+        if booking_data["num_days"] <= 0:
+            return None, "Check-out must be after check-in."
+        
+        calendar = self._calendar_for(property_obj)
+        error = availability_error(calendar, booking_data)
+        if error:
+            return None, error
         
         # Insert booking into database
-        result = booking_collection.insert_one(booking_data)
-        
-        if result.inserted_id:
-            # Use the MongoDB ObjectId as the booking_id
-            booking_id = str(result.inserted_id)
-            
-            # Update the document with the booking_id
-            booking_collection.update_one(
-                {"_id": result.inserted_id},
-                {"$set": {"booking_id": booking_id}}
+        if not self._insert_taking_expired_holds(lambda: self.booking_repository.insert_one(booking_data),
+                                                 [booking_data["property_id"]]):
+            return None, BOOKING_CONFLICT_MESSAGE
+        
+        booking_id = booking_data["booking_id"]
+        calendar.add_booking(booking_id, booking_data["check_in"], booking_data["check_out"])
+        if booking_data["status"] == CONFIRMED:
+            self.analytics.record_booking(booking_data)
+        return booking_id, booking_created_message(booking_data)
+    
+    def _insert_taking_expired_holds(self, insert, property_ids):
+        """Run insert, retrying once after releasing expired holds of property_ids.
+
+        The unique nights index rejects nights still held by a hold that
+        expired but was not swept yet; releasing it frees them. Returns
+        False when the nights are really taken.
+        """
+        try:
+            insert()
+            return True
+        except (DuplicateKeyError, BulkWriteError):
+            released = self.release_expired_holds({"property_id": {"$in": list(property_ids)}})
+        if released:
+            try:
+                insert()
+                return True
+            except (DuplicateKeyError, BulkWriteError):
+                pass
+        # Another booking took some of the nights since the calendar was loaded
+        for property_id in property_ids:
+            self._calendars.invalidate(property_id)
+        return False
+    
+    def confirm_booking(self, booking_id):
+        """Confirm a pending booking after payment, if its hold has not expired"""
+        now = datetime.now()
+        booking_data = self.booking_repository.find_one_and_update(
+            {"booking_id": booking_id, "status": PENDING, "expires_at": {"$gt": now}},
+            {"$set": {"status": CONFIRMED, "confirmed_at": now}, "$unset": {"expires_at": ""}},
+            projection=ROLLUP_PROJECTION
+        )
+        if booking_data:
+            self.analytics.record_booking(booking_data)
+            return True, "Booking confirmed."
+        
+        booking_data = self.booking_repository.find_one({"booking_id": booking_id}, {"status": 1})
+        if not booking_data:
+            return False, "Booking not found."
+        if booking_data["status"] == CONFIRMED:
+            return True, "Booking already confirmed."
+        if booking_data["status"] in (PENDING, EXPIRED):
+            return False, "The booking hold has expired. Please book again."
+        return False, f"Booking is {booking_data['status']}."
+    
+    def extend_hold(self, booking_id, minutes=PAYMENT_WINDOW_MINUTES):
+        """Keep a live hold for at least minutes more, before the guest is charged.
+
+        Call it before taking payment: a hold that already ran out is
+        reported here, before any money moves, and a live one cannot run
+        out while the payment is processed.
+        """
+        now = datetime.now()
+        booking_data = self.booking_repository.find_one_and_update(
+            {"booking_id": booking_id, "status": PENDING, "expires_at": {"$gt": now}},
+            {"$max": {"expires_at": now + timedelta(minutes=minutes)}},
+            projection={"_id": 1}
+        )
+        if booking_data:
+            return True, "Booking held for payment."
+        
+        booking_data = self.booking_repository.find_one({"booking_id": booking_id}, {"status": 1})
+        if not booking_data:
+            return False, "Booking not found."
+        if booking_data["status"] == CONFIRMED:
+            return False, "Booking already confirmed."
+        if booking_data["status"] in (PENDING, EXPIRED):
+            return False, "The booking hold has expired. Please book again."
+        return False, f"Booking is {booking_data['status']}."
+    
+    def release_expired_holds(self, filters=None, batch_size=500, now=None):
+        """Expire pending bookings whose hold ran out and free their nights.
+
+        Works in batches of batch_size: one indexed read finds the holds,
+        one update_many releases them. Returns the released bookings with
+        their booking_id, property_id and expires_at.
+        """
+        now = now or datetime.now()
+        query = combine_filters(filters, {"status": PENDING, "expires_at": {"$lte": now}})
+        released = []
+        while True:
+            expired = list(self.booking_repository.find(
+                query, {"booking_id": 1, "property_id": 1, "expires_at": 1}, limit=batch_size
+            ))
+            if not expired:
+                return released
+            # The status condition skips holds confirmed since they were read
+            result = self.booking_repository.update_many(
+                {"_id": {"$in": [b["_id"] for b in expired]}, "status": PENDING, "expires_at": {"$lte": now}},
+                {"$set": {"status": EXPIRED}, "$rename": {"nights": "released_nights"}}
             )
-            
-            return booking_id, "Booking created successfully."
-        return None, "Failed to create booking."
+            for booking_data in expired:
+                calendar = self._calendars.get(booking_data["property_id"])
+                if calendar is not None:
+                    calendar.remove_booking(booking_data["booking_id"])
+            released.extend(expired)
+            if len(expired) < batch_size:
+                return released
+    
+    def create_bookings_batch(self, guest, stays, hold_minutes=BOOKING_HOLD_MINUTES):
+        """Book several stays for one guest, all or nothing.
+
+        stays is a list of dicts with property_id, check_in, check_out and
+        optionally guests and special_requests. Every stay is checked
+        before anything is written; the bookings then go in with one
+        insert_many inside a transaction, so a conflict with another
+        guest rolls the whole group back. Like create_booking, the
+        bookings are pending for hold_minutes until each is confirmed
+        after payment. Returns ({"group_id", "booking_ids",
+        "total_price"}, message), or (None, message naming the first stay
+        that failed, numbered from 1).
+        """
+        if not stays:
+            return None, "No stays to book."
+        guest_id = self.resolve_guest_id(guest)
+        if not guest_id:
+            return None, "Guest not found."
+        
+        properties = PropertyService.get_instance().get_properties(stay["property_id"] for stay in stays)
+        pricing_rules = self.pricing.get_rules_many(properties)
+        group_id = str(ObjectId())
+        booking_docs = []
+        taken = {}
+        for number, stay in enumerate(stays, 1):
+            property_obj = properties.get(str(stay["property_id"]))
+            if not property_obj:
+                return None, f"Stay {number}: Property not found."
+            booking_data = build_booking_document(
+                guest_id, property_obj, stay["check_in"], stay["check_out"],
+                stay.get("guests", 1), stay.get("special_requests", ""), hold_minutes,
+                pricing_rules[str(stay["property_id"])]
+            )
+            if booking_data["num_days"] <= 0:
+                return None, f"Stay {number}: Check-out must be after check-in."
+            error = availability_error(self._calendar_for(property_obj), booking_data)
+            if error:
+                return None, f"Stay {number}: {error}"
+            # Stays of the same group must not overlap each other either
+            nights = taken.setdefault(booking_data["property_id"], set())
+            if nights.intersection(booking_data["nights"]):
+                return None, f"Stay {number}: Overlaps another stay of this group."
+            nights.update(booking_data["nights"])
+            booking_data["group_id"] = group_id
+            booking_docs.append(booking_data)
+        
+        def insert_group():
+            with transaction():
+                self.booking_repository.insert_many(booking_docs, ordered=True)
+        
+        try:
+            inserted = self._insert_taking_expired_holds(insert_group, list(taken))
+        except OperationFailure as e:
+            # For instance a standalone server, which cannot run transactions
+            return None, f"Group booking failed: {str(e)}"
+        if not inserted:
+            return None, BOOKING_CONFLICT_MESSAGE
+        
+        for booking_data in booking_docs:
+            self._calendar_for(properties[booking_data["property_id"]]).add_booking(
+                booking_data["booking_id"], booking_data["check_in"], booking_data["check_out"]
+            )
+            if booking_data["status"] == CONFIRMED:
+                self.analytics.record_booking(booking_data)
+        if booking_docs[0]["status"] == PENDING:
+            message = (f"{len(booking_docs)} bookings held until {booking_docs[0]['expires_at']:%H:%M}. "
+                       "Complete payment to confirm them.")
+        else:
+            message = f"{len(booking_docs)} bookings created successfully."
+        return {
+            "group_id": group_id,
+            "booking_ids": [booking_data["booking_id"] for booking_data in booking_docs],
+            "total_price": sum(booking_data["total_price"] for booking_data in booking_docs),
+        }, message
     
     def get_booking(self, booking_id):
-        """Get booking by ID"""
-        booking_data = booking_collection.find_one({"booking_id": booking_id})
+        """Get booking by ID, from the archive if it was moved there"""
+        booking_data = self.booking_repository.find_one({"booking_id": booking_id})
+        if not booking_data:
+            booking_data = next(iter(self.archive.find({"booking_id": booking_id})), None)
         
         if not booking_data:
             return None, "Booking not found."
@@ -100,8 +432,8 @@ class BookingService:
         return booking_data, "Booking found."
     
     def get_guest_bookings(self, guest_id):
-        """Get all bookings for a specific guest"""
-        bookings_data = booking_collection.find({"guest_id": guest_id})
+        """Get all bookings for a specific guest, archived ones included"""
+        bookings_data = self.archive.find({"guest_id": guest_id})
         
         bookings_list = []
         for booking_data in bookings_data:
@@ -109,9 +441,56 @@ class BookingService:
         
         return bookings_list
     
+    def get_guest_history(self, guest_id, limit=DEFAULT_HISTORY_PAGE_SIZE, sort="-check_in", cursor=None):
+        """One page of a guest's bookings with their property summaries.
+
+        Returns (bookings, next_cursor); each booking dict carries a
+        "property" PropertySummary, or None if the listing was deleted.
+        sort is one of HISTORY_SORTS.
+        """
+        return self._history_page({"guest_id": guest_id}, limit, sort, cursor)
+    
+    def get_property_history(self, property_id, limit=DEFAULT_HISTORY_PAGE_SIZE, sort="-check_in", cursor=None):
+        """One page of a property's bookings, like get_guest_history"""
+        return self._history_page({"property_id": str(property_id)}, limit, sort, cursor)
+    
+    def _history_page(self, match, limit, sort, cursor):
+        if sort not in HISTORY_SORTS:
+            raise ValueError(f"Invalid sort: {sort}")
+        sort_spec = parse_sort(sort)
+        if cursor:
+            match = combine_filters(match, keyset_filter(sort_spec, decode_cursor(cursor, sort_spec)))
+        
+        # Page first, then join: only the bookings on the page look up their property.
+        # Each archive year contributes at most one page, already sorted.
+        page = [{"$sort": dict(sort_spec)}, {"$limit": limit + 1}]
+        bookings_data = list(self.booking_repository.aggregate([
+            {"$match": match},
+            *self.archive.archive_stages(match, page),
+            {"$sort": dict(sort_spec)},
+            # One extra document tells whether another page exists
+            {"$limit": limit + 1},
+            {"$project": {"nights": 0, "released_nights": 0}},
+            {"$lookup": {
+                "from": PROPERTIES,
+                "localField": "property_id",
+                "foreignField": "_id",
+                "pipeline": [{"$project": SUMMARY_PROJECTION}],
+                "as": "property",
+            }},
+        ]))
+        next_cursor = None
+        if len(bookings_data) > limit:
+            bookings_data = bookings_data[:limit]
+            next_cursor = encode_cursor(bookings_data[-1], sort_spec)
+        for booking_data in bookings_data:
+            joined = booking_data["property"]
+            booking_data["property"] = PropertySummary.from_document(joined[0]) if joined else None
+        return bookings_data, next_cursor
+    
     def get_property_bookings(self, property_id):
-        """Get all bookings for a specific property"""
-        bookings_data = booking_collection.find({"property_id": property_id})
+        """Get all bookings for a specific property, archived ones included"""
+        bookings_data = self.archive.find({"property_id": property_id})
         
         bookings_list = []
         for booking_data in bookings_data:
@@ -121,11 +500,19 @@ class BookingService:
     
     def cancel_booking(self, booking_id):
         """Cancel a booking"""
-        result = booking_collection.update_one(
-            {"booking_id": booking_id},
-            {"$set": {"status": "cancelled"}}
+        booking_data = self.booking_repository.find_one_and_update(
+            {"booking_id": booking_id, "status": {"$in": [PENDING, CONFIRMED]}},
+            # Renaming nights takes the booking out of the unique nights index
+            {"$set": {"status": CANCELLED, "cancelled_at": datetime.now()}, "$rename": {"nights": "released_nights"}},
+            projection=dict(ROLLUP_PROJECTION, status=1)
         )
         
-        if result.modified_count > 0:
+        if booking_data:
+            # Only confirmed bookings were counted; bookings older than host_id were not
+            if booking_data["status"] == CONFIRMED and "host_id" in booking_data:
+                self.analytics.remove_booking(booking_data)
+            calendar = self._calendars.get(booking_data["property_id"])
+            if calendar is not None:
+                calendar.remove_booking(booking_id)
             return True, "Booking cancelled successfully."
         return False, "Booking not found or could not be cancelled." 
\ No newline at end of file
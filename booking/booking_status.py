@@ -0,0 +1,17 @@
+# booking/booking_status.py
+from datetime import datetime
+
+# A pending booking holds its nights until expires_at, waiting for payment
+PENDING = "pending"
+CONFIRMED = "confirmed"
+CANCELLED = "cancelled"
+# A pending booking whose hold ran out before it was paid
+EXPIRED = "expired"
+
+
+def active_booking_filter(now=None):
+    """Match bookings that occupy their nights: confirmed ones and unexpired holds"""
+    return {"$or": [
+        {"status": CONFIRMED},
+        {"status": PENDING, "expires_at": {"$gt": now or datetime.now()}},
+    ]}
@@ -0,0 +1,103 @@
+# booking/hold_sweeper.py
+from datetime import datetime
+import os
+import sys
+import threading
+import time
+
+from booking.booking_service import BookingService
+
+SWEEP_INTERVAL = float(os.getenv("BOOKING_SWEEP_INTERVAL", "30"))
+SWEEP_BATCH_SIZE = int(os.getenv("BOOKING_SWEEP_BATCH_SIZE", "500"))
+
+
+class HoldSweeper(threading.Thread):
+    """Daemon thread that releases expired booking holds every interval seconds.
+
+    stats() reports how much each sweep released, how long it took, and
+    the lag: how long the oldest released hold had been expired. A lag
+    that keeps growing means the interval or batch size is too small.
+    """
+
+    def __init__(self, booking_service=None, interval=SWEEP_INTERVAL, batch_size=SWEEP_BATCH_SIZE):
+        super().__init__(name="hold-sweeper", daemon=True)
+        self._booking_service = booking_service
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {
+            "runs": 0,
+            "released": 0,
+            "errors": 0,
+            "last_run_at": None,
+            "last_released": 0,
+            "last_duration": 0.0,
+            "last_lag": 0.0,
+            "max_lag": 0.0,
+            "throughput": 0.0,
+            "last_error": None,
+        }
+
+    @property
+    def booking_service(self):
+        return self._booking_service or BookingService.get_instance()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.sweep()
+
+    def stop(self):
+        self._stopped.set()
+
+    def sweep(self, now=None):
+        """Release every hold expired at now; returns how many were released"""
+        now = now or datetime.now()
+        started = time.perf_counter()
+        try:
+            released = self.booking_service.release_expired_holds(batch_size=self.batch_size, now=now)
+        except Exception as e:
+            with self._lock:
+                self._stats["errors"] += 1
+                self._stats["last_error"] = str(e)
+            print(f"Hold sweep failed: {e}", file=sys.stderr)
+            return 0
+        duration = time.perf_counter() - started
+        lag = max(((now - b["expires_at"]).total_seconds() for b in released), default=0.0)
+
+        with self._lock:
+            stats = self._stats
+            stats["runs"] += 1
+            stats["released"] += len(released)
+            stats["last_run_at"] = now
+            stats["last_released"] = len(released)
+            stats["last_duration"] = duration
+            stats["last_lag"] = lag
+            stats["max_lag"] = max(stats["max_lag"], lag)
+            if released:
+                stats["throughput"] = len(released) / duration if duration else float(len(released))
+        return len(released)
+
+    def stats(self):
+        """Counters of the sweeps so far; durations and lags in seconds, throughput in holds/s"""
+        with self._lock:
+            return dict(self._stats)
+
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def start_hold_sweeper():
+    """Start the process-wide sweeper once; BOOKING_SWEEP_INTERVAL=0 disables it"""
+    global _sweeper
+    with _sweeper_lock:
+        if _sweeper is None and SWEEP_INTERVAL > 0:
+            _sweeper = HoldSweeper()
+            _sweeper.start()
+        return _sweeper
+
+
+def get_hold_sweeper():
+    """The sweeper started by start_hold_sweeper, or None"""
+    return _sweeper
@@ -0,0 +1,191 @@
+# booking/host_analytics.py
+"""Host earnings and occupancy from daily rollups.
+
+Every confirmed booking adds one night and its nightly price to a
+host_daily_stats document per property and day, and one arrival on its
+check-in day; a cancellation subtracts them again. Dashboards then read
+one document per property and day of the period instead of every booking
+the host ever received.
+"""
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+
+from booking.booking_archive import BookingArchive
+from booking.booking_status import CONFIRMED, active_booking_filter
+from database.mongodb import BOOKING, HOST_DAILY_STATS, PROPERTIES
+from database.repository import get_repository
+
+
+def rollup_updates(booking, sign=1):
+    """(filter, update, upsert) triples adding (sign=1) or removing (sign=-1) a booking"""
+    check_in, check_out = booking["check_in"], booking["check_out"]
+    ordinals = range(check_in.toordinal(), check_out.toordinal())
+    # Bookings quoted before pricing rules existed have one flat rate
+    prices = booking.get("nightly_prices") or [booking["price_per_night"]] * len(ordinals)
+    updates = []
+    for ordinal, price in zip(ordinals, prices):
+        day = datetime.fromordinal(ordinal)
+        inc = {"nights": sign, "revenue": sign * price}
+        if ordinal == check_in.toordinal():
+            inc["arrivals"] = sign
+        updates.append((
+            {"_id": f"{booking['property_id']}:{day:%Y-%m-%d}"},
+            {"$inc": inc, "$setOnInsert": {
+                "host_id": booking["host_id"],
+                "property_id": booking["property_id"],
+                "day": day,
+                "month": f"{day:%Y-%m}",
+            }},
+            True,
+        ))
+    return updates
+
+
+def _metrics(nights, revenue, arrivals, available_nights):
+    return {
+        "revenue": revenue,
+        "nights": nights,
+        "arrivals": arrivals,
+        "occupancy": nights / available_nights if available_nights else 0.0,
+        # Average daily rate: revenue per booked night
+        "adr": revenue / nights if nights else 0.0,
+    }
+
+
+def month_range(day=None):
+    """First day of day's month and of the month after it"""
+    day = day or date.today()
+    first = day.replace(day=1)
+    return first, first + timedelta(days=monthrange(first.year, first.month)[1])
+
+
+class HostAnalyticsService:
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = HostAnalyticsService()
+        return cls._instance
+
+    def __init__(self, repository=None, booking_repository=None, property_repository=None):
+        self._repository = repository
+        self._booking_repository = booking_repository
+        self._property_repository = property_repository
+
+    @property
+    def repository(self):
+        """Injected repository, or the one of the active backend"""
+        return self._repository or get_repository(HOST_DAILY_STATS)
+
+    @property
+    def booking_repository(self):
+        return self._booking_repository or get_repository(BOOKING)
+
+    @property
+    def property_repository(self):
+        return self._property_repository or get_repository(PROPERTIES)
+
+    def record_booking(self, booking):
+        """Add a confirmed booking to the rollups"""
+        self.repository.bulk_update(rollup_updates(booking), ordered=False)
+
+    def remove_booking(self, booking):
+        """Take a cancelled booking out of the rollups"""
+        self.repository.bulk_update(rollup_updates(booking, -1), ordered=False)
+
+    def get_earnings(self, host_id, start=None, end=None):
+        """Revenue, occupancy, ADR and arrivals of a host from start to end (exclusive).
+
+        Defaults to the current month. Returns {"totals": metrics,
+        "by_property": {property_id: metrics with "title"}, "by_month":
+        {"YYYY-MM": metrics}}. Occupancy is booked nights over the nights
+        the host's listings could have been booked in the period.
+        """
+        if start is None or end is None:
+            start, end = month_range()
+        start = datetime.combine(start, datetime.min.time()) if not isinstance(start, datetime) else start
+        end = datetime.combine(end, datetime.min.time()) if not isinstance(end, datetime) else end
+
+        rows = list(self.repository.aggregate([
+            {"$match": {"host_id": host_id, "day": {"$gte": start, "$lt": end}}},
+            {"$group": {
+                "_id": {"property_id": "$property_id", "month": "$month"},
+                "nights": {"$sum": "$nights"},
+                "revenue": {"$sum": "$revenue"},
+                "arrivals": {"$sum": "$arrivals"},
+            }},
+        ]))
+        properties = {
+            str(p["_id"]): p.get("title", "")
+            for p in self.property_repository.find({"host_id": host_id}, {"title": 1})
+        }
+
+        days = (end - start).days
+        month_days = {}
+        day = start
+        while day < end:
+            month_days[f"{day:%Y-%m}"] = month_days.get(f"{day:%Y-%m}", 0) + 1
+            day += timedelta(days=1)
+
+        by_property = {pid: [0, 0, 0] for pid in properties}
+        by_month = {month: [0, 0, 0] for month in month_days}
+        for row in rows:
+            totals = (row["nights"], row["revenue"], row["arrivals"])
+            for bucket in (by_property.setdefault(row["_id"]["property_id"], [0, 0, 0]),
+                           by_month[row["_id"]["month"]]):
+                for i, value in enumerate(totals):
+                    bucket[i] += value
+
+        listings = len(by_property)
+        nights, revenue, arrivals = (sum(values) for values in zip((0, 0, 0), *by_property.values()))
+        return {
+            "totals": _metrics(nights, revenue, arrivals, days * listings),
+            "by_property": {
+                pid: dict(_metrics(*values, days), title=properties.get(pid, ""))
+                for pid, values in by_property.items()
+            },
+            "by_month": {
+                month: _metrics(*values, month_days[month] * listings)
+                for month, values in by_month.items()
+            },
+        }
+
+    def get_upcoming_stays(self, host_id, limit=10):
+        """The next stays at the host's listings, soonest first"""
+        today = datetime.combine(date.today(), datetime.min.time())
+        return list(self.booking_repository.find(
+            {"host_id": host_id, "check_in": {"$gte": today}, **active_booking_filter()},
+            {"booking_id": 1, "property_id": 1, "guest_id": 1, "check_in": 1, "check_out": 1,
+             "guests": 1, "total_price": 1, "status": 1},
+            sort=[("check_in", 1)],
+            limit=limit,
+        ))
+
+    def rebuild(self):
+        """Recompute every rollup from the confirmed bookings; returns the bookings counted.
+
+        Needed once for bookings made before the rollups existed; archived
+        bookings are included. Bookings without host_id get it from their
+        property, and it is stored on them so a later cancellation takes
+        them out of the rollups again.
+        """
+        self.repository.delete_many({})
+        hosts = {}
+        counted = 0
+        for booking in BookingArchive(self.booking_repository).find({"status": CONFIRMED}):
+            if "host_id" not in booking:
+                if booking["property_id"] not in hosts:
+                    prop = self.property_repository.find_one({"_id": booking["property_id"]}, {"host_id": 1})
+                    hosts[booking["property_id"]] = prop.get("host_id") if prop else None
+                booking["host_id"] = hosts[booking["property_id"]]
+                if booking["host_id"] is None:
+                    continue
+            self.record_booking(booking)
+            counted += 1
+        for property_id, host_id in hosts.items():
+            if host_id is not None:
+                self.booking_repository.update_many(
+                    {"property_id": property_id, "host_id": {"$exists": False}}, {"$set": {"host_id": host_id}}
+                )
+        return counted
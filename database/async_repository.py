@@ -0,0 +1,131 @@
+# database/async_repository.py
+"""Asyncio counterpart of database.repository.
+
+get_async_repository() follows the active backend: with "mongo" it
+returns a Motor-backed repository, with "memory" it wraps the in-memory
+repository of the sync path, so both paths see the same data.
+"""
+import os
+import threading
+
+from pymongo import ReturnDocument, UpdateOne
+
+from database.mongodb import get_client_options
+from database.repository import get_backend, get_repository
+
+_lock = threading.Lock()
+_client = None
+
+
+def get_async_client():
+    """Return the process-wide Motor client, creating it on first use.
+
+    Motor binds the client to the event loop it is first used on, so a
+    process should drive it from a single loop.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                from motor.motor_asyncio import AsyncIOMotorClient
+                options = get_client_options()
+                _client = AsyncIOMotorClient(os.getenv("MONGODB_URI"), **options)
+    return _client
+
+
+def close_async():
+    """Close the shared Motor client"""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+class MotorRepository:
+    """Async repository backed by a Motor collection"""
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def collection(self):
+        client = get_async_client()
+        return client[os.getenv("MONGODB_DATABASE", "project")][self.name]
+
+    async def find_one(self, filter=None, projection=None):
+        return await self.collection.find_one(filter or {}, projection)
+
+    async def find(self, filter=None, projection=None, sort=None, skip=0, limit=0):
+        cursor = self.collection.find(filter or {}, projection, sort=sort, skip=skip, limit=limit)
+        return await cursor.to_list(length=None)
+
+    async def insert_one(self, document):
+        return await self.collection.insert_one(document)
+
+    async def insert_many(self, documents, ordered=True):
+        return await self.collection.insert_many(documents, ordered=ordered)
+
+    async def update_one(self, filter, update, upsert=False):
+        return await self.collection.update_one(filter, update, upsert=upsert)
+
+    async def update_many(self, filter, update, upsert=False):
+        return await self.collection.update_many(filter, update, upsert=upsert)
+
+    async def find_one_and_update(self, filter, update, projection=None, upsert=False,
+                                  return_document=False):
+        return await self.collection.find_one_and_update(
+            filter, update, projection=projection, upsert=upsert,
+            return_document=ReturnDocument.AFTER if return_document else ReturnDocument.BEFORE
+        )
+
+    async def bulk_update(self, updates, ordered=True):
+        return await self.collection.bulk_write(
+            [UpdateOne(filter, update, upsert=upsert) for filter, update, upsert in updates],
+            ordered=ordered
+        )
+
+    async def delete_one(self, filter):
+        return await self.collection.delete_one(filter)
+
+    async def delete_many(self, filter):
+        return await self.collection.delete_many(filter)
+
+    async def count_documents(self, filter):
+        return await self.collection.count_documents(filter)
+
+    async def aggregate(self, pipeline):
+        return await self.collection.aggregate(pipeline).to_list(length=None)
+
+
+class AsyncRepositoryAdapter:
+    """Exposes a sync repository through coroutines.
+
+    Meant for the in-memory backend, whose calls never block on I/O.
+    """
+
+    _METHODS = {
+        "find_one", "find", "insert_one", "insert_many", "update_one", "update_many",
+        "find_one_and_update", "bulk_update", "delete_one", "delete_many", "count_documents", "aggregate",
+    }
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.name = repository.name
+
+    def __getattr__(self, name):
+        if name not in self._METHODS:
+            raise AttributeError(name)
+        method = getattr(self.repository, name)
+
+        async def call(*args, **kwargs):
+            result = method(*args, **kwargs)
+            return list(result) if name in ("find", "aggregate") else result
+        return call
+
+
+def get_async_repository(name):
+    """Return the async repository for a collection of the active backend"""
+    if get_backend().name == "mongo":
+        return MotorRepository(name)
+    return AsyncRepositoryAdapter(get_repository(name))
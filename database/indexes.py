@@ -0,0 +1,211 @@
+# database/indexes.py
+"""Index declarations for the application collections.
+
+Bump INDEX_VERSION whenever INDEXES changes so running workers pick up
+the new definitions on their next start.
+
+Usage:
+    python -m database.indexes ensure [--force]
+    python -m database.indexes report
+"""
+import argparse
+import os
+import sys
+
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+
+from database.mongodb import USERS, PROPERTIES, BOOKING, HOST_DAILY_STATS
+from database.repository import get_repository
+
+INDEX_VERSION = 10
+
+# Pending holds left unswept are deleted by the TTL monitor this long after expiring
+HOLD_TTL_SECONDS = int(os.getenv("BOOKING_HOLD_TTL_SECONDS", "86400"))
+
+# Collection that remembers which INDEX_VERSION was last applied
+META_COLLECTION = "schema_meta"
+META_ID = "indexes"
+
+INDEXES = {
+    USERS: [
+        ([("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+        # Incremental report refreshes read what was written since their high-water mark
+        ([("created_at", ASCENDING)], {"name": "created_at"}),
+    ],
+    PROPERTIES: [
+        ([("host_id", ASCENDING)], {"name": "host_id"}),
+        ([("price", ASCENDING), ("_id", ASCENDING)], {"name": "price_id"}),
+        # Search: equality on type first, then the price range and sort
+        ([("type", ASCENDING), ("price", ASCENDING), ("_id", ASCENDING)], {"name": "type_price_id"}),
+        ([("amenities", ASCENDING)], {"name": "amenities"}),
+        ([("location", ASCENDING)], {"name": "location"}),
+        ([("created_at", ASCENDING)], {"name": "created_at"}),
+        ([("title", TEXT), ("amenities", TEXT), ("location", TEXT)], {
+            "name": "property_text",
+            "weights": {"title": 10, "amenities": 5, "location": 2},
+            "default_language": "english",
+        }),
+    ],
+    BOOKING: [
+        ([("booking_id", ASCENDING)], {
+            "name": "booking_id_unique",
+            "unique": True,
+            # Bookings written before ids were generated client-side got
+            # booking_id after the insert, so skip documents without it
+            "partialFilterExpression": {"booking_id": {"$type": "string"}},
+        }),
+        ([("property_id", ASCENDING), ("check_in", ASCENDING)], {"name": "property_id_check_in"}),
+        # One entry per booked night: a second booking of the same night
+        # fails the insert. Cancelled bookings drop their nights field.
+        ([("property_id", ASCENDING), ("nights", ASCENDING)], {
+            "name": "property_id_nights_unique",
+            "unique": True,
+            "partialFilterExpression": {"nights": {"$exists": True}},
+        }),
+        ([("guest_id", ASCENDING), ("created_at", DESCENDING)], {"name": "guest_id_created_at"}),
+        # Serves the hold sweeper; as a TTL index it also deletes holds that
+        # no sweeper released, e.g. while no app worker was running
+        ([("expires_at", ASCENDING)], {
+            "name": "pending_expires_at_ttl",
+            "expireAfterSeconds": HOLD_TTL_SECONDS,
+            "partialFilterExpression": {"status": "pending"},
+        }),
+        # Upcoming stays on the host dashboard
+        ([("host_id", ASCENDING), ("check_in", ASCENDING)], {"name": "host_id_check_in"}),
+        # Trip history pages, newest stay first, with _id as the keyset tie breaker
+        ([("guest_id", ASCENDING), ("check_in", DESCENDING), ("_id", DESCENDING)], {"name": "guest_id_check_in_id"}),
+        # Archive runs pick stays that checked out before the cutoff
+        ([("check_out", ASCENDING)], {"name": "check_out"}),
+        # Report refreshes: new bookings, confirmations and cancellations since the last run
+        ([("created_at", ASCENDING)], {"name": "created_at"}),
+        ([("confirmed_at", ASCENDING)], {
+            "name": "confirmed_at",
+            "partialFilterExpression": {"confirmed_at": {"$exists": True}},
+        }),
+        ([("cancelled_at", ASCENDING)], {
+            "name": "cancelled_at",
+            "partialFilterExpression": {"cancelled_at": {"$exists": True}},
+        }),
+    ],
+    HOST_DAILY_STATS: [
+        # Host dashboards read a date range of one host's rollups
+        ([("host_id", ASCENDING), ("day", ASCENDING)], {"name": "host_id_day"}),
+    ],
+}
+
+
+def get_applied_version():
+    """Return the index version recorded in the database, 0 if none"""
+    meta = get_repository(META_COLLECTION).find_one({"_id": META_ID})
+    return meta.get("version", 0) if meta else 0
+
+
+def ensure_indexes(force=False):
+    """Create every declared index; safe to run repeatedly.
+
+    Returns a list of (collection, index name, error) tuples; error is
+    None for indexes that were created or already existed.
+    """
+    if not force and get_applied_version() >= INDEX_VERSION:
+        return []
+
+    results = []
+    for collection_name, indexes in INDEXES.items():
+        repository = get_repository(collection_name)
+        for keys, options in indexes:
+            try:
+                repository.create_index(keys, **options)
+                results.append((collection_name, options["name"], None))
+            except OperationFailure as e:
+                results.append((collection_name, options["name"], str(e)))
+
+    if all(error is None for _, _, error in results):
+        get_repository(META_COLLECTION).update_one(
+            {"_id": META_ID},
+            {"$set": {"version": INDEX_VERSION}},
+            upsert=True
+        )
+    return results
+
+
+def ensure_indexes_on_startup():
+    """Startup hook: apply pending index changes without blocking the app.
+
+    Set MONGODB_AUTO_INDEX=0 to skip it, e.g. when indexes are managed
+    by a deploy step running `python -m database.indexes ensure`.
+    """
+    if os.getenv("MONGODB_AUTO_INDEX", "1") == "0":
+        return []
+    try:
+        return ensure_indexes()
+    except Exception as e:
+        print(f"Index bootstrap skipped: {str(e)}", file=sys.stderr)
+        return []
+
+
+def missing_indexes():
+    """Return (collection, index name) pairs that are declared but absent"""
+    missing = []
+    for collection_name, indexes in INDEXES.items():
+        existing = get_repository(collection_name).index_information()
+        for _, options in indexes:
+            if options["name"] not in existing:
+                missing.append((collection_name, options["name"]))
+    return missing
+
+
+def unused_indexes():
+    """Return (collection, index name) pairs with no recorded accesses.
+
+    Access counters are kept per server and reset on restart, so treat
+    the result as a hint rather than proof. Backends without $indexStats
+    report nothing.
+    """
+    unused = []
+    for collection_name in INDEXES:
+        try:
+            stats_list = list(get_repository(collection_name).aggregate([{"$indexStats": {}}]))
+        except OperationFailure:
+            continue
+        for stats in stats_list:
+            if stats["name"] == "_id_":
+                continue
+            if stats.get("accesses", {}).get("ops", 0) == 0:
+                unused.append((collection_name, stats["name"]))
+    return unused
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m database.indexes",
+                                     description="Manage MongoDB indexes")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ensure_parser = commands.add_parser("ensure", help="create missing indexes")
+    ensure_parser.add_argument("--force", action="store_true",
+                               help="run even if the recorded version is current")
+    commands.add_parser("report", help="list missing and unused indexes")
+    args = parser.parse_args(argv)
+
+    if args.command == "ensure":
+        results = ensure_indexes(force=args.force)
+        if not results:
+            print(f"Indexes already at version {INDEX_VERSION}.")
+        failed = False
+        for collection_name, name, error in results:
+            if error:
+                failed = True
+                print(f"FAILED  {collection_name}.{name}: {error}")
+            else:
+                print(f"ok      {collection_name}.{name}")
+        return 1 if failed else 0
+
+    print(f"Declared index version: {INDEX_VERSION}, applied: {get_applied_version()}")
+    for collection_name, name in missing_indexes():
+        print(f"missing {collection_name}.{name}")
+    for collection_name, name in unused_indexes():
+        print(f"unused  {collection_name}.{name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
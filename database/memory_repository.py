@@ -0,0 +1,1029 @@
+# database/memory_repository.py
+"""Process-local repository backend.
+
+Documents live in dicts keyed by _id, with hash indexes on the leading
+field of every declared index. It understands the filter, update,
+projection and aggregation subset the services use, which keeps unit
+tests and profiling runs free of network round trips.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+import re
+import threading
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError, BulkWriteError, OperationFailure
+from pymongo.results import InsertOneResult, InsertManyResult, UpdateResult, DeleteResult, BulkWriteResult
+
+from database.repository import Repository
+
+_MISSING = object()
+
+
+# ---------------------------------------------------------------------------
+# Value helpers
+
+def _clone(value):
+    """Copy dicts and lists so stored documents are never shared"""
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    return value
+
+
+def _type_order(value):
+    # BSON comparison order for the types the services store
+    if value is None or value is _MISSING:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, list):
+        return 5
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime):
+        return 9
+    return 10
+
+
+def _compare(a, b):
+    """Three-way comparison following the BSON type order"""
+    ta, tb = _type_order(a), _type_order(b)
+    if ta != tb:
+        return -1 if ta < tb else 1
+    if ta == 1:
+        return 0
+    if ta == 4:
+        a, b = list(a.items()), list(b.items())
+    if ta in (4, 5):
+        for x, y in zip(a, b):
+            result = _compare(x, y)
+            if result:
+                return result
+        return (len(a) > len(b)) - (len(a) < len(b))
+    return (a > b) - (a < b)
+
+
+def _hash_key(value):
+    """Hashable key that keeps True and 1 apart, as MongoDB does"""
+    if isinstance(value, dict):
+        return ("d", tuple((k, _hash_key(v)) for k, v in value.items()))
+    if isinstance(value, list):
+        return ("l", tuple(_hash_key(v) for v in value))
+    return (_type_order(value), value)
+
+
+def _equal(a, b):
+    return _type_order(a) == _type_order(b) and _compare(a, b) == 0
+
+
+def get_path(document, path):
+    """Resolve a dotted path; arrays of sub-documents yield a list"""
+    value = document
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list):
+            if part.isdigit():
+                index = int(part)
+                value = value[index] if index < len(value) else _MISSING
+            else:
+                values = [get_path(v, part) for v in value if isinstance(v, dict)]
+                value = [v for v in values if v is not _MISSING] or _MISSING
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _set_path(document, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        document = document.setdefault(part, {})
+    document[parts[-1]] = value
+
+
+def _unset_path(document, path):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        document = document.get(part)
+        if not isinstance(document, dict):
+            return _MISSING
+    return document.pop(parts[-1], _MISSING)
+
+
+# ---------------------------------------------------------------------------
+# Query matching
+
+def _candidates(value):
+    # A field holding an array matches on the array itself or any element
+    if isinstance(value, list):
+        return [value] + value
+    return [value]
+
+
+def _match_operator(value, operator, operand):
+    if operator == "$eq":
+        return any(_equal(v, operand) for v in _candidates(value))
+    if operator == "$ne":
+        return not _match_operator(value, "$eq", operand)
+    if operator in ("$gt", "$gte", "$lt", "$lte"):
+        for v in _candidates(value):
+            if v is _MISSING or _type_order(v) != _type_order(operand):
+                continue
+            result = _compare(v, operand)
+            if ((operator == "$gt" and result > 0) or (operator == "$gte" and result >= 0) or
+                    (operator == "$lt" and result < 0) or (operator == "$lte" and result <= 0)):
+                return True
+        return False
+    if operator == "$in":
+        return any(_match_operator(value, "$eq", o) for o in operand)
+    if operator == "$nin":
+        return not _match_operator(value, "$in", operand)
+    if operator == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if operator == "$regex":
+        return _match_regex(value, operand, "")
+    if operator == "$all":
+        return isinstance(value, list) and all(_match_operator(value, "$eq", o) for o in operand)
+    if operator == "$size":
+        return isinstance(value, list) and len(value) == operand
+    if operator == "$elemMatch":
+        if not isinstance(value, list):
+            return False
+        # Logical operators make it a query on the elements, not a condition
+        if _is_operator_dict(operand) and not set(operand) & {"$and", "$or", "$nor"}:
+            return any(_match_condition(v, operand) for v in value)
+        return any(isinstance(v, dict) and matches(v, operand) for v in value)
+    if operator == "$not":
+        return not _match_condition(value, operand)
+    if operator == "$type":
+        names = {"string": 3, "double": 2, "int": 2, "long": 2, "number": 2, "bool": 8,
+                 "date": 9, "objectId": 7, "array": 5, "object": 4, "null": 1}
+        return value is not _MISSING and _type_order(value) == names.get(operand)
+    raise OperationFailure(f"Unsupported query operator: {operator}")
+
+
+def _match_regex(value, pattern, options):
+    flags = re.IGNORECASE if "i" in options else 0
+    regex = pattern if isinstance(pattern, re.Pattern) else re.compile(pattern, flags)
+    return any(isinstance(v, str) and regex.search(v) for v in _candidates(value))
+
+
+def _is_operator_dict(condition):
+    return isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition)
+
+
+def _match_condition(value, condition):
+    if isinstance(condition, re.Pattern):
+        return _match_regex(value, condition, "")
+    if not _is_operator_dict(condition):
+        return _match_operator(value, "$eq", condition)
+    for operator, operand in condition.items():
+        if operator == "$options":
+            continue
+        if operator == "$regex":
+            if not _match_regex(value, operand, condition.get("$options", "")):
+                return False
+        elif not _match_operator(value, operator, operand):
+            return False
+    return True
+
+
+def matches(document, filter):
+    """Return True if the document satisfies a MongoDB-style filter"""
+    for key, condition in (filter or {}).items():
+        if key == "$and":
+            if not all(matches(document, f) for f in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(document, f) for f in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(document, f) for f in condition):
+                return False
+        elif key.startswith("$"):
+            raise OperationFailure(f"Unsupported query operator: {key}")
+        elif not _match_condition(get_path(document, key), condition):
+            return False
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Updates and projections
+
+def apply_update(document, update):
+    """Apply update operators in place; returns True if anything changed"""
+    before = _clone(document)
+    for operator, fields in update.items():
+        if operator in ("$set", "$setOnInsert"):
+            if operator == "$setOnInsert":
+                continue
+            for path, value in fields.items():
+                _set_path(document, path, _clone(value))
+        elif operator == "$unset":
+            for path in fields:
+                _unset_path(document, path)
+        elif operator == "$inc":
+            for path, amount in fields.items():
+                current = get_path(document, path)
+                _set_path(document, path, (0 if current is _MISSING else current) + amount)
+        elif operator in ("$min", "$max"):
+            for path, value in fields.items():
+                current = get_path(document, path)
+                result = _compare(value, current) if current is not _MISSING else None
+                if result is None or (operator == "$min" and result < 0) or (operator == "$max" and result > 0):
+                    _set_path(document, path, _clone(value))
+        elif operator in ("$push", "$addToSet"):
+            for path, value in fields.items():
+                items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                current = get_path(document, path)
+                current = [] if current is _MISSING else current
+                for item in items:
+                    if operator == "$push" or not any(_equal(item, v) for v in current):
+                        current.append(_clone(item))
+                _set_path(document, path, current)
+        elif operator == "$pull":
+            for path, condition in fields.items():
+                current = get_path(document, path)
+                if isinstance(current, list):
+                    _set_path(document, path, [v for v in current if not _match_condition(v, condition)])
+        elif operator == "$rename":
+            for path, new_path in fields.items():
+                value = _unset_path(document, path)
+                if value is not _MISSING:
+                    _set_path(document, new_path, value)
+        else:
+            raise OperationFailure(f"Unsupported update operator: {operator}")
+    return document != before
+
+
+def _upsert_document(filter, update):
+    document = {}
+    for key, condition in (filter or {}).items():
+        if key.startswith("$"):
+            continue
+        if not _is_operator_dict(condition):
+            _set_path(document, key, _clone(condition))
+        elif "$eq" in condition:
+            _set_path(document, key, _clone(condition["$eq"]))
+    if not any(key.startswith("$") for key in update):
+        replacement = _clone(update)
+        replacement.setdefault("_id", document.get("_id", ObjectId()))
+        return replacement
+    apply_update(document, update)
+    for path, value in update.get("$setOnInsert", {}).items():
+        _set_path(document, path, _clone(value))
+    document.setdefault("_id", ObjectId())
+    return document
+
+
+def project(document, projection):
+    """Apply an inclusion or exclusion projection to a copy of document"""
+    if not projection:
+        return _clone(document)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include_id = projection.get("_id", 1)
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if fields and all(not v for v in fields.values()):
+        result = _clone(document)
+        for path in fields:
+            _unset_path(result, path)
+    else:
+        result = {}
+        for path in fields:
+            value = get_path(document, path)
+            if value is not _MISSING:
+                _set_path(result, path, _clone(value))
+        if include_id and "_id" in document:
+            result["_id"] = document["_id"]
+    if not include_id:
+        result.pop("_id", None)
+    return result
+
+
+def sort_documents(documents, sort):
+    """Sort by a list of (field, direction) pairs, last key first"""
+    for field, direction in reversed(list(sort)):
+        documents.sort(key=_SortKey.factory(field), reverse=direction < 0)
+    return documents
+
+
+class _SortKey:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return _compare(self.value, other.value) < 0
+
+    @staticmethod
+    def factory(field):
+        def key(document):
+            value = get_path(document, field)
+            return _SortKey(None if value is _MISSING else value)
+        return key
+
+
+# ---------------------------------------------------------------------------
+# Aggregation
+
+def evaluate(expression, document):
+    """Evaluate an aggregation expression against a document"""
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = get_path(document, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, list):
+        return [evaluate(e, document) for e in expression]
+    if not isinstance(expression, dict):
+        return expression
+    if not _is_operator_dict(expression):
+        return {k: evaluate(v, document) for k, v in expression.items()}
+    operator, operand = next(iter(expression.items()))
+    args = operand if isinstance(operand, list) else [operand]
+    if operator == "$literal":
+        return operand
+    if operator == "$meta":
+        return document.get(_TEXT_SCORE) if operand == "textScore" else None
+    values = [evaluate(a, document) for a in args]
+    if operator == "$add":
+        return sum(v for v in values if v is not None)
+    if operator == "$subtract":
+        return values[0] - values[1]
+    if operator == "$multiply":
+        result = 1
+        for v in values:
+            result *= v
+        return result
+    if operator == "$divide":
+        return values[0] / values[1] if values[1] else None
+    if operator == "$toString":
+        return None if values[0] is None else str(values[0])
+    if operator == "$ifNull":
+        return next((v for v in values if v is not None), None)
+    if operator == "$size":
+        return len(values[0] or [])
+    if operator in ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte"):
+        result = _compare(values[0], values[1])
+        return {"$eq": result == 0, "$ne": result != 0, "$gt": result > 0,
+                "$gte": result >= 0, "$lt": result < 0, "$lte": result <= 0}[operator]
+    if operator == "$cond":
+        if isinstance(operand, dict):
+            condition, then, otherwise = operand["if"], operand["then"], operand["else"]
+        else:
+            condition, then, otherwise = operand
+        return evaluate(then if evaluate(condition, document) else otherwise, document)
+    raise OperationFailure(f"Unsupported expression operator: {operator}")
+
+
+def _accumulate(operator, expression, documents):
+    values = [evaluate(expression, d) for d in documents]
+    if operator == "$sum":
+        return sum(v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool))
+    if operator == "$avg":
+        numbers = [v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        return sum(numbers) / len(numbers) if numbers else None
+    if operator in ("$min", "$max"):
+        present = [v for v in values if v is not None]
+        if not present:
+            return None
+        result = present[0]
+        for v in present[1:]:
+            if (_compare(v, result) < 0) == (operator == "$min"):
+                result = v
+        return result
+    if operator == "$first":
+        return values[0] if values else None
+    if operator == "$last":
+        return values[-1] if values else None
+    if operator == "$push":
+        return values
+    if operator == "$addToSet":
+        unique = []
+        for v in values:
+            if not any(_equal(v, u) for u in unique):
+                unique.append(v)
+        return unique
+    raise OperationFailure(f"Unsupported accumulator: {operator}")
+
+
+def _group(documents, spec):
+    groups = {}
+    for document in documents:
+        key = evaluate(spec["_id"], document)
+        groups.setdefault(_hash_key(key), (key, []))[1].append(document)
+    results = []
+    for key, members in groups.values():
+        result = {"_id": key}
+        for field, accumulator in spec.items():
+            if field != "_id":
+                operator, expression = next(iter(accumulator.items()))
+                result[field] = _accumulate(operator, expression, members)
+        results.append(result)
+    return results
+
+
+def _unwind(documents, spec):
+    if isinstance(spec, str):
+        spec = {"path": spec}
+    path = spec["path"][1:]
+    keep_empty = spec.get("preserveNullAndEmptyArrays", False)
+    results = []
+    for document in documents:
+        value = get_path(document, path)
+        if isinstance(value, list) and value:
+            for item in value:
+                copy = _clone(document)
+                _set_path(copy, path, item)
+                results.append(copy)
+        elif isinstance(value, list) or value is _MISSING or value is None:
+            if keep_empty:
+                copy = _clone(document)
+                _unset_path(copy, path)
+                results.append(copy)
+        else:
+            results.append(document)
+    return results
+
+
+def _bucket(documents, spec):
+    boundaries = spec["boundaries"]
+    output = spec.get("output", {"count": {"$sum": 1}})
+    buckets = {}
+    for document in documents:
+        value = evaluate(spec["groupBy"], document)
+        lower = _MISSING
+        for low, high in zip(boundaries, boundaries[1:]):
+            if _type_order(value) == _type_order(low) and _compare(low, value) <= 0 < _compare(high, value):
+                lower = low
+                break
+        if lower is _MISSING:
+            if "default" not in spec:
+                raise OperationFailure("$bucket could not find a matching branch and no default was given")
+            lower = spec["default"]
+        buckets.setdefault(_hash_key(lower), (lower, []))[1].append(document)
+    results = []
+    for lower, members in buckets.values():
+        result = {"_id": lower}
+        for field, accumulator in output.items():
+            operator, expression = next(iter(accumulator.items()))
+            result[field] = _accumulate(operator, expression, members)
+        results.append(result)
+    # Buckets come out in boundary order, the default one last
+    return sort_documents(results, [("_id", 1)])
+
+
+def _project_stage(documents, spec):
+    if all(isinstance(v, (int, bool)) for v in spec.values()):
+        return [project(d, spec) for d in documents]
+    results = []
+    for document in documents:
+        include = {k: v for k, v in spec.items() if isinstance(v, (int, bool))}
+        result = project(document, include) if include else {"_id": document.get("_id")}
+        if spec.get("_id", 1) == 0:
+            result.pop("_id", None)
+        for field, expression in spec.items():
+            if not isinstance(expression, (int, bool)):
+                _set_path(result, field, evaluate(expression, document))
+        results.append(result)
+    return results
+
+
+def _equality_values(condition):
+    """Values an equality or $in condition can match, or None if it is not one"""
+    if _is_operator_dict(condition):
+        if "$eq" in condition:
+            values = [condition["$eq"]]
+        elif "$in" in condition:
+            values = condition["$in"]
+        else:
+            return None
+    elif isinstance(condition, (dict, list, re.Pattern)):
+        return None
+    else:
+        values = [condition]
+    if any(isinstance(v, (dict, list, re.Pattern)) or v is None for v in values):
+        return None
+    return values
+
+
+# ---------------------------------------------------------------------------
+# Text search
+
+_TEXT_SCORE = "__text_score__"
+
+_STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it",
+    "of", "on", "or", "the", "to", "with",
+}
+
+
+def _stem(token):
+    # Crude suffix folding so "pools" finds "pool"; applied to both sides
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [_stem(t) for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in _STOP_WORDS]
+
+
+class TextIndex:
+    """Weighted inverted index standing in for a MongoDB text index.
+
+    Scores are the sum of field weight times term frequency; they rank
+    like MongoDB's textScore but are not numerically identical.
+    """
+
+    def __init__(self, weights):
+        self.weights = weights
+        self._postings = {}
+
+    def _terms(self, document):
+        terms = {}
+        for field, weight in self.weights.items():
+            value = get_path(document, field)
+            values = value if isinstance(value, list) else [value]
+            for v in values:
+                if isinstance(v, str):
+                    for token in tokenize(v):
+                        terms[token] = terms.get(token, 0) + weight
+        return terms
+
+    def add(self, doc_key, document):
+        for term, score in self._terms(document).items():
+            self._postings.setdefault(term, {})[doc_key] = score
+
+    def remove(self, doc_key, document):
+        for term in self._terms(document):
+            postings = self._postings.get(term)
+            if postings:
+                postings.pop(doc_key, None)
+                if not postings:
+                    del self._postings[term]
+
+    def search(self, query):
+        """Return {doc_key: score} for documents matching any term"""
+        include, exclude = [], []
+        for word in query.split():
+            (exclude if word.startswith("-") else include).extend(tokenize(word))
+        scores = {}
+        for term in include:
+            for doc_key, score in self._postings.get(term, {}).items():
+                scores[doc_key] = scores.get(doc_key, 0) + score
+        for term in exclude:
+            for doc_key in self._postings.get(term, {}):
+                scores.pop(doc_key, None)
+        return scores
+
+
+# ---------------------------------------------------------------------------
+# Repository
+
+class InMemoryRepository(Repository):
+    """Dict-backed repository with hash indexes and unique constraints"""
+
+    def __init__(self, name, backend):
+        super().__init__(name)
+        self._backend = backend
+        self._lock = backend.lock
+        self._documents = {}
+        self._indexes = {"_id_": {"key": [("_id", 1)], "unique": True}}
+        # leading field -> value key -> set of document keys
+        self._hash_indexes = {}
+        self._text_index = None
+
+    # -- index maintenance --------------------------------------------------
+
+    def create_collection(self, **options):
+        # Collections exist on first use; storage options have no in-memory equivalent
+        return None
+
+    def create_index(self, keys, **options):
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        keys = list(keys)
+        name = options.get("name") or "_".join(f"{f}_{d}" for f, d in keys)
+        with self._lock:
+            index = dict(options, key=keys)
+            index.pop("name", None)
+            self._indexes[name] = index
+            field = keys[0][0]
+            if any(direction == "text" for _, direction in keys):
+                weights = {f: 1 for f, direction in keys if direction == "text"}
+                weights.update(options.get("weights", {}))
+                self._text_index = TextIndex(weights)
+                for doc_key, document in self._documents.items():
+                    self._text_index.add(doc_key, document)
+            elif keys[0][1] in (1, -1) and field not in self._hash_indexes:
+                self._hash_indexes[field] = {}
+                for doc_key, document in self._documents.items():
+                    self._index_field(field, doc_key, document)
+            if index.get("unique"):
+                seen = set()
+                for document in self._documents.values():
+                    for key in self._unique_keys(index, document):
+                        if key in seen:
+                            raise OperationFailure(f"E11000 duplicate key error building index {name}")
+                        seen.add(key)
+        return name
+
+    def index_information(self):
+        with self._lock:
+            return {name: _clone(index) for name, index in self._indexes.items()}
+
+    def _index_field(self, field, doc_key, document):
+        value = get_path(document, field)
+        values = value if isinstance(value, list) else [value]
+        for v in values:
+            self._hash_indexes[field].setdefault(_hash_key(None if v is _MISSING else v), set()).add(doc_key)
+
+    def _unindex_field(self, field, doc_key, document):
+        value = get_path(document, field)
+        values = value if isinstance(value, list) else [value]
+        for v in values:
+            bucket = self._hash_indexes[field].get(_hash_key(None if v is _MISSING else v))
+            if bucket:
+                bucket.discard(doc_key)
+
+    def _unique_keys(self, index, document):
+        partial = index.get("partialFilterExpression")
+        if partial and not matches(document, partial):
+            return set()
+        keys = [()]
+        for field, _ in index["key"]:
+            value = get_path(document, field)
+            if value is _MISSING and index.get("sparse"):
+                return set()
+            values = value if isinstance(value, list) and value else [value]
+            keys = [k + (_hash_key(None if v is _MISSING else v),) for k in keys for v in values]
+        return set(keys)
+
+    def _check_unique(self, document, ignore_key=None):
+        for name, index in self._indexes.items():
+            if not index.get("unique") or name == "_id_":
+                continue
+            keys = self._unique_keys(index, document)
+            if not keys:
+                continue
+            for doc_key, other in self._candidate_documents(index, document):
+                if doc_key != ignore_key and keys & self._unique_keys(index, other):
+                    raise DuplicateKeyError(
+                        f"E11000 duplicate key error collection: {self.name} index: {name}",
+                        11000
+                    )
+
+    def _candidate_documents(self, index, document):
+        field = index["key"][0][0]
+        if field in self._hash_indexes:
+            value = get_path(document, field)
+            values = value if isinstance(value, list) else [value]
+            doc_keys = set()
+            for v in values:
+                doc_keys |= self._hash_indexes[field].get(_hash_key(None if v is _MISSING else v), set())
+            return [(k, self._documents[k]) for k in doc_keys]
+        return list(self._documents.items())
+
+    def _store(self, document):
+        doc_key = _hash_key(document["_id"])
+        if doc_key in self._documents:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.name} index: _id_", 11000
+            )
+        self._check_unique(document)
+        self._documents[doc_key] = document
+        for field in self._hash_indexes:
+            self._index_field(field, doc_key, document)
+        if self._text_index:
+            self._text_index.add(doc_key, document)
+        self._journal(lambda: self._remove(doc_key))
+        return doc_key
+
+    def _remove(self, doc_key):
+        document = self._documents.pop(doc_key)
+        for field in self._hash_indexes:
+            self._unindex_field(field, doc_key, document)
+        if self._text_index:
+            self._text_index.remove(doc_key, document)
+        self._journal(lambda: self._store(document))
+        return document
+
+    def _replace(self, doc_key, old, new):
+        self._check_unique(new, ignore_key=doc_key)
+        for field in self._hash_indexes:
+            self._unindex_field(field, doc_key, old)
+            self._index_field(field, doc_key, new)
+        if self._text_index:
+            self._text_index.remove(doc_key, old)
+            self._text_index.add(doc_key, new)
+        self._documents[doc_key] = new
+        self._journal(lambda: self._replace(doc_key, new, old))
+
+    def _journal(self, undo):
+        """Record how to revert a write when a transaction is open"""
+        if self._backend.undo_log is not None:
+            self._backend.undo_log.append(undo)
+
+    # -- querying -----------------------------------------------------------
+
+    def _scan(self, filter):
+        """Return (key, document) pairs matching filter, using a hash index if possible"""
+        filter = filter or {}
+        candidates = None
+        if "$text" in filter:
+            filter = dict(filter)
+            candidates = set(self._text_search(filter.pop("$text")))
+        for field, condition in filter.items():
+            if field != "_id" and field not in self._hash_indexes:
+                continue
+            values = _equality_values(condition)
+            if values is None:
+                continue
+            if field == "_id":
+                keys = {_hash_key(v) for v in values}
+            else:
+                keys = set()
+                for v in values:
+                    keys |= self._hash_indexes[field].get(_hash_key(v), set())
+            candidates = keys if candidates is None else candidates & keys
+        if candidates is None:
+            items = list(self._documents.items())
+        else:
+            items = [(k, self._documents[k]) for k in candidates if k in self._documents]
+        return [(k, d) for k, d in items if matches(d, filter)]
+
+    def _text_search(self, text):
+        if self._text_index is None:
+            raise OperationFailure("text index required for $text query")
+        return self._text_index.search(text["$search"])
+
+    def find_one(self, filter=None, projection=None):
+        with self._lock:
+            found = self._scan(filter)
+            return project(found[0][1], projection) if found else None
+
+    def find(self, filter=None, projection=None, sort=None, skip=0, limit=0):
+        with self._lock:
+            documents = [d for _, d in self._scan(filter)]
+            if sort:
+                sort_documents(documents, sort)
+            documents = documents[skip:skip + limit] if limit else documents[skip:]
+            return [project(d, projection) for d in documents]
+
+    def count_documents(self, filter):
+        with self._lock:
+            return len(self._scan(filter))
+
+    def all_documents(self):
+        with self._lock:
+            return [_clone(d) for d in self._documents.values()]
+
+    # -- writes -------------------------------------------------------------
+
+    def insert_one(self, document):
+        document.setdefault("_id", ObjectId())
+        with self._lock:
+            self._store(_clone(document))
+        return InsertOneResult(document["_id"], True)
+
+    def insert_many(self, documents, ordered=True):
+        inserted_ids = []
+        errors = []
+        with self._lock:
+            for index, document in enumerate(documents):
+                document.setdefault("_id", ObjectId())
+                try:
+                    self._store(_clone(document))
+                    inserted_ids.append(document["_id"])
+                except DuplicateKeyError as e:
+                    errors.append({"index": index, "code": 11000, "errmsg": str(e), "op": document})
+                    if ordered:
+                        break
+        if errors:
+            raise BulkWriteError({
+                "writeErrors": errors, "writeConcernErrors": [], "nInserted": len(inserted_ids),
+                "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": [],
+            })
+        return InsertManyResult(inserted_ids, True)
+
+    def _update(self, filter, update, upsert, many):
+        matched = modified = 0
+        upserted_id = None
+        with self._lock:
+            found = self._scan(filter)
+            if not many:
+                found = found[:1]
+            for doc_key, document in found:
+                updated = _clone(document)
+                matched += 1
+                if apply_update(updated, update):
+                    if not _equal(updated.get("_id"), document.get("_id")):
+                        raise OperationFailure("Performing an update on the path '_id' would modify the immutable field '_id'")
+                    self._replace(doc_key, document, updated)
+                    modified += 1
+            if not found and upsert:
+                document = _upsert_document(filter, update)
+                self._store(document)
+                upserted_id = document["_id"]
+        raw = {"n": matched or (1 if upserted_id is not None else 0), "nModified": modified}
+        if upserted_id is not None:
+            raw["upserted"] = upserted_id
+        return UpdateResult(raw, True)
+
+    def update_one(self, filter, update, upsert=False):
+        return self._update(filter, update, upsert, many=False)
+
+    def update_many(self, filter, update, upsert=False):
+        return self._update(filter, update, upsert, many=True)
+
+    def bulk_update(self, updates, ordered=True):
+        raw = {"nInserted": 0, "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0,
+               "upserted": [], "writeErrors": [], "writeConcernErrors": []}
+        with self._lock:
+            for index, (filter, update, upsert) in enumerate(updates):
+                try:
+                    result = self._update(filter, update, upsert, many=False)
+                except DuplicateKeyError as e:
+                    raw["writeErrors"].append({"index": index, "code": 11000, "errmsg": str(e)})
+                    if ordered:
+                        break
+                    continue
+                if result.upserted_id is not None:
+                    raw["nUpserted"] += 1
+                    raw["upserted"].append({"index": index, "_id": result.upserted_id})
+                else:
+                    raw["nMatched"] += result.matched_count
+                    raw["nModified"] += result.modified_count
+        if raw["writeErrors"]:
+            raise BulkWriteError(raw)
+        return BulkWriteResult(raw, True)
+
+    def find_one_and_update(self, filter, update, projection=None, upsert=False,
+                            return_document=False):
+        with self._lock:
+            found = self._scan(filter)
+            if not found:
+                if not upsert:
+                    return None
+                document = _upsert_document(filter, update)
+                self._store(document)
+                return project(document, projection) if return_document else None
+            doc_key, document = found[0]
+            updated = _clone(document)
+            if apply_update(updated, update):
+                self._replace(doc_key, document, updated)
+            return project(updated if return_document else document, projection)
+
+    def delete_one(self, filter):
+        with self._lock:
+            found = self._scan(filter)[:1]
+            for doc_key, _ in found:
+                self._remove(doc_key)
+        return DeleteResult({"n": len(found)}, True)
+
+    def delete_many(self, filter):
+        with self._lock:
+            found = self._scan(filter)
+            for doc_key, _ in found:
+                self._remove(doc_key)
+        return DeleteResult({"n": len(found)}, True)
+
+    # -- aggregation --------------------------------------------------------
+
+    def aggregate(self, pipeline):
+        with self._lock:
+            pipeline = list(pipeline)
+            if pipeline and "$match" in pipeline[0]:
+                match = pipeline.pop(0)["$match"]
+                scores = self._text_search(match["$text"]) if "$text" in match else {}
+                documents = []
+                for doc_key, document in self._scan(match):
+                    document = _clone(document)
+                    if scores:
+                        # Read by {"$meta": "textScore"}
+                        document[_TEXT_SCORE] = scores[doc_key]
+                    documents.append(document)
+            else:
+                documents = [_clone(d) for d in self._documents.values()]
+            documents = self._run_pipeline(documents, pipeline)
+            for document in documents:
+                document.pop(_TEXT_SCORE, None)
+            return documents
+
+    def _run_pipeline(self, documents, pipeline):
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name == "$match":
+                documents = [d for d in documents if matches(d, spec)]
+            elif name == "$sort":
+                documents = sort_documents(documents, list(spec.items()))
+            elif name == "$skip":
+                documents = documents[spec:]
+            elif name == "$limit":
+                documents = documents[:spec]
+            elif name == "$project":
+                documents = _project_stage(documents, spec)
+            elif name in ("$addFields", "$set"):
+                for document in documents:
+                    for field, expression in spec.items():
+                        _set_path(document, field, evaluate(expression, document))
+            elif name == "$unset":
+                for document in documents:
+                    for field in ([spec] if isinstance(spec, str) else spec):
+                        _unset_path(document, field)
+            elif name == "$group":
+                documents = _group(documents, spec)
+            elif name == "$unwind":
+                documents = _unwind(documents, spec)
+            elif name == "$count":
+                documents = [{spec: len(documents)}] if documents else []
+            elif name == "$facet":
+                documents = [{
+                    field: self._run_pipeline([_clone(d) for d in documents], sub_pipeline)
+                    for field, sub_pipeline in spec.items()
+                }]
+            elif name == "$bucket":
+                documents = _bucket(documents, spec)
+            elif name == "$lookup":
+                documents = self._lookup(documents, spec)
+            elif name == "$unionWith":
+                documents = documents + self._union_with(spec)
+            else:
+                raise OperationFailure(f"Unsupported aggregation stage: {name}")
+        return documents
+
+
+    def _lookup(self, documents, spec):
+        """$lookup on localField/foreignField, optionally refined by a pipeline"""
+        if "let" in spec:
+            raise OperationFailure("$lookup let variables are not supported")
+        foreign = self._backend.get_repository(spec["from"])
+        for document in documents:
+            query = {}
+            if "localField" in spec:
+                value = get_path(document, spec["localField"])
+                values = value if isinstance(value, list) else [None if value is _MISSING else value]
+                query = {spec["foreignField"]: {"$in": values}}
+            joined = [_clone(d) for _, d in foreign._scan(query)]
+            if spec.get("pipeline"):
+                joined = foreign._run_pipeline(joined, spec["pipeline"])
+            _set_path(document, spec["as"], joined)
+        return documents
+
+
+    def _union_with(self, spec):
+        """Documents of another collection, run through its optional pipeline"""
+        if isinstance(spec, str):
+            spec = {"coll": spec}
+        foreign = self._backend.get_repository(spec["coll"])
+        documents = [_clone(d) for d in foreign._documents.values()]
+        return foreign._run_pipeline(documents, spec.get("pipeline", []))
+
+
+class InMemoryBackend:
+    name = "memory"
+
+    def __init__(self):
+        # One lock for all collections keeps multi-collection stages consistent
+        self.lock = threading.RLock()
+        self._repositories = {}
+        # Undo actions of the open transaction; None outside one
+        self.undo_log = None
+
+    def get_repository(self, name):
+        with self.lock:
+            repository = self._repositories.get(name)
+            if repository is None:
+                repository = self._repositories[name] = InMemoryRepository(name, self)
+            return repository
+
+    @contextmanager
+    def transaction(self):
+        """Run the block under the backend lock, undoing its writes if it raises"""
+        with self.lock:
+            if self.undo_log is not None:
+                yield
+                return
+            self.undo_log = []
+            try:
+                yield
+            except BaseException:
+                undo_log, self.undo_log = self.undo_log, None
+                for undo in reversed(undo_log):
+                    undo()
+                raise
+            finally:
+                self.undo_log = None
@@ -0,0 +1,104 @@
+# database/mongo_repository.py
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import CollectionInvalid
+
+from database.mongodb import get_client, get_collection, get_db
+from database.repository import Repository
+
+# Session of the transaction running in the current thread or task, if any
+_session = ContextVar("mongo_session", default=None)
+
+
+class MongoRepository(Repository):
+    """Repository backed by a pymongo collection of the shared client"""
+
+    @property
+    def collection(self):
+        # Resolved per call so close() in database.mongodb is honoured
+        return get_collection(self.name)
+
+    def find_one(self, filter=None, projection=None):
+        return self.collection.find_one(filter or {}, projection, session=_session.get())
+
+    def find(self, filter=None, projection=None, sort=None, skip=0, limit=0):
+        return self.collection.find(filter or {}, projection, sort=sort, skip=skip, limit=limit,
+                                    session=_session.get())
+
+    def insert_one(self, document):
+        return self.collection.insert_one(document, session=_session.get())
+
+    def insert_many(self, documents, ordered=True):
+        return self.collection.insert_many(documents, ordered=ordered, session=_session.get())
+
+    def update_one(self, filter, update, upsert=False):
+        return self.collection.update_one(filter, update, upsert=upsert, session=_session.get())
+
+    def update_many(self, filter, update, upsert=False):
+        return self.collection.update_many(filter, update, upsert=upsert, session=_session.get())
+
+    def bulk_update(self, updates, ordered=True):
+        requests = [UpdateOne(filter, update, upsert=upsert) for filter, update, upsert in updates]
+        return self.collection.bulk_write(requests, ordered=ordered, session=_session.get())
+
+    def find_one_and_update(self, filter, update, projection=None, upsert=False,
+                            return_document=False):
+        return self.collection.find_one_and_update(
+            filter, update, projection=projection, upsert=upsert,
+            return_document=ReturnDocument.AFTER if return_document else ReturnDocument.BEFORE,
+            session=_session.get()
+        )
+
+    def delete_one(self, filter):
+        return self.collection.delete_one(filter, session=_session.get())
+
+    def delete_many(self, filter):
+        return self.collection.delete_many(filter, session=_session.get())
+
+    def count_documents(self, filter):
+        return self.collection.count_documents(filter, session=_session.get())
+
+    def aggregate(self, pipeline):
+        return self.collection.aggregate(pipeline, session=_session.get())
+
+    def create_collection(self, **options):
+        try:
+            get_db().create_collection(self.name, **options)
+        except CollectionInvalid:
+            pass
+
+    def create_index(self, keys, **options):
+        return self.collection.create_index(keys, **options)
+
+    def index_information(self):
+        return self.collection.index_information()
+
+
+class MongoBackend:
+    name = "mongo"
+
+    def __init__(self):
+        self._repositories = {}
+
+    def get_repository(self, name):
+        repository = self._repositories.get(name)
+        if repository is None:
+            repository = self._repositories.setdefault(name, MongoRepository(name))
+        return repository
+
+    @contextmanager
+    def transaction(self):
+        """Run the block in a multi-document transaction; needs a replica set"""
+        if _session.get() is not None:
+            yield
+            return
+        with get_client().start_session() as session:
+            # Commits when the block completes, aborts if it raises
+            with session.start_transaction():
+                token = _session.set(session)
+                try:
+                    yield
+                finally:
+                    _session.reset(token)
@@ -2,17 +2,94 @@
 from pymongo import MongoClient
 from dotenv import load_dotenv
 import os
+import threading
 
-# Load environment variables
-load_dotenv()
+# Collection names used across the services
+USERS = "user"
+PROPERTIES = "properties"
+BOOKING = "booking"
+HOST_DAILY_STATS = "host_daily_stats"
+# Weekend, seasonal and length-of-stay pricing per listing, keyed by property id
+PRICING_RULES = "pricing_rules"
+# Admin reports, pre-aggregated by reports.report_service
+REPORT_DAILY = "report_daily"
+REPORT_PROPERTY_TYPES = "report_property_types"
+REPORT_TOTALS = "report_totals"
+REPORT_META = "report_meta"
 
-# Get MongoDB URI from environment variables
-mongodb_uri = os.getenv("MONGODB_URI")
+# Client options that can be tuned from the environment, mapped to the
+# MongoClient keyword they configure and the type they are parsed as
+CLIENT_OPTIONS = {
+    "MONGODB_MAX_POOL_SIZE": ("maxPoolSize", int),
+    "MONGODB_MIN_POOL_SIZE": ("minPoolSize", int),
+    "MONGODB_MAX_IDLE_TIME_MS": ("maxIdleTimeMS", int),
+    "MONGODB_CONNECT_TIMEOUT_MS": ("connectTimeoutMS", int),
+    "MONGODB_SOCKET_TIMEOUT_MS": ("socketTimeoutMS", int),
+    "MONGODB_SERVER_SELECTION_TIMEOUT_MS": ("serverSelectionTimeoutMS", int),
+    "MONGODB_WAIT_QUEUE_TIMEOUT_MS": ("waitQueueTimeoutMS", int),
+    "MONGODB_COMPRESSORS": ("compressors", str),
+    "MONGODB_APP_NAME": ("appname", str),
+}
 
-# Create MongoDB client
-client = MongoClient(mongodb_uri)
-db = client["project"]
-users_collection = db["user"]
-properties_collection = db["properties"]
-booking_collection = db["booking"]
+_client = None
+_lock = threading.Lock()
 
+
+def get_client_options():
+    """Read MongoClient settings from the environment"""
+    load_dotenv()
+    options = {}
+    for env_name, (option, cast) in CLIENT_OPTIONS.items():
+        value = os.getenv(env_name)
+        if value:
+            options[option] = cast(value)
+    return options
+
+
+def get_client():
+    """Return the process-wide MongoClient, creating it on first use"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                options = get_client_options()
+                _client = MongoClient(os.getenv("MONGODB_URI"), **options)
+    return _client
+
+
+def get_db():
+    """Return the application database"""
+    return get_client()[os.getenv("MONGODB_DATABASE", "project")]
+
+
+def get_collection(name):
+    """Return a collection of the application database by name"""
+    return get_db()[name]
+
+
+def close():
+    """Close the shared client; the next call to get_client() reconnects"""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+# Module-level names kept for older imports; they are resolved lazily so
+# importing this module never opens a connection
+_LEGACY_COLLECTIONS = {
+    "users_collection": USERS,
+    "properties_collection": PROPERTIES,
+    "booking_collection": BOOKING,
+}
+
+
+def __getattr__(name):
+    if name == "client":
+        return get_client()
+    if name == "db":
+        return get_db()
+    if name in _LEGACY_COLLECTIONS:
+        return get_collection(_LEGACY_COLLECTIONS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,79 @@
+# database/pagination.py
+"""Keyset (seek) pagination helpers.
+
+A page is read with the sort key and _id as a tie breaker; the cursor
+handed to the caller is the opaque encoding of the last document's sort
+values, and the next page starts strictly after them. Unlike skip/limit
+the cost of a page does not grow with its position.
+"""
+import base64
+
+from bson import json_util
+
+
+def parse_sort(sort):
+    """Turn "field" or "-field" into a sort spec ending with _id"""
+    direction = -1 if sort.startswith("-") else 1
+    field = sort.lstrip("-")
+    if field == "_id":
+        return [("_id", direction)]
+    return [(field, direction), ("_id", direction)]
+
+
+def _sort_value(document, field):
+    value = document
+    for part in field.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def encode_cursor(document, sort_spec):
+    """Encode the sort values of the last document of a page"""
+    values = [_sort_value(document, field) for field, _ in sort_spec]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, sort_spec):
+    """Decode a cursor produced by encode_cursor for the same sort spec"""
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+    if not isinstance(values, list) or len(values) != len(sort_spec):
+        raise ValueError("Invalid cursor: it does not match the sort order")
+    return values
+
+
+def keyset_filter(sort_spec, values):
+    """Filter selecting documents that sort strictly after values"""
+    clauses = []
+    for i, (field, direction) in enumerate(sort_spec):
+        clause = {prev_field: values[j] for j, (prev_field, _) in enumerate(sort_spec[:i])}
+        clause[field] = {"$gt" if direction > 0 else "$lt": values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def combine_filters(*filters):
+    """AND together the non-empty filters"""
+    filters = [f for f in filters if f]
+    if not filters:
+        return {}
+    return filters[0] if len(filters) == 1 else {"$and": filters}
+
+
+def read_page(repository, filters, sort, limit, cursor=None, projection=None):
+    """Read one page; returns (documents, next_cursor or None)"""
+    sort_spec = parse_sort(sort)
+    query = filters or {}
+    if cursor:
+        query = combine_filters(query, keyset_filter(sort_spec, decode_cursor(cursor, sort_spec)))
+    if projection:
+        # The cursor is built from the sort fields, so they must be returned
+        projection = dict(projection, **{field: 1 for field, _ in sort_spec})
+    # One extra document tells whether another page exists
+    documents = list(repository.find(query, projection, sort=sort_spec, limit=limit + 1))
+    if len(documents) > limit:
+        documents = documents[:limit]
+        return documents, encode_cursor(documents[-1], sort_spec)
+    return documents, None
@@ -0,0 +1,139 @@
+# database/repository.py
+"""Data-access layer the services depend on.
+
+A repository wraps one collection and exposes the subset of the pymongo
+collection API the services use. Two backends implement it:
+
+    mongo   - MongoRepository, backed by the shared MongoClient
+    memory  - InMemoryRepository, dict-indexed and process local
+
+The backend is chosen with the DATA_BACKEND environment variable
+(default "mongo") or with configure_backend() at runtime.
+"""
+from abc import ABC, abstractmethod
+import os
+import threading
+
+
+class Repository(ABC):
+    """Collection-like interface shared by every backend.
+
+    Filters, updates, projections and sort specifications use the MongoDB
+    syntax; the in-memory backend supports the subset the services need.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    @abstractmethod
+    def find_one(self, filter=None, projection=None):
+        pass
+
+    @abstractmethod
+    def find(self, filter=None, projection=None, sort=None, skip=0, limit=0):
+        pass
+
+    @abstractmethod
+    def insert_one(self, document):
+        pass
+
+    @abstractmethod
+    def insert_many(self, documents, ordered=True):
+        pass
+
+    @abstractmethod
+    def update_one(self, filter, update, upsert=False):
+        pass
+
+    @abstractmethod
+    def update_many(self, filter, update, upsert=False):
+        pass
+
+    @abstractmethod
+    def bulk_update(self, updates, ordered=True):
+        """Apply (filter, update, upsert) triples with a single bulk write"""
+        pass
+
+    @abstractmethod
+    def find_one_and_update(self, filter, update, projection=None, upsert=False,
+                            return_document=False):
+        pass
+
+    @abstractmethod
+    def delete_one(self, filter):
+        pass
+
+    @abstractmethod
+    def delete_many(self, filter):
+        pass
+
+    @abstractmethod
+    def count_documents(self, filter):
+        pass
+
+    @abstractmethod
+    def aggregate(self, pipeline):
+        pass
+
+    @abstractmethod
+    def create_collection(self, **options):
+        """Create the collection with options such as storageEngine; no-op if it exists"""
+        pass
+
+    @abstractmethod
+    def create_index(self, keys, **options):
+        pass
+
+    @abstractmethod
+    def index_information(self):
+        pass
+
+
+_lock = threading.Lock()
+_backend_name = None
+_backend = None
+
+
+def _create_backend(name):
+    if name == "mongo":
+        from database.mongo_repository import MongoBackend
+        return MongoBackend()
+    if name == "memory":
+        from database.memory_repository import InMemoryBackend
+        return InMemoryBackend()
+    raise ValueError(f"Invalid data backend: {name}")
+
+
+def configure_backend(name):
+    """Switch every service to a fresh instance of the named backend"""
+    global _backend_name, _backend
+    with _lock:
+        _backend = _create_backend(name)
+        _backend_name = name
+    return _backend
+
+
+def get_backend():
+    """Return the active backend, creating the default one on first use"""
+    if _backend is None:
+        configure_backend(os.getenv("DATA_BACKEND", "mongo"))
+    return _backend
+
+
+def get_backend_name():
+    get_backend()
+    return _backend_name
+
+
+def get_repository(name):
+    """Return the repository for a collection of the active backend"""
+    return get_backend().get_repository(name)
+
+
+def transaction():
+    """Context manager making the repository calls in its block all-or-nothing.
+
+    Leaving the block with an exception rolls every write back. Nested
+    blocks join the outermost transaction.
+    """
+    return get_backend().transaction()
@@ -7,6 +7,23 @@ from pages.AdminHome import render as render_admin_home
 from pages.HostHome import render as render_host_home
 from pages.GuestHome import render as render_guest_home
 from pages.PropertyPage import render as render_property_page
+from database.indexes import ensure_indexes_on_startup
+from booking.hold_sweeper import start_hold_sweeper
+from auth.auth_service import AuthService
+
+# Apply pending index changes once per server process
+@st.cache_resource
+def bootstrap_database():
+    return ensure_indexes_on_startup()
+
+bootstrap_database()
+
+# One sweeper thread per server process releases unpaid booking holds
+@st.cache_resource
+def bootstrap_hold_sweeper():
+    return start_hold_sweeper()
+
+bootstrap_hold_sweeper()
 
 # Initialize session state
 if 'authenticated' not in st.session_state:
@@ -14,6 +31,13 @@ if 'authenticated' not in st.session_state:
 if 'current_page' not in st.session_state:
     st.session_state['current_page'] = 'home'
 
+# Sessions end when their signed token expires
+if st.session_state['authenticated'] and not AuthService.get_instance().user_from_token(st.session_state.get('session_token')):
+    st.session_state.clear()
+    st.session_state['authenticated'] = False
+    st.session_state['current_page'] = 'home'
+    st.warning("Your session has expired. Please sign in again.")
+
 # Main content area
 if st.session_state['authenticated']:
     # Add navigation
@@ -43,6 +67,7 @@ if st.session_state['authenticated']:
         
     # Add sign out button to sidebar
     if st.sidebar.button("Sign Out", key="signout_button"):
+        AuthService.get_instance().logout(st.session_state.get('session_token'))
         st.session_state.clear()
         st.rerun()
 else:
@@ -2,10 +2,12 @@
 import streamlit as st
 from property.property_service import PropertyService
 from booking.booking_service import BookingService
+from property.pricing import PricingService
 from datetime import datetime, date, timedelta
+from auth.auth_service import AuthService
 
 def render():
-    user = st.session_state.get("user")
+    user = AuthService.get_instance().user_from_token(st.session_state.get("session_token"))
     if not user:
         st.warning("Please sign in to book a property.")
         if st.button("Go to Login"):
@@ -35,7 +37,7 @@ def render():
     
     st.title(f"Book {property_details['title']}")
     st.write(f"Location: {property_details['location']}")
-    st.write(f"Price: ${price_per_night}/night")
+    st.write(f"Price: from ${price_per_night}/night")
     
     # Booking form
     with st.form(key="booking_form"):
@@ -51,13 +53,17 @@ def render():
         guests = st.number_input("Number of Guests", min_value=1, value=1)
         special_requests = st.text_area("Special Requests (Optional)")
         
-        # Calculate and display total price
+        # Quote the stay with the listing's weekend, seasonal and long-stay pricing
         if check_in and check_out:
-            delta = check_out - check_in
-            num_days = delta.days
-            total_price = price_per_night * num_days
-            st.write(f"**Number of nights:** {num_days}")
-            st.write(f"**Total price:** ${total_price}")
+            quote = PricingService.get_instance().quote(property_obj, check_in, check_out)
+            total_price = quote["total_price"]
+            st.write(f"**Number of nights:** {quote['nights']}")
+            if len(set(quote["nightly_prices"])) > 1:
+                st.caption("Nightly rates: " + ", ".join(
+                    f"{check_in + timedelta(days=i):%a %d %b} ${price:.2f}"
+                    for i, price in enumerate(quote["nightly_prices"])
+                ))
+            st.write(f"**Total price:** ${total_price:.2f}")
         
         # Submit button
         submit_button = st.form_submit_button(label="Make Payment")
@@ -69,7 +75,7 @@ def render():
                 # Create booking
                 booking_service = BookingService.get_instance()
                 booking_id, message = booking_service.create_booking(
-                    user.getEmail(),
+                    user,
                     property_id,
                     check_in,
                     check_out,
@@ -78,7 +84,7 @@ def render():
                 )
                 
                 if booking_id:
-                    st.success(f"Booking confirmed! Your booking ID is: {booking_id}")
+                    st.success(f"{message} Your booking ID is: {booking_id}")
                     # Store booking details in session state
                     st.session_state["booking_id"] = booking_id
                     st.session_state["total_price"] = total_price
@@ -1,10 +1,14 @@
 import streamlit as st
 from proxy.user_proxy import UserProxy
+from booking.booking_service import BookingService
+from auth.auth_service import AuthService
+
+TRIPS_PAGE_SIZE = 10
 
 def render():
     st.title("Guest Dashboard")
     
-    user = st.session_state.get("user")
+    user = AuthService.get_instance().user_from_token(st.session_state.get("session_token"))
     
     # Check if user exists in session state
     if not user:
@@ -18,6 +22,7 @@ def render():
     st.write(f"Welcome back, **{user.getName()}**!")
     
     if st.button("Sign Out"):
+        AuthService.get_instance().logout(st.session_state.get("session_token"))
         st.session_state.clear()
         st.rerun()
         return
@@ -43,6 +48,37 @@ def render():
                 st.info(result)
             except Exception as e:
                 st.error(f"Error: {str(e)}")
+    
+    my_trips(user)
+
+def my_trips(user):
+    """The guest's bookings, newest stay first, one page at a time"""
+    st.subheader("My Trips")
+    booking_service = BookingService.get_instance()
+    guest_id = booking_service.resolve_guest_id(user)
+    # Cursors of the pages visited so far
+    cursors = st.session_state.setdefault("trip_cursors", [None])
+    bookings, next_cursor = booking_service.get_guest_history(guest_id, limit=TRIPS_PAGE_SIZE, cursor=cursors[-1])
+    
+    if not bookings:
+        st.info("You have no bookings yet.")
+        return
+    
+    for booking in bookings:
+        prop = booking["property"]
+        title = f"{prop.title} - {prop.location}" if prop else "Listing no longer available"
+        st.write(f"**{title}**: {booking['check_in']:%Y-%m-%d} to {booking['check_out']:%Y-%m-%d}, "
+                 f"${booking['total_price']} ({booking['status']})")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if len(cursors) > 1 and st.button("Previous trips", key="trips_previous"):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        if next_cursor and st.button("More trips", key="trips_next"):
+            cursors.append(next_cursor)
+            st.rerun()
 
 # # Call the render function to display the page
 # render() 
\ No newline at end of file
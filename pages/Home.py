@@ -1,22 +1,23 @@
 ### pages/Home.py
 import streamlit as st
 from proxy.user_proxy import UserProxy
+from auth.auth_service import AuthService
 
 def render():
     st.subheader("Home Dashboard")
     
     # Check if user is authenticated
-    if "user" not in st.session_state:
+    user = AuthService.get_instance().user_from_token(st.session_state.get("session_token"))
+    if not user:
         st.warning("Please sign in to access the dashboard.")
         return
         
-    user = st.session_state.get("user")
     proxy = UserProxy(user)
 
     st.write(f"Welcome back, **{user.getName()}**!")
 
     if st.button("Sign Out"):
-        st.session_state.pop("user", None)
+        AuthService.get_instance().logout(st.session_state.pop("session_token", None))
         st.session_state.pop("authenticated", None)
         st.success("You have been signed out.")
         st.rerun()
@@ -1,15 +1,17 @@
 import streamlit as st
 from proxy.user_proxy import UserProxy
+from auth.auth_service import AuthService
 
 def render():
     st.title("Host Dashboard")
     
-    user = st.session_state.get("user")
+    user = AuthService.get_instance().user_from_token(st.session_state.get("session_token"))
     proxy = UserProxy(user)
     
     st.write(f"Welcome back, **{user.getName()}**!")
     
     if st.button("Sign Out", key="host_signout"):
+        AuthService.get_instance().logout(st.session_state.get("session_token"))
         st.session_state.clear()
         st.rerun()
         return
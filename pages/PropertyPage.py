@@ -1,10 +1,16 @@
 # pages/PropertyPage.py
 import streamlit as st
+from datetime import date, timedelta
 from property.property_service import PropertyService
+from property.pricing import PricingService
+from property.property_search import PropertySearch
 from users.user_type import UserType
+from auth.auth_service import AuthService
+
+PAGE_SIZE = 20
 
 def render():
-    user = st.session_state.get("user")
+    user = AuthService.get_instance().user_from_token(st.session_state.get("session_token"))
     if not user:
         st.warning("Please sign in to access property listings.")
         return
@@ -42,62 +48,181 @@ def render():
         else:
             st.info("Only hosts can manage properties.")
 
+SORT_OPTIONS = {
+    "price": "Price: low to high",
+    "-price": "Price: high to low",
+    "-_id": "Newest listed",
+}
+
+def search_filters():
+    """Filter controls of the Browse tab; returns a PropertySearch"""
+    facets = st.session_state.get("browse_facets") or {}
+    
+    with st.expander("Filters"):
+        col1, col2 = st.columns(2)
+        with col1:
+            property_type = st.selectbox("Type", ["any", "apartment", "house", "villa"], key="search_type")
+            price_min = st.number_input("Min price per night", min_value=0.0, value=0.0, step=10.0, key="search_price_min")
+            price_max = st.number_input("Max price per night (0 = any)", min_value=0.0, value=0.0, step=10.0, key="search_price_max")
+            location_prefix = st.text_input("Location starts with", key="search_location")
+        with col2:
+            selected = st.session_state.get("search_amenities", [])
+            amenity_options = sorted(set(facets.get("amenities", {})) | set(selected))
+            amenities = st.multiselect("Amenities", amenity_options, key="search_amenities")
+            has_pool = st.checkbox("Pool", key="search_has_pool")
+            has_elevator = st.checkbox("Elevator", key="search_has_elevator")
+            has_garden = st.checkbox("Garden", key="search_has_garden")
+            has_private_access = st.checkbox("Private access", key="search_has_private_access")
+    
+    return PropertySearch(
+        price_min=price_min or None,
+        price_max=price_max or None,
+        property_type=None if property_type == "any" else property_type,
+        amenities=amenities,
+        location_prefix=location_prefix,
+        has_pool=has_pool,
+        has_elevator=has_elevator,
+        has_garden=has_garden,
+        has_private_access=has_private_access,
+    )
+
+def stay_dates():
+    """Optional check-in/check-out picker; returns (check_in, check_out) or None"""
+    if not st.checkbox("Only show properties free for my dates", key="search_by_dates"):
+        return None
+    col1, col2 = st.columns(2)
+    with col1:
+        check_in = st.date_input("Check-in", value=date.today() + timedelta(days=1), key="search_check_in")
+    with col2:
+        check_out = st.date_input("Check-out", value=date.today() + timedelta(days=2), key="search_check_out")
+    if check_out <= check_in:
+        st.error("Check-out must be after check-in.")
+        return None
+    return check_in, check_out
+
 def browse_properties():
     """Browse all available properties"""
     property_service = PropertyService.get_instance()
-    properties = property_service.list_properties()
+    
+    text = st.text_input("Search", placeholder="e.g. beach villa pool", key="search_text").strip()
+    stay = stay_dates()
+    search = search_filters()
+    if text:
+        sort = "relevance"
+        st.caption("Sorted by relevance")
+    else:
+        sort = st.selectbox("Sort by", list(SORT_OPTIONS), format_func=SORT_OPTIONS.get, key="browse_sort")
+    # Cursors of the pages visited so far; reset when the search or sort changes
+    browse_key = (text, sort, repr(search), stay)
+    if st.session_state.get("browse_key") != browse_key:
+        st.session_state["browse_cursors"] = [None]
+        st.session_state["browse_key"] = browse_key
+    cursors = st.session_state["browse_cursors"]
+    
+    # Facets are the same on every page, so only the first page asks for them
+    first_page = cursors[-1] is None
+    if text:
+        # The date filter applies to text searches too
+        properties, next_cursor, facets = property_service.text_search_properties(
+            text, search, limit=PAGE_SIZE, cursor=cursors[-1], with_facets=first_page,
+            check_in=stay[0] if stay else None, check_out=stay[1] if stay else None
+        )
+    elif stay:
+        properties, next_cursor = property_service.find_available_properties(
+            stay[0], stay[1], search.to_query(), limit=PAGE_SIZE, sort=sort, cursor=cursors[-1]
+        )
+        facets = None
+    else:
+        properties, next_cursor, facets = property_service.search_properties(
+            search, limit=PAGE_SIZE, sort=sort, cursor=cursors[-1], with_facets=first_page
+        )
+    if first_page:
+        st.session_state["browse_facets"] = facets
+    facets = st.session_state.get("browse_facets") or {}
     
     if not properties:
-        st.info("No properties are currently available.")
+        st.info("No properties match your search.")
         return
     
-    st.subheader(f"Found {len(properties)} properties")
+    if "total" in facets:
+        st.subheader(f"Found {facets['total']} properties (page {len(cursors)})")
+    else:
+        st.subheader(f"Available properties (page {len(cursors)})")
+    type_counts = ", ".join(f"{t.capitalize()}: {c}" for t, c in facets.get("types", {}).items())
+    price_counts = ", ".join(f"${p}: {c}" for p, c in facets.get("prices", {}).items())
+    if type_counts:
+        st.caption(f"By type: {type_counts}")
+    if price_counts:
+        st.caption(f"By price: {price_counts}")
+    
+    # One batched quote prices the stay at every listing on the page
+    stay_totals = PricingService.get_instance().quote_many(
+        {prop.id: prop.price for prop in properties}, stay[0], stay[1]
+    ) if stay else {}
     
     # Display properties
     for prop in properties:
-        # Use _id as the property ID if it exists
-        property_id = str(prop.get('_id', '')) if '_id' in prop else prop.get('property_id', '')
+        property_id = prop.id
         
-        with st.expander(f"{prop['title']} - {prop['location']} (${prop['price']}/night)"):
+        label = f"{prop.title} - {prop.location} (${prop.price}/night)"
+        if property_id in stay_totals:
+            label += f" - ${stay_totals[property_id]:.2f} for your stay"
+        with st.expander(label):
             col1, col2 = st.columns(2)
             
             with col1:
-                st.write(f"**Type:** {prop['type'].capitalize()}")
-                st.write(f"**Location:** {prop['location']}")
-                st.write(f"**Price:** ${prop['price']}/night")
+                st.write(f"**Type:** {prop.type.capitalize()}")
+                st.write(f"**Location:** {prop.location}")
+                st.write(f"**Price:** ${prop.price}/night")
                 
                 # Show property-specific details
-                if prop['type'] == 'apartment':
-                    st.write(f"**Floor:** {prop['floor_number']}")
-                    st.write(f"**Elevator:** {'Yes' if prop['has_elevator'] else 'No'}")
-                elif prop['type'] == 'house':
-                    st.write(f"**Floors:** {prop['floors']}")
-                    st.write(f"**Garden:** {'Yes' if prop['has_garden'] else 'No'}")
-                elif prop['type'] == 'villa':
-                    st.write(f"**Pool:** {'Yes' if prop['has_pool'] else 'No'}")
-                    st.write(f"**Private Access:** {'Yes' if prop['has_private_access'] else 'No'}")
+                if prop.type == 'apartment':
+                    st.write(f"**Floor:** {prop.floor_number}")
+                    st.write(f"**Elevator:** {'Yes' if prop.has_elevator else 'No'}")
+                elif prop.type == 'house':
+                    st.write(f"**Floors:** {prop.floors}")
+                    st.write(f"**Garden:** {'Yes' if prop.has_garden else 'No'}")
+                elif prop.type == 'villa':
+                    st.write(f"**Pool:** {'Yes' if prop.has_pool else 'No'}")
+                    st.write(f"**Private Access:** {'Yes' if prop.has_private_access else 'No'}")
                 
             with col2:
-                if prop['amenities']:
+                if prop.amenities:
                     st.write("**Amenities:**")
-                    for amenity in prop['amenities']:
+                    for amenity in prop.amenities:
                         st.write(f"- {amenity}")
                 
             # Add booking button for guests
-            user = st.session_state.get("user")
+            user = AuthService.get_instance().user_from_token(st.session_state.get("session_token"))
             if user and user.getUserType() == "guest":
                 if st.button(f"Book this property", key=f"book_{property_id}"):
                     # Store property_id in session state and switch to booking page
                     st.session_state["booking_property_id"] = property_id
                     st.switch_page("pages/BookingPage.py")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if len(cursors) > 1 and st.button("Previous page", key="browse_previous"):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        if next_cursor and st.button("Next page", key="browse_next"):
+            cursors.append(next_cursor)
+            st.rerun()
 
 def my_properties():
     """Show and manage host's own properties"""
-    user = st.session_state.get("user")
+    user = AuthService.get_instance().user_from_token(st.session_state.get("session_token"))
     if not user or user.getUserType() != "host":
         return
     
     property_service = PropertyService.get_instance()
+    
+    editing = st.session_state.get("editing_property")
+    if editing:
+        edit_property_form(property_service, user, editing)
+        pricing_form(user, editing)
+    
     host_properties = property_service.get_host_properties(user.getEmail())
     
     if not host_properties:
@@ -123,7 +248,9 @@ def my_properties():
                 with col2:
                     if st.button("Delete", key=f"delete_{property_id}"):
                         try:
-                            success, message = property_service.delete_property(property_id)
+                            success, message = property_service.delete_property_for_host(
+                                user.getEmail(), property_id
+                            )
                             if success:
                                 st.success(message)
                                 st.rerun()
@@ -185,5 +312,95 @@ def my_properties():
                 else:
                     st.error(message)
 
+def edit_property_form(property_service, user, prop):
+    """Edit form for one of the host's listings; saves only changed fields"""
+    property_id = str(prop["_id"])
+    st.subheader(f"Edit {prop['title']}")
+    
+    with st.form("edit_property_form"):
+        title = st.text_input("Title", value=prop["title"])
+        location = st.text_input("Location", value=prop["location"])
+        price = st.number_input("Price per Night", min_value=1.0, value=float(prop["price"]), step=5.0)
+        
+        if prop["type"] == "apartment":
+            floor_number = st.number_input("Floor Number", min_value=0, value=int(prop.get("floor_number") or 0))
+            has_elevator = st.checkbox("Has Elevator", value=bool(prop.get("has_elevator")))
+            specific_details = {"floor_number": floor_number, "has_elevator": has_elevator}
+        elif prop["type"] == "house":
+            floors = st.number_input("Number of Floors", min_value=1, value=int(prop.get("floors") or 1))
+            has_garden = st.checkbox("Has Garden", value=bool(prop.get("has_garden")))
+            specific_details = {"floors": floors, "has_garden": has_garden}
+        else:  # villa
+            has_pool = st.checkbox("Has Pool", value=bool(prop.get("has_pool")))
+            has_private_access = st.checkbox("Has Private Access", value=bool(prop.get("has_private_access")))
+            specific_details = {"has_pool": has_pool, "has_private_access": has_private_access}
+        
+        amenities = st.text_input("Amenities (comma separated)", value=", ".join(prop.get("amenities", [])))
+        
+        col1, col2 = st.columns(2)
+        save = col1.form_submit_button("Save Changes")
+        cancel = col2.form_submit_button("Cancel")
+    
+    if cancel:
+        st.session_state.pop("editing_property", None)
+        st.rerun()
+    
+    if save:
+        submitted = {
+            "title": title,
+            "location": location,
+            "price": price,
+            "amenities": [a.strip() for a in amenities.split(",")] if amenities else [],
+            **specific_details
+        }
+        # Send only what was edited; the version detects edits made elsewhere meanwhile
+        changes = {field: value for field, value in submitted.items() if prop.get(field) != value}
+        if not changes:
+            st.info("No changes to save.")
+            return
+        
+        success, message = property_service.update_property_for_host(
+            user.getEmail(), property_id, changes, expected_version=prop.get("version", 0)
+        )
+        if success:
+            st.session_state.pop("editing_property", None)
+            st.success(message)
+            st.rerun()
+        else:
+            st.error(message)
+
+def pricing_form(user, prop):
+    """Weekend and long-stay pricing of one of the host's listings"""
+    property_id = str(prop["_id"])
+    pricing_service = PricingService.get_instance()
+    rules = pricing_service.get_rules(property_id)
+    discounts = {rule["min_nights"]: rule["discount"] for rule in rules.get("length_of_stay", [])}
+    
+    with st.form("pricing_form"):
+        st.write("**Pricing**")
+        weekend_multiplier = st.number_input(
+            "Friday and Saturday night multiplier", min_value=0.1,
+            value=float(rules.get("weekend_multiplier", 1.0)), step=0.05
+        )
+        weekly = st.number_input("Discount for 7+ nights (%)", min_value=0.0, max_value=90.0,
+                                 value=discounts.get(7, 0.0) * 100, step=5.0)
+        monthly = st.number_input("Discount for 28+ nights (%)", min_value=0.0, max_value=90.0,
+                                  value=discounts.get(28, 0.0) * 100, step=5.0)
+        save = st.form_submit_button("Save Pricing")
+    
+    if save:
+        # Seasons and other stay lengths are kept as they are
+        length_of_stay = [rule for rule in rules.get("length_of_stay", []) if rule["min_nights"] not in (7, 28)]
+        length_of_stay += [{"min_nights": nights, "discount": percent / 100}
+                           for nights, percent in ((7, weekly), (28, monthly)) if percent]
+        updated = {field: value for field, value in rules.items() if field in ("weekend_days", "seasons")}
+        updated["weekend_multiplier"] = weekend_multiplier
+        updated["length_of_stay"] = length_of_stay
+        success, message = pricing_service.set_rules_for_host(user.getEmail(), property_id, updated)
+        if success:
+            st.success(message)
+        else:
+            st.error(message)
+
 # Call the render function to display the page
 render()
\ No newline at end of file
@@ -12,22 +12,16 @@ def render():
         
         if submit:
             try:
-                # Get user from database - unpack the tuple
-                user, message = AuthService.get_instance().get_user(email,password)
+                # One query to verify the password; the signed token stands in for the user afterwards
+                token, user, message = AuthService.get_instance().login(email,password)
                 
                 if not user:
-                    st.error("User not found!")
-                    return
-                    
-                # Verify password using login_user method
-                success, message = AuthService.get_instance().login_user(user)
-                if not success:
-                    st.error("Invalid password!")
+                    st.error("Invalid email or password!")
                     return
                 
                 
                 # Store user info in session state
-                st.session_state["user"] = user
+                st.session_state["session_token"] = token
                 st.session_state["authenticated"] = True
                 st.session_state["user_type"] = user.getUserType()  # This is already a string
                 
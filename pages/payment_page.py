@@ -9,6 +9,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from payment.payment import Payment
 from payment.payment_strategy import CreditCardStrategy, PayPalStrategy, BankTransferStrategy
 from payment.db_connection import get_central_account, initialize_dummy_accounts
+from booking.booking_service import BookingService
 
 # Initialize MongoDB with dummy accounts
 initialize_dummy_accounts()
@@ -55,6 +56,27 @@ def show_payment_selection():
         if st.button("Bank Transfer", use_container_width=True):
             st.session_state.payment_method = "Bank Transfer"
 
+def pay_for_booking(payment, booking_id):
+    """Charge a held booking and confirm it.
+
+    The hold is extended first, so an expired hold is reported before
+    the guest is charged and a live one cannot run out mid-payment.
+    """
+    booking_service = BookingService.get_instance()
+    held, message = booking_service.extend_hold(booking_id)
+    if not held:
+        st.error(message)
+        return False
+    if not payment.process_payment():
+        st.error("Payment failed. Please check your credentials and balance.")
+        return False
+    confirmed, message = booking_service.confirm_booking(booking_id)
+    if not confirmed:
+        st.error(f"{message} Please contact support about booking {booking_id}.")
+        return False
+    st.success(message)
+    return True
+
 def show_credit_card():
     st.title("Credit Card Payment")
     st.button("← Back to Payment Methods", on_click=lambda: setattr(st.session_state, 'payment_method', None))
@@ -76,7 +98,7 @@ def show_credit_card():
         if all([card_number, name_on_card, expiry_date, cvv]):
             strategy = CreditCardStrategy(card_number, name_on_card, expiry_date, cvv)
             payment = Payment(str(uuid.uuid4()), booking_id, amount, strategy)
-            if payment.process_payment():
+            if pay_for_booking(payment, booking_id):
                 st.success("Payment processed successfully!")
                 st.write(payment.generate_receipt())
                 central_account = get_central_account()
@@ -87,8 +109,6 @@ def show_credit_card():
                         st.write(payment.generate_receipt())
                         central_account = get_central_account()
                         st.write(f"Central Account Balance: ${central_account['balance']:.2f}")
-            else:
-                st.error("Payment failed. Please check your credentials and balance.")
         else:
             st.error("Please fill in all credit card details")
 
@@ -111,7 +131,7 @@ def show_paypal():
         if all([email, password]):
             strategy = PayPalStrategy(email, password)
             payment = Payment(str(uuid.uuid4()), booking_id, amount, strategy)
-            if payment.process_payment():
+            if pay_for_booking(payment, booking_id):
                 st.success("Payment processed successfully!")
                 st.write(payment.generate_receipt())
                 central_account = get_central_account()
@@ -122,8 +142,6 @@ def show_paypal():
                         st.write(payment.generate_receipt())
                         central_account = get_central_account()
                         st.write(f"Central Account Balance: ${central_account['balance']:.2f}")
-            else:
-                st.error("Payment failed. Please check your credentials and balance.")
         else:
             st.error("Please fill in all PayPal details")
 
@@ -146,7 +164,7 @@ def show_bank_transfer():
         if all([account_number, bank_code]):
             strategy = BankTransferStrategy(account_number, bank_code)
             payment = Payment(str(uuid.uuid4()), booking_id, amount, strategy)
-            if payment.process_payment():
+            if pay_for_booking(payment, booking_id):
                 st.success("Payment processed successfully!")
                 st.write(payment.generate_receipt())
                 central_account = get_central_account()
@@ -157,8 +175,6 @@ def show_bank_transfer():
                         st.write(payment.generate_receipt())
                         central_account = get_central_account()
                         st.write(f"Central Account Balance: ${central_account['balance']:.2f}")
-            else:
-                st.error("Payment failed. Please check your credentials and balance.")
         else:
             st.error("Please fill in all bank transfer details")
 
@@ -0,0 +1,86 @@
+# property/async_property_service.py
+from database.mongodb import PROPERTIES
+from database.async_repository import get_async_repository
+from property.property_factory import PropertyFactory
+from datetime import datetime
+from property.property_service import (
+    property_id_filter, property_from_document, build_property_update, update_failure_message,
+    update_failure_projection, normalize_details, invalidate_calendar
+)
+
+
+class AsyncPropertyService:
+    """Asyncio counterpart of PropertyService, sharing its domain objects"""
+    _instance = None
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = AsyncPropertyService()
+        return cls._instance
+
+    def __init__(self, repository=None):
+        self._repository = repository
+
+    @property
+    def repository(self):
+        """Injected repository, or the one of the active backend"""
+        return self._repository or get_async_repository(PROPERTIES)
+    
+    async def create_property(self, host_id, property_type, details):
+        """Create a new property listing"""
+        details["host_id"] = host_id
+        creator = PropertyFactory.get_creator(property_type)
+        property_obj = creator.create_property(normalize_details(details))
+        result = await self.repository.insert_one(dict(property_obj.get_details(), created_at=datetime.now()))
+        
+        if result.inserted_id:
+            return str(result.inserted_id), f"Property '{details['title']}' created successfully."
+        return None, "Failed to create property."
+    
+    async def get_property(self, property_id):
+        """Get property by ID"""
+        try:
+            property_data = await self.repository.find_one(property_id_filter(property_id))
+            
+            if not property_data:
+                return None, "Property not found."
+            
+            return property_from_document(property_data), "Property found."
+        except Exception as e:
+            return None, f"Error retrieving property: {str(e)}"
+    
+    async def update_property(self, property_id, details, expected_version=None):
+        """Update property details in a single find_one_and_update"""
+        command, message = build_property_update(property_id, details, expected_version)
+        if command is None:
+            return False, message
+        
+        query, update = command
+        property_data = await self.repository.find_one_and_update(query, update, return_document=True)
+        if not property_data:
+            changes = update["$set"]
+            current = await self.repository.find_one(property_id_filter(property_id), update_failure_projection(changes))
+            return False, update_failure_message(current, expected_version, changes=changes)
+        if "availability" in update["$set"]:
+            invalidate_calendar(property_id)
+        return True, "Property updated successfully."
+    
+    async def delete_property(self, property_id):
+        """Delete a property"""
+        try:
+            result = await self.repository.delete_one(property_id_filter(property_id))
+            
+            if result.deleted_count > 0:
+                return True, "Property deleted successfully."
+            return False, "Property not found or could not be deleted."
+        except Exception as e:
+            return False, f"Error deleting property: {str(e)}"
+    
+    async def list_properties(self, filters=None):
+        """List properties with optional filters"""
+        properties_data = await self.repository.find(filters if filters else {})
+        return [property_from_document(prop_data).get_details() for prop_data in properties_data]
+    
+    async def get_host_properties(self, host_id):
+        """Get all properties for a specific host"""
+        return await self.list_properties({"host_id": host_id})
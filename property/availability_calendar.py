@@ -0,0 +1,146 @@
+# property/availability_calendar.py
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime
+import threading
+
+
+def day_number(value):
+    """Day ordinal of a date given as "YYYY-MM-DD", date or datetime"""
+    if isinstance(value, str):
+        value = datetime.strptime(value[:10], "%Y-%m-%d")
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.toordinal()
+    if isinstance(value, int):
+        return value
+    raise ValueError(f"Invalid date: {value!r}")
+
+
+def _merge(intervals):
+    """Sort and merge half-open intervals into two parallel lists"""
+    starts, ends = [], []
+    for start, end in sorted(intervals):
+        if starts and start <= ends[-1]:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+def merge_availability(availability):
+    """Declared ranges with overlapping and touching ones merged, as "YYYY-MM-DD" ranges.
+
+    The calendar treats 02-01..02-10 and 02-10..02-20 as one range, while
+    a database query can only look at one stored range at a time; listings
+    store merged ranges so both agree. Empty ranges are dropped.
+    """
+    starts, ends = _merge(
+        (start, end)
+        for start, end in ((day_number(r["start_date"]), day_number(r["end_date"])) for r in availability or [])
+        if start < end
+    )
+    return [
+        {"start_date": date.fromordinal(start).isoformat(), "end_date": date.fromordinal(end).isoformat()}
+        for start, end in zip(starts, ends)
+    ]
+
+
+class AvailabilityCalendar:
+    """Open and booked nights of one property as sorted interval lists.
+
+    Stays and ranges are half-open in days: a stay from check_in to
+    check_out occupies the nights check_in .. check_out - 1, and a
+    declared {"start_date", "end_date"} range accepts stays checking out
+    on end_date at the latest. A property without declared ranges is open
+    every night. Queries bisect into the merged lists, so they take
+    O(log n); bookings are added and removed without a rebuild.
+    """
+
+    def __init__(self, availability=None, bookings=()):
+        self._lock = threading.Lock()
+        self.set_availability(availability)
+        # Every booking, sorted by (start, end, id), plus the merged busy spans
+        self._bookings = {}
+        self._booking_list = []
+        for booking_id, check_in, check_out in bookings:
+            start, end = day_number(check_in), day_number(check_out)
+            if start < end:
+                self._bookings[booking_id] = (start, end)
+                self._booking_list.append((start, end, booking_id))
+        self._booking_list.sort()
+        self._busy_starts, self._busy_ends = _merge((s, e) for s, e, _ in self._booking_list)
+
+    def set_availability(self, availability):
+        """Replace the host-declared ranges; empty means always open"""
+        ranges = [(day_number(r["start_date"]), day_number(r["end_date"])) for r in availability or []]
+        with self._lock:
+            if ranges:
+                self._open_starts, self._open_ends = _merge((s, e) for s, e in ranges if s < e)
+            else:
+                self._open_starts = self._open_ends = None
+
+    def is_open(self, check_in, check_out):
+        """Whether one declared range covers the whole stay"""
+        start, end = day_number(check_in), day_number(check_out)
+        with self._lock:
+            if self._open_starts is None:
+                return True
+            # Ranges are merged, so a covered stay lies inside a single one
+            i = bisect_right(self._open_starts, start) - 1
+            return i >= 0 and end <= self._open_ends[i]
+
+    def is_booked(self, check_in, check_out):
+        """Whether any booking overlaps the stay"""
+        start, end = day_number(check_in), day_number(check_out)
+        with self._lock:
+            # First busy span ending after the stay starts
+            i = bisect_right(self._busy_ends, start)
+            return i < len(self._busy_starts) and self._busy_starts[i] < end
+
+    def is_available(self, check_in, check_out):
+        """Whether the stay is inside declared availability and free of bookings"""
+        if day_number(check_out) <= day_number(check_in):
+            return False
+        return self.is_open(check_in, check_out) and not self.is_booked(check_in, check_out)
+
+    def is_available_on(self, day):
+        """Whether the night starting on day can be booked"""
+        day = day_number(day)
+        return self.is_available(day, day + 1)
+
+    def add_booking(self, booking_id, check_in, check_out):
+        start, end = day_number(check_in), day_number(check_out)
+        with self._lock:
+            if booking_id in self._bookings or start >= end:
+                return
+            self._bookings[booking_id] = (start, end)
+            insort(self._booking_list, (start, end, booking_id))
+            # Fold the stay into the busy spans it touches
+            lo = bisect_left(self._busy_ends, start)
+            hi = bisect_right(self._busy_starts, end)
+            if lo < hi:
+                start = min(start, self._busy_starts[lo])
+                end = max(end, self._busy_ends[hi - 1])
+            self._busy_starts[lo:hi] = [start]
+            self._busy_ends[lo:hi] = [end]
+
+    def remove_booking(self, booking_id):
+        with self._lock:
+            span = self._bookings.pop(booking_id, None)
+            if span is None:
+                return
+            start, end = span
+            del self._booking_list[bisect_left(self._booking_list, (start, end, booking_id))]
+            # Re-merge only the bookings of the busy span the stay belonged to
+            i = bisect_right(self._busy_starts, start) - 1
+            block_start, block_end = self._busy_starts[i], self._busy_ends[i]
+            lo = bisect_left(self._booking_list, (block_start,))
+            hi = bisect_left(self._booking_list, (block_end,))
+            starts, ends = _merge((s, e) for s, e, _ in self._booking_list[lo:hi])
+            self._busy_starts[i:i + 1] = starts
+            self._busy_ends[i:i + 1] = ends
+
+    def __len__(self):
+        return len(self._bookings)
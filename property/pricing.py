@@ -0,0 +1,199 @@
+# property/pricing.py
+"""Nightly price quotes from per-property pricing rules.
+
+A listing's rule set is stored in pricing_rules under the listing's id:
+
+    {
+        "weekend_multiplier": 1.2,
+        "weekend_days": [4, 5],          # nights starting Friday and Saturday
+        "seasons": [{"start_date": "2030-07-01", "end_date": "2030-09-01", "multiplier": 1.5}],
+        "length_of_stay": [{"min_nights": 7, "discount": 0.1}],
+    }
+
+Every part is optional; a listing without rules is quoted at its flat
+price. Seasons are half-open like availability ranges, and overlapping
+seasons multiply. Weekdays count from Monday = 0. The longest-stay rule
+the stay qualifies for discounts every night.
+
+quote_prices() prices many listings over one date range in a single pass
+over NumPy arrays of shape (listings, nights), which is what search
+results need; quote_stay() is the one-listing case.
+"""
+from datetime import datetime
+import os
+
+import numpy as np
+
+from database.cache import LRUTTLCache
+from database.mongodb import PRICING_RULES
+from database.repository import get_repository
+from property.availability_calendar import day_number
+
+PRICING_CACHE_SIZE = int(os.getenv("PRICING_CACHE_SIZE", "1024"))
+PRICING_CACHE_TTL = float(os.getenv("PRICING_CACHE_TTL", "30"))
+
+DEFAULT_WEEKEND_DAYS = (4, 5)
+RULE_FIELDS = ("weekend_multiplier", "weekend_days", "seasons", "length_of_stay")
+
+
+def validate_pricing_rules(rules):
+    """Return an error message for an invalid rule set, or None"""
+    if not isinstance(rules, dict):
+        return "Pricing rules must be an object."
+    unknown = set(rules) - set(RULE_FIELDS)
+    if unknown:
+        return f"Unknown pricing rule: {', '.join(sorted(unknown))}."
+    try:
+        if float(rules.get("weekend_multiplier", 1)) <= 0:
+            return "Weekend multiplier must be positive."
+        if any(int(day) not in range(7) for day in rules.get("weekend_days", DEFAULT_WEEKEND_DAYS)):
+            return "Weekend days must be between 0 (Monday) and 6 (Sunday)."
+        for season in rules.get("seasons", []):
+            if day_number(season["start_date"]) >= day_number(season["end_date"]):
+                return "Season must end after it starts."
+            if float(season["multiplier"]) <= 0:
+                return "Season multiplier must be positive."
+        for rule in rules.get("length_of_stay", []):
+            if int(rule["min_nights"]) < 1:
+                return "Length-of-stay rules need min_nights of at least 1."
+            if not 0 <= float(rule["discount"]) < 1:
+                return "Length-of-stay discount must be between 0 and 1."
+    except (KeyError, TypeError, ValueError) as e:
+        return f"Invalid pricing rules: {str(e)}"
+    return None
+
+
+def quote_prices(base_prices, rule_sets, check_in, check_out):
+    """Nightly prices of many listings for one stay.
+
+    base_prices and rule_sets are parallel sequences (a rule set may be
+    None). Returns a (listings, nights) float array rounded to cents.
+    """
+    start, end = day_number(check_in), day_number(check_out)
+    nights = max(end - start, 0)
+    days = np.arange(start, start + nights)
+    # date.toordinal() is 1 for Monday 0001-01-01
+    weekdays = (days - 1) % 7
+    count = len(base_prices)
+
+    weekend_multipliers = np.ones(count)
+    weekend_days = np.zeros((count, 7), dtype=bool)
+    season_rows, season_starts, season_ends, season_multipliers = [], [], [], []
+    stay_rows, stay_discounts = [], []
+    for row, rules in enumerate(rule_sets):
+        if not rules:
+            continue
+        weekend_multipliers[row] = rules.get("weekend_multiplier", 1)
+        weekend_days[row, list(rules.get("weekend_days", DEFAULT_WEEKEND_DAYS))] = True
+        for season in rules.get("seasons", []):
+            season_rows.append(row)
+            season_starts.append(day_number(season["start_date"]))
+            season_ends.append(day_number(season["end_date"]))
+            season_multipliers.append(season["multiplier"])
+        for rule in rules.get("length_of_stay", []):
+            if nights >= rule["min_nights"]:
+                stay_rows.append(row)
+                stay_discounts.append(rule["discount"])
+
+    multipliers = np.where(weekend_days[:, weekdays], weekend_multipliers[:, None], 1.0)
+    if season_rows:
+        # One row per season: its multiplier on the nights it covers, 1 elsewhere
+        starts, ends = np.array(season_starts)[:, None], np.array(season_ends)[:, None]
+        covered = (days >= starts) & (days < ends)
+        np.multiply.at(multipliers, np.array(season_rows),
+                       np.where(covered, np.array(season_multipliers, dtype=float)[:, None], 1.0))
+    discounts = np.zeros(count)
+    if stay_rows:
+        np.maximum.at(discounts, np.array(stay_rows), np.array(stay_discounts, dtype=float))
+
+    prices = np.asarray(base_prices, dtype=float)[:, None] * multipliers * (1 - discounts)[:, None]
+    return np.round(prices, 2)
+
+
+def quote_stay(base_price, rules, check_in, check_out):
+    """Quote of one listing: {"nightly_prices": [...], "total_price": float, "nights": int}"""
+    prices = quote_prices([base_price], [rules], check_in, check_out)[0]
+    return {
+        "nightly_prices": prices.tolist(),
+        "total_price": round(float(prices.sum()), 2),
+        "nights": len(prices),
+    }
+
+
+class PricingService:
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = PricingService()
+        return cls._instance
+
+    def __init__(self, repository=None, cache=None):
+        self._repository = repository
+        # Listings without rules are cached as {} so they are not read again
+        self._cache = cache if cache is not None else LRUTTLCache(PRICING_CACHE_SIZE, PRICING_CACHE_TTL)
+
+    @property
+    def repository(self):
+        """Injected repository, or the one of the active backend"""
+        return self._repository or get_repository(PRICING_RULES)
+
+    def get_rules(self, property_id):
+        """The rule set of a listing, {} if it has none"""
+        return self.get_rules_many([property_id])[str(property_id)]
+
+    def get_rules_many(self, property_ids):
+        """{property_id: rule set} for many listings, reading the cache misses in one query"""
+        rules = {}
+        missing = []
+        for property_id in map(str, property_ids):
+            cached = self._cache.get(property_id)
+            if cached is None:
+                missing.append(property_id)
+            else:
+                rules[property_id] = cached
+        if missing:
+            found = {
+                document.pop("_id"): document
+                for document in self.repository.find({"_id": {"$in": missing}}, {field: 1 for field in RULE_FIELDS})
+            }
+            for property_id in missing:
+                rules[property_id] = found.get(property_id, {})
+                self._cache.set(property_id, rules[property_id])
+        return rules
+
+    def set_rules(self, property_id, rules):
+        """Store a listing's rule set, replacing the previous one"""
+        error = validate_pricing_rules(rules)
+        if error:
+            return False, error
+        update = {"$set": dict({field: rules[field] for field in RULE_FIELDS if field in rules},
+                               updated_at=datetime.now())}
+        dropped = {field: "" for field in RULE_FIELDS if field not in rules}
+        if dropped:
+            update["$unset"] = dropped
+        self.repository.update_one({"_id": str(property_id)}, update, upsert=True)
+        self._cache.invalidate(str(property_id))
+        return True, "Pricing rules saved."
+
+    def set_rules_for_host(self, host_id, property_id, rules):
+        """Store a rule set, provided the listing belongs to host_id"""
+        from property.property_service import PropertyService
+        property_obj, _ = PropertyService.get_instance().get_property(property_id)
+        if not property_obj or property_obj.get_host_id() != host_id:
+            return False, "Property not found or you do not own it."
+        return self.set_rules(property_id, rules)
+
+    def quote(self, property_obj, check_in, check_out):
+        """Quote a stay at one listing, see quote_stay"""
+        property_id = str(property_obj.get_id())
+        return quote_stay(property_obj.get_details().get("price", 0), self.get_rules(property_id), check_in, check_out)
+
+    def quote_many(self, base_prices, check_in, check_out):
+        """Total price of the same stay at many listings, given {property_id: flat price}"""
+        property_ids = list(base_prices)
+        rules = self.get_rules_many(property_ids)
+        prices = quote_prices([base_prices[pid] for pid in property_ids],
+                              [rules[str(pid)] for pid in property_ids], check_in, check_out)
+        return dict(zip(property_ids, np.round(prices.sum(axis=1), 2).tolist()))
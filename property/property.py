@@ -1,8 +1,12 @@
 # property/property.py
 from abc import ABC, abstractmethod
 from bson import ObjectId
+from property.availability_calendar import AvailabilityCalendar
 
 class Property(ABC):
+    # Fields a partial update may write; subclasses add their own
+    EDITABLE_FIELDS = ("title", "location", "price", "amenities", "images", "availability")
+    
     def __init__(self, property_id, host_id, title, location, price, amenities=None, images=None, availability=None):
         self._property_id = property_id if property_id else str(ObjectId())
         self._host_id = host_id
@@ -12,12 +16,20 @@ class Property(ABC):
         self._amenities = amenities if amenities else []
         self._images = images if images else []
         self._availability = availability if availability else []
+        # Incremented on every update, for optimistic concurrency checks
+        self._version = 0
         
     def get_id(self):
         return self._property_id
         
     def get_host_id(self):
         return self._host_id
+    
+    def get_version(self):
+        return self._version
+    
+    def set_version(self, version):
+        self._version = version
         
     def get_details(self):
         return {
@@ -29,7 +41,8 @@ class Property(ABC):
             "amenities": self._amenities,
             "images": self._images,
             "availability": self._availability,
-            "type": self.get_type()
+            "type": self.get_type(),
+            "version": self._version
         }
     
     def update_details(self, details):
@@ -48,17 +61,20 @@ class Property(ABC):
         return True
     
     def check_availability(self, dates):
-        # Simple availability check (can be enhanced)
-        for available_range in self._availability:
-            if dates["start_date"] >= available_range["start_date"] and dates["end_date"] <= available_range["end_date"]:
-                return True
-        return False
+        """Whether the declared availability covers dates; bookings are checked by BookingService"""
+        return self.get_calendar().is_open(dates["start_date"], dates["end_date"])
+    
+    def get_calendar(self, bookings=()):
+        """AvailabilityCalendar of the declared ranges and the given (id, check_in, check_out) bookings"""
+        return AvailabilityCalendar(self._availability, bookings)
     
     @abstractmethod
     def get_type(self):
         pass
 
 class Apartment(Property):
+    EDITABLE_FIELDS = Property.EDITABLE_FIELDS + ("floor_number", "has_elevator")
+    
     def __init__(self, property_id, host_id, title, location, price, floor_number, has_elevator, amenities=None, images=None, availability=None):
         super().__init__(property_id, host_id, title, location, price, amenities, images, availability)
         self._floor_number = floor_number
@@ -76,6 +92,8 @@ class Apartment(Property):
         return details
 
 class House(Property):
+    EDITABLE_FIELDS = Property.EDITABLE_FIELDS + ("floors", "has_garden")
+    
     def __init__(self, property_id, host_id, title, location, price, floors, has_garden, amenities=None, images=None, availability=None):
         super().__init__(property_id, host_id, title, location, price, amenities, images, availability)
         self._floors = floors
@@ -93,6 +111,8 @@ class House(Property):
         return details
 
 class Villa(Property):
+    EDITABLE_FIELDS = Property.EDITABLE_FIELDS + ("has_pool", "has_private_access")
+    
     def __init__(self, property_id, host_id, title, location, price, has_pool, has_private_access, amenities=None, images=None, availability=None):
         super().__init__(property_id, host_id, title, location, price, amenities, images, availability)
         self._has_pool = has_pool
@@ -14,7 +14,9 @@ class PropertyCreator(ABC):
         """
         Calls the factory method to create the property.
         """
-        return self.factory_method(details)
+        property_obj = self.factory_method(details)
+        property_obj.set_version(details.get("version", 0))
+        return property_obj
 
 
 class ApartmentCreator(PropertyCreator):
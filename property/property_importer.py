@@ -0,0 +1,106 @@
+# property/property_importer.py
+"""Stream a CSV or JSONL file of listings into PropertyService.
+
+Usage:
+    python -m property.property_importer listings.csv --host partner@example.com
+
+CSV files need a header row. List columns (amenities, images) are
+separated by ";" and flag columns accept true/false, yes/no or 1/0.
+JSONL files hold one listing object per line. Every row needs a "type"
+column: apartment, house or villa.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from property.property_service import PropertyService, BULK_CHUNK_SIZE
+
+NUMBER_FIELDS = {"price": float, "floor_number": int, "floors": int}
+FLAG_FIELDS = {"has_elevator", "has_garden", "has_pool", "has_private_access"}
+LIST_FIELDS = {"amenities", "images"}
+
+
+def _parse_flag(value):
+    normalized = value.strip().lower()
+    if normalized in ("true", "yes", "1", "y"):
+        return True
+    if normalized in ("false", "no", "0", "n", ""):
+        return False
+    return value
+
+
+def parse_csv_row(row):
+    """Convert the string cells of a CSV row to the types listings use.
+
+    Cells that cannot be converted are kept as they are and reported by
+    the validation in PropertyService.create_properties_bulk.
+    """
+    details = {}
+    for field, value in row.items():
+        if field is None or value is None:
+            continue
+        field = field.strip()
+        value = value.strip()
+        if field in NUMBER_FIELDS:
+            try:
+                value = NUMBER_FIELDS[field](value)
+            except ValueError:
+                pass
+        elif field in FLAG_FIELDS:
+            value = _parse_flag(value)
+        elif field in LIST_FIELDS:
+            value = [item.strip() for item in value.split(";") if item.strip()]
+        details[field] = value
+    return details
+
+
+def read_rows(path, file_format=None):
+    """Yield one details dict per row; malformed JSON lines yield None"""
+    file_format = file_format or ("jsonl" if path.endswith((".jsonl", ".json")) else "csv")
+    with open(path, newline="", encoding="utf-8") as f:
+        if file_format == "csv":
+            for row in csv.DictReader(f):
+                yield parse_csv_row(row)
+        else:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m property.property_importer",
+                                     description="Bulk import property listings")
+    parser.add_argument("path", help="CSV or JSONL file")
+    parser.add_argument("--host", required=True, help="host_id (email) that will own the listings")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE)
+    parser.add_argument("--max-errors", type=int, default=20, help="number of row errors to print")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        print(f"File not found: {args.path}", file=sys.stderr)
+        return 2
+
+    started = time.perf_counter()
+    report = PropertyService.get_instance().create_properties_bulk(
+        args.host, read_rows(args.path, args.format), chunk_size=args.chunk_size
+    )
+    elapsed = time.perf_counter() - started
+
+    print(f"Inserted {report['inserted']} properties, {report['failed']} failed in {elapsed:.2f}s.")
+    for row_number, error in report["errors"][:args.max_errors]:
+        print(f"  row {row_number}: {error}")
+    if len(report["errors"]) > args.max_errors:
+        print(f"  ... {len(report['errors']) - args.max_errors} more")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# property/property_search.py
+import re
+
+# Flags that only exist on one property type, mapped to that type
+TYPE_FLAGS = {
+    "has_elevator": "apartment",
+    "has_garden": "house",
+    "has_pool": "villa",
+    "has_private_access": "villa",
+}
+
+# Lower bounds of the price facet buckets; prices above the last one are "1000+"
+PRICE_BUCKETS = [0, 50, 100, 200, 500, 1000]
+
+
+class PropertySearch:
+    """Typed search criteria for PropertyService.search_properties.
+
+    Every criterion is optional. amenities must all be present on a
+    listing; location_prefix matches the start of the location and is
+    case sensitive so the location index can serve it. Type flags only
+    filter when set to True.
+    """
+
+    def __init__(self, price_min=None, price_max=None, property_type=None, amenities=None,
+                 location_prefix=None, has_pool=None, has_elevator=None, has_garden=None,
+                 has_private_access=None):
+        self.price_min = price_min
+        self.price_max = price_max
+        self.property_type = property_type.lower() if property_type else None
+        self.amenities = list(amenities) if amenities else []
+        self.location_prefix = location_prefix.strip() if location_prefix else None
+        self.flags = {
+            "has_pool": has_pool,
+            "has_elevator": has_elevator,
+            "has_garden": has_garden,
+            "has_private_access": has_private_access,
+        }
+
+    def to_query(self):
+        """Compile the criteria to a MongoDB filter"""
+        query = {}
+        if self.property_type:
+            query["type"] = self.property_type
+        if self.price_min is not None or self.price_max is not None:
+            price = {}
+            if self.price_min is not None:
+                price["$gte"] = self.price_min
+            if self.price_max is not None:
+                price["$lte"] = self.price_max
+            query["price"] = price
+        if self.amenities:
+            query["amenities"] = {"$all": self.amenities}
+        if self.location_prefix:
+            # An anchored, case-sensitive regex is answered from the index
+            query["location"] = {"$regex": "^" + re.escape(self.location_prefix)}
+        for flag, value in self.flags.items():
+            if value:
+                query[flag] = True
+                # A flag implies its type, which lets the (type, price) index apply
+                query.setdefault("type", TYPE_FLAGS[flag])
+        return query
+
+    def __eq__(self, other):
+        return isinstance(other, PropertySearch) and self.to_query() == other.to_query()
+
+    def __repr__(self):
+        return f"PropertySearch({self.to_query()!r})"
+
+
+def facet_pipeline(query):
+    """Aggregation computing type, amenity and price-bucket counts for query"""
+    return [
+        {"$match": query},
+        {"$facet": {
+            "total": [{"$count": "count"}],
+            "types": [
+                {"$group": {"_id": "$type", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+            ],
+            "amenities": [
+                {"$unwind": "$amenities"},
+                {"$group": {"_id": "$amenities", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+            ],
+            "prices": [
+                {"$bucket": {
+                    "groupBy": "$price",
+                    "boundaries": PRICE_BUCKETS,
+                    "default": f"{PRICE_BUCKETS[-1]}+",
+                    "output": {"count": {"$sum": 1}},
+                }},
+            ],
+        }},
+    ]
+
+
+def parse_facets(result):
+    """Turn the facet aggregation output into plain dicts of counts"""
+    facets = result[0] if result else {}
+    total = facets.get("total") or [{"count": 0}]
+    prices = {}
+    for bucket in facets.get("prices", []):
+        lower = bucket["_id"]
+        if isinstance(lower, str):
+            prices[lower] = bucket["count"]
+        else:
+            upper = PRICE_BUCKETS[PRICE_BUCKETS.index(lower) + 1]
+            prices[f"{lower}-{upper}"] = bucket["count"]
+    return {
+        "total": total[0]["count"],
+        "types": {f["_id"]: f["count"] for f in facets.get("types", [])},
+        "amenities": {f["_id"]: f["count"] for f in facets.get("amenities", [])},
+        "prices": prices,
+    }
@@ -1,9 +1,230 @@
 # property/property_service.py
-from database.mongodb import db
+from database.mongodb import PROPERTIES, BOOKING
+from database.repository import get_repository
+from database.pagination import (
+    read_page, parse_sort, keyset_filter, encode_cursor, decode_cursor, combine_filters
+)
+from database.cache import LRUTTLCache
 from property.property_factory import PropertyFactory
+from property.property import Apartment, House, Villa
+from property.property_summary import PropertySummary, SUMMARY_PROJECTION
+from property.property_search import facet_pipeline, parse_facets
+from property.availability_calendar import day_number, merge_availability
+from booking.booking_status import active_booking_filter
 from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from datetime import date, datetime
+import os
+
+DEFAULT_PAGE_SIZE = 20
+BULK_CHUNK_SIZE = 1000
+
+# Read-through cache of Property objects, sized from the environment
+PROPERTY_CACHE_SIZE = int(os.getenv("PROPERTY_CACHE_SIZE", "1024"))
+PROPERTY_CACHE_TTL = float(os.getenv("PROPERTY_CACHE_TTL", "30"))
+
+# Whole-number fields of each listing type
+INTEGER_FIELDS = {
+    "apartment": ("floor_number",),
+    "house": ("floors",),
+}
+
+# True/false fields of each listing type
+FLAG_FIELDS = {
+    "apartment": ("has_elevator",),
+    "house": ("has_garden",),
+    "villa": ("has_pool", "has_private_access"),
+}
+
+EDITABLE_FIELDS = {
+    "apartment": Apartment.EDITABLE_FIELDS,
+    "house": House.EDITABLE_FIELDS,
+    "villa": Villa.EDITABLE_FIELDS,
+}
+
+
+def property_id_filter(property_id):
+    """Match a property stored under a string id or a legacy ObjectId"""
+    if isinstance(property_id, str) and ObjectId.is_valid(property_id):
+        return {"_id": {"$in": [property_id, ObjectId(property_id)]}}
+    return {"_id": property_id}
+
+
+def validate_property_field(field, value):
+    """Return an error message for an invalid value of one listing field, or None"""
+    if field in ("title", "location"):
+        if not isinstance(value, str) or not value.strip():
+            return f"Missing {field}."
+    elif field == "price":
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+            return "Price must be a positive number."
+    elif any(field in fields for fields in INTEGER_FIELDS.values()):
+        if isinstance(value, bool) or not isinstance(value, int):
+            return f"{field.replace('_', ' ').capitalize()} must be a whole number."
+    elif any(field in fields for fields in FLAG_FIELDS.values()):
+        if not isinstance(value, bool):
+            return f"{field.replace('_', ' ').capitalize()} must be true or false."
+    elif field in ("amenities", "images", "availability"):
+        if not isinstance(value, list):
+            return f"{field.capitalize()} must be a list."
+        if field == "availability":
+            try:
+                merge_availability(value)
+            except (KeyError, TypeError, ValueError):
+                return "Availability ranges need a start_date and an end_date."
+    return None
+
+
+def normalize_details(details):
+    """details with its availability ranges merged, ready to be stored"""
+    if details.get("availability"):
+        return dict(details, availability=merge_availability(details["availability"]))
+    return details
+
+
+def validate_property_details(details):
+    """Return an error message for an invalid listing, or None"""
+    if not isinstance(details, dict):
+        return "Invalid row: expected an object."
+    for field in ("title", "location", "price"):
+        error = validate_property_field(field, details.get(field))
+        if error:
+            return error
+    property_type = details.get("type")
+    for field in (*INTEGER_FIELDS.get(property_type, ()), *FLAG_FIELDS.get(property_type, ()),
+                  "amenities", "images", "availability"):
+        if field in details:
+            error = validate_property_field(field, details[field])
+            if error:
+                return error
+    return None
+
+
+def version_filter(version):
+    """Match documents at version; listings written before versioning count as 0"""
+    if version == 0:
+        return {"$or": [{"version": 0}, {"version": {"$exists": False}}]}
+    return {"version": version}
+
+
+def build_property_update(property_id, details, expected_version=None, current=None):
+    """Build the (filter, update) pair of a partial property update.
+
+    Only editable fields are written, and with current (a Property at
+    expected_version) only those that differ from it. Fields specific to
+    one type restrict the filter to that type, and the filter only
+    matches a listing that differs in at least one field, so an update
+    that changes nothing neither writes nor bumps the version. Returns
+    (None, message) when there is nothing to write.
+    """
+    changes = {}
+    for field, value in details.items():
+        if not any(field in fields for fields in EDITABLE_FIELDS.values()):
+            return None, f"Field '{field}' cannot be updated."
+        error = validate_property_field(field, value)
+        if error:
+            return None, error
+        changes[field] = value
+    changes = normalize_details(changes)
+    
+    if current is not None and current.get_version() == expected_version:
+        current_details = current.get_details()
+        changes = {field: value for field, value in changes.items() if current_details.get(field) != value}
+    if not changes:
+        return None, "No changes made to property."
+    
+    query = property_id_filter(property_id)
+    types = [t for t, fields in EDITABLE_FIELDS.items() if all(field in fields for field in changes)]
+    if not types:
+        return None, "These fields do not apply to the same property type."
+    if len(types) < len(EDITABLE_FIELDS):
+        query = combine_filters(query, {"type": {"$in": types}})
+    if expected_version is not None:
+        query = combine_filters(query, version_filter(expected_version))
+    query = combine_filters(query, {"$or": [{field: {"$ne": value}} for field, value in changes.items()]})
+    return (query, {"$set": changes, "$inc": {"version": 1}}), None
+
+
+def update_failure_projection(changes):
+    """Fields update_failure_message needs from the stored listing"""
+    return dict({field: 1 for field in changes}, host_id=1, version=1)
+
+
+def update_failure_message(property_data, expected_version, host_id=None, changes=None):
+    """Explain why a partial update matched no document.
+
+    property_data is the stored listing, read with
+    update_failure_projection(changes), or None if it does not exist.
+    """
+    if not property_data:
+        return "Property not found."
+    if host_id is not None and property_data.get("host_id") != host_id:
+        return "You don't have permission to modify this property."
+    if expected_version is not None and property_data.get("version", 0) != expected_version:
+        return "Property was changed by someone else. Reload it and try again."
+    if changes and all(field in property_data and property_data[field] == value for field, value in changes.items()):
+        return "No changes made to property."
+    return "These fields do not apply to this property type."
+
+
+def availability_filter(check_in, check_out):
+    """Match listings whose declared availability covers the stay, or that declare none.
+
+    Declared ranges may hold "YYYY-MM-DD" strings or datetimes. One range
+    has to cover the whole stay, which agrees with AvailabilityCalendar
+    because listings store their ranges merged (see merge_availability).
+    """
+    start, end = day_number(check_in), day_number(check_out)
+    covering = [
+        {"start_date": {"$lte": date.fromordinal(start).isoformat()},
+         "end_date": {"$gte": date.fromordinal(end).isoformat()}},
+        {"start_date": {"$lte": datetime.fromordinal(start)},
+         "end_date": {"$gte": datetime.fromordinal(end)}},
+    ]
+    return {"$or": [
+        {"availability": {"$elemMatch": {"$or": covering}}},
+        {"availability": {"$size": 0}},
+        {"availability": {"$exists": False}},
+    ]}
+
+
+def booking_conflict_lookup(check_in, check_out):
+    """$lookup stage joining at most one booking that overlaps the stay.
+
+    It is answered from the (property_id, check_in) booking index. _pid
+    holds the listing id as a string, as bookings store it.
+    """
+    return {"$lookup": {
+        "from": BOOKING,
+        "localField": "_pid",
+        "foreignField": "property_id",
+        "pipeline": [
+            {"$match": {
+                **active_booking_filter(),
+                "check_in": {"$lt": datetime.fromordinal(day_number(check_out))},
+                "check_out": {"$gt": datetime.fromordinal(day_number(check_in))},
+            }},
+            {"$limit": 1},
+            {"$project": {"_id": 1}},
+        ],
+        "as": "conflicts",
+    }}
+
+
+def invalidate_calendar(property_id):
+    """Make bookings in this process check a listing's new availability right away"""
+    from booking.booking_service import BookingService
+    BookingService.get_instance().invalidate_calendar(property_id)
+
+
+def property_from_document(property_data):
+    """Build a Property from a stored document; shared by the sync and async services"""
+    # Ensure _id is properly serialized to string
+    property_data = dict(property_data)
+    property_data['_id'] = str(property_data['_id'])
+    creator = PropertyFactory.get_creator(property_data["type"])
+    return creator.create_property(property_data)
 
-properties_collection = db["properties"]
 
 class PropertyService:
     _instance = None
@@ -12,84 +233,340 @@ class PropertyService:
         if cls._instance is None:
             cls._instance = PropertyService()
         return cls._instance
+
+    def __init__(self, repository=None, cache=None):
+        self._repository = repository
+        self._cache = cache if cache is not None else LRUTTLCache(PROPERTY_CACHE_SIZE, PROPERTY_CACHE_TTL)
+
+    @property
+    def repository(self):
+        """Injected repository, or the one of the active backend"""
+        return self._repository or get_repository(PROPERTIES)
     
     def create_property(self, host_id, property_type, details):
         """Create a new property listing"""
 
         details["host_id"] = host_id  
         creator = PropertyFactory.get_creator(property_type)
-        property_obj = creator.create_property(details)
-        property_data = property_obj.get_details()
-        result = properties_collection.insert_one(property_data)
+        property_obj = creator.create_property(normalize_details(details))
+        property_data = dict(property_obj.get_details(), created_at=datetime.now())
+        result = self.repository.insert_one(property_data)
         
         if result.inserted_id:
+            self._cache.invalidate(str(result.inserted_id))
             return str(result.inserted_id), f"Property '{details['title']}' created successfully."
         return None, "Failed to create property."
     
+    def create_properties_bulk(self, host_id, rows, chunk_size=BULK_CHUNK_SIZE):
+        """Create many listings from an iterable of detail dicts.
+
+        Each row needs a "type" plus the fields create_property takes. Rows
+        are validated through the property creators and written with
+        unordered insert_many calls of chunk_size documents, so one bad row
+        never blocks the rest. Rows are numbered from 1 in the report:
+        {"inserted": int, "failed": int, "errors": [(row, message), ...]}
+        """
+        report = {"inserted": 0, "failed": 0, "errors": []}
+        chunk = []
+        
+        def flush():
+            documents = [document for _, document in chunk]
+            try:
+                report["inserted"] += len(self.repository.insert_many(documents, ordered=False).inserted_ids)
+            except BulkWriteError as e:
+                report["inserted"] += e.details.get("nInserted", 0)
+                for error in e.details.get("writeErrors", []):
+                    report["errors"].append((chunk[error["index"]][0], error.get("errmsg", "Write failed.")))
+                    report["failed"] += 1
+            chunk.clear()
+        
+        for row_number, details in enumerate(rows, 1):
+            error = validate_property_details(details)
+            if not error:
+                try:
+                    details = dict(normalize_details(details), host_id=host_id)
+                    creator = PropertyFactory.get_creator(str(details.pop("type", "")))
+                    chunk.append((row_number, dict(creator.create_property(details).get_details(),
+                                                   created_at=datetime.now())))
+                except (ValueError, TypeError) as e:
+                    error = str(e)
+            if error:
+                report["errors"].append((row_number, error))
+                report["failed"] += 1
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+        
+        return report
+    
     def get_property(self, property_id):
-        """Get property by ID"""
+        """Get property by ID, served from the cache when possible"""
+        property_obj = self._cache.get(str(property_id))
+        if property_obj is not None:
+            return property_obj, "Property found."
+        
+        property_obj, message = self._load_property(property_id)
+        if property_obj:
+            self._cache.set(str(property_id), property_obj)
+        return property_obj, message
+    
+    def get_properties(self, property_ids):
+        """Get several properties by ID as {id: Property}; cache misses are read in one query"""
+        found = {}
+        missing = []
+        for property_id in dict.fromkeys(str(p) for p in property_ids):
+            property_obj = self._cache.get(property_id)
+            if property_obj is not None:
+                found[property_id] = property_obj
+            else:
+                missing.append(property_id)
+        if missing:
+            ids = []
+            for property_id in missing:
+                condition = property_id_filter(property_id)["_id"]
+                ids.extend(condition["$in"] if isinstance(condition, dict) else [condition])
+            for property_data in self.repository.find({"_id": {"$in": ids}}):
+                property_obj = property_from_document(property_data)
+                found[str(property_obj.get_id())] = property_obj
+                self._cache.set(str(property_obj.get_id()), property_obj)
+        return found
+    
+    def _load_property(self, property_id):
+        """Read a property from the repository, bypassing the cache"""
         try:
-            property_data = properties_collection.find_one({"_id": ObjectId(property_id)})
+            property_data = self.repository.find_one(property_id_filter(property_id))
             
             if not property_data:
                 return None, "Property not found."
             
-            creator = PropertyFactory.get_creator(property_data["type"])
-            property_obj = creator.create_property(property_data)
+            property_obj = property_from_document(property_data)
             
             return property_obj, "Property found."
         except Exception as e:
             return None, f"Error retrieving property: {str(e)}"
     
-    def update_property(self, property_id, details):
-        """Update property details"""
-        
-        property_obj, message = self.get_property(property_id)
-        
-        if not property_obj:
+    def update_property(self, property_id, details, expected_version=None):
+        """Update property details in a single find_one_and_update.
+
+        Only the given fields are written and the version is incremented.
+        Pass the version the edit was based on as expected_version to
+        reject the update if someone else saved the property since.
+        """
+        return self._update_property(property_id, details, expected_version)
+    
+    def update_property_for_host(self, host_id, property_id, details, expected_version=None):
+        """Like update_property, but only if host_id owns the property"""
+        return self._update_property(property_id, details, expected_version, host_id)
+    
+    def _update_property(self, property_id, details, expected_version=None, host_id=None):
+        key = str(property_id)
+        command, message = build_property_update(
+            property_id, details, expected_version, current=self._cache.get(key)
+        )
+        if command is None:
             return False, message
         
-        property_obj.update_details(details)
+        query, update = command
+        if host_id is not None:
+            # Ownership is part of the filter, so the check and the write are one operation
+            query = combine_filters(query, {"host_id": host_id})
+        try:
+            property_data = self.repository.find_one_and_update(query, update, return_document=True)
+        except Exception as e:
+            self._cache.invalidate(key)
+            return False, f"Error updating property: {str(e)}"
         
-        result = properties_collection.update_one(
-            {"_id": ObjectId(property_id)},
-            {"$set": property_obj.get_details()}
-        )
+        if not property_data:
+            self._cache.invalidate(key)
+            changes = update["$set"]
+            current = self.repository.find_one(property_id_filter(property_id), update_failure_projection(changes))
+            return False, update_failure_message(current, expected_version, host_id, changes)
         
-        if result.modified_count > 0:
-            return True, "Property updated successfully."
-        return False, "No changes made to property."
+        # The updated document comes back with the write, so refresh rather than drop
+        self._cache.set(key, property_from_document(property_data))
+        if "availability" in update["$set"]:
+            invalidate_calendar(property_id)
+        return True, "Property updated successfully."
     
     def delete_property(self, property_id):
         """Delete a property"""
         try:
-            result = properties_collection.delete_one({"_id": ObjectId(property_id)})
+            result = self.repository.delete_one(property_id_filter(property_id))
+            self._cache.invalidate(str(property_id))
+            
+            if result.deleted_count > 0:
+                return True, "Property deleted successfully."
+            return False, "Property not found or could not be deleted."
+        except Exception as e:
+            return False, f"Error deleting property: {str(e)}"
+    
+    def delete_property_for_host(self, host_id, property_id):
+        """Delete a property only if host_id owns it"""
+        try:
+            query = combine_filters(property_id_filter(property_id), {"host_id": host_id})
+            result = self.repository.delete_one(query)
+            self._cache.invalidate(str(property_id))
             
             if result.deleted_count > 0:
                 return True, "Property deleted successfully."
+            # Only a failed delete pays for telling "missing" from "not yours"
+            if self.repository.count_documents(property_id_filter(property_id)):
+                return False, "You don't have permission to delete this property."
             return False, "Property not found or could not be deleted."
         except Exception as e:
             return False, f"Error deleting property: {str(e)}"
     
+    def cache_stats(self):
+        """Hit, miss and eviction counters of the property cache"""
+        return self._cache.stats()
+    
     def list_properties(self, filters=None):
         """List properties with optional filters"""
         query = filters if filters else {}
-        properties_data = properties_collection.find(query)
+        properties_data = self.repository.find(query)
         
         properties_list = []
         for prop_data in properties_data:
-            # Ensure _id is properly serialized to string
-            prop_data_copy = dict(prop_data)
-            prop_data_copy['_id'] = str(prop_data_copy['_id'])
-            
-            creator = PropertyFactory.get_creator(prop_data_copy["type"])
-            property_obj = creator.create_property(prop_data_copy)
+            property_obj = property_from_document(prop_data)
             
             details = property_obj.get_details()
             properties_list.append(details)
         
         return properties_list
     
+    def list_properties_page(self, filters=None, limit=DEFAULT_PAGE_SIZE, sort="_id", cursor=None):
+        """List one page of properties.
+
+        sort is a field name, prefixed with "-" for descending order.
+        Returns (properties, next_cursor); pass next_cursor back to get
+        the following page, it is None on the last page.
+        """
+        properties_data, next_cursor = read_page(self.repository, filters, sort, limit, cursor)
+        properties_list = [property_from_document(prop_data).get_details() for prop_data in properties_data]
+        return properties_list, next_cursor
+    
+    def list_property_summaries(self, filters=None, limit=DEFAULT_PAGE_SIZE, sort="_id", cursor=None):
+        """Like list_properties_page, but reads only the fields listing pages show.
+
+        Returns (summaries, next_cursor) with PropertySummary records.
+        """
+        properties_data, next_cursor = read_page(
+            self.repository, filters, sort, limit, cursor, projection=SUMMARY_PROJECTION
+        )
+        return [PropertySummary.from_document(prop_data) for prop_data in properties_data], next_cursor
+    
+    def search_properties(self, search, limit=DEFAULT_PAGE_SIZE, sort="price", cursor=None, with_facets=True):
+        """Search listings with a PropertySearch.
+
+        Returns (summaries, next_cursor, facets). The page is read with an
+        indexed keyset query; facets holds the total and the counts per
+        type, amenity and price bucket, all from one aggregation. Facets do
+        not change between pages, so pass with_facets=False when paging
+        further to skip the aggregation; facets is None then.
+        """
+        query = search.to_query()
+        summaries, next_cursor = self.list_property_summaries(query, limit, sort, cursor)
+        facets = parse_facets(list(self.repository.aggregate(facet_pipeline(query)))) if with_facets else None
+        return summaries, next_cursor, facets
+    
+    def text_search_properties(self, text, search=None, limit=DEFAULT_PAGE_SIZE, cursor=None, with_facets=True,
+                               check_in=None, check_out=None):
+        """Full-text search over title, amenities and location.
+
+        Results are ranked by the weighted text index (title above
+        amenities above location) and can be narrowed with a
+        PropertySearch. With check_in and check_out, only listings free
+        for that stay are returned, as in find_available_properties, and
+        facets is None since it would count booked listings too. Returns
+        (summaries, next_cursor, facets) like search_properties.
+        """
+        stay = check_in is not None and check_out is not None
+        if stay and day_number(check_out) <= day_number(check_in):
+            return [], None, None
+        query = search.to_query() if search else {}
+        if stay:
+            query = combine_filters(query, availability_filter(check_in, check_out))
+        # $text has to sit at the top level of the filter
+        query = dict(query, **{"$text": {"$search": text}})
+        sort_spec = [("score", -1), ("_id", 1)]
+        
+        pipeline = [
+            {"$match": query},
+            {"$addFields": {"score": {"$meta": "textScore"}}},
+        ]
+        if stay:
+            pipeline += [
+                {"$addFields": {"_pid": {"$toString": "$_id"}}},
+                booking_conflict_lookup(check_in, check_out),
+                {"$match": {"conflicts": {"$size": 0}}},
+            ]
+        if cursor:
+            pipeline.append({"$match": keyset_filter(sort_spec, decode_cursor(cursor, sort_spec))})
+        pipeline += [
+            {"$sort": dict(sort_spec)},
+            # One extra document tells whether another page exists
+            {"$limit": limit + 1},
+            {"$project": dict(SUMMARY_PROJECTION, score=1)},
+        ]
+        properties_data = list(self.repository.aggregate(pipeline))
+        next_cursor = None
+        if len(properties_data) > limit:
+            properties_data = properties_data[:limit]
+            next_cursor = encode_cursor(properties_data[-1], sort_spec)
+        
+        summaries = [PropertySummary.from_document(prop_data) for prop_data in properties_data]
+        facets = None
+        if with_facets and not stay:
+            facets = parse_facets(list(self.repository.aggregate(facet_pipeline(query))))
+        return summaries, next_cursor, facets
+    
+    def find_available_properties(self, check_in, check_out, filters=None, limit=DEFAULT_PAGE_SIZE,
+                                  sort="price", cursor=None):
+        """Listings free from check_in to check_out, as (summaries, next_cursor).
+
+        One aggregation selects the listings whose availability covers the
+        stay and matching filters in sort order, then drops those with an
+        overlapping booking or unexpired hold through an indexed anti-join.
+        It stops once the page is full, so it does not read every booking.
+        """
+        if day_number(check_out) <= day_number(check_in):
+            return [], None
+        sort_spec = parse_sort(sort)
+        query = combine_filters(filters, availability_filter(check_in, check_out))
+        if cursor:
+            query = combine_filters(query, keyset_filter(sort_spec, decode_cursor(cursor, sort_spec)))
+        
+        pipeline = [
+            {"$match": query},
+            {"$sort": dict(sort_spec)},
+            {"$addFields": {"_pid": {"$toString": "$_id"}}},
+            booking_conflict_lookup(check_in, check_out),
+            {"$match": {"conflicts": {"$size": 0}}},
+            # One extra document tells whether another page exists
+            {"$limit": limit + 1},
+            {"$project": dict(SUMMARY_PROJECTION, **{field: 1 for field, _ in sort_spec})},
+        ]
+        properties_data = list(self.repository.aggregate(pipeline))
+        next_cursor = None
+        if len(properties_data) > limit:
+            properties_data = properties_data[:limit]
+            next_cursor = encode_cursor(properties_data[-1], sort_spec)
+        return [PropertySummary.from_document(prop_data) for prop_data in properties_data], next_cursor
+    
+    def count_properties(self, filters=None):
+        """Count properties matching filters without fetching them"""
+        return self.repository.count_documents(filters if filters else {})
+    
+    def iter_properties(self, filters=None, batch_size=100, sort="_id"):
+        """Stream properties, fetching them from the database in batches"""
+        cursor = None
+        while True:
+            properties_list, cursor = self.list_properties_page(filters, batch_size, sort, cursor)
+            yield from properties_list
+            if cursor is None:
+                return
+    
     def get_host_properties(self, host_id):
         """Get all properties for a specific host"""
         return self.list_properties({"host_id": host_id})
\ No newline at end of file
@@ -0,0 +1,39 @@
+# property/property_summary.py
+
+# Fields read for listing pages; images and availability are left on the server
+SUMMARY_FIELDS = (
+    "title", "location", "price", "type", "amenities",
+    "floor_number", "has_elevator", "floors", "has_garden", "has_pool", "has_private_access",
+)
+SUMMARY_PROJECTION = {field: 1 for field in SUMMARY_FIELDS}
+
+
+class PropertySummary:
+    """Compact read model of a listing for browse and count paths.
+
+    Type-specific fields that do not apply to the listing's type are None.
+    """
+    __slots__ = ("id",) + SUMMARY_FIELDS
+
+    def __init__(self, id, title, location, price, type, amenities=None,
+                 floor_number=None, has_elevator=None, floors=None, has_garden=None,
+                 has_pool=None, has_private_access=None):
+        self.id = id
+        self.title = title
+        self.location = location
+        self.price = price
+        self.type = type
+        self.amenities = amenities if amenities else []
+        self.floor_number = floor_number
+        self.has_elevator = has_elevator
+        self.floors = floors
+        self.has_garden = has_garden
+        self.has_pool = has_pool
+        self.has_private_access = has_private_access
+
+    @classmethod
+    def from_document(cls, document):
+        return cls(str(document["_id"]), **{field: document.get(field) for field in SUMMARY_FIELDS})
+
+    def __repr__(self):
+        return f"PropertySummary({self.id!r}, {self.title!r}, {self.type!r}, {self.price!r})"
@@ -11,7 +11,7 @@ class UserProxy:
             
         role_permissions = {
             "admin": ["browse_listings", "manage_users", "view_reports", "delete_account"],
-            "host": ["browse_listings", "create_listing", "manage_bookings", "view_earnings", "delete_listing"],
+            "host": ["browse_listings", "create_listing", "manage_bookings", "view_earnings", "delete_listing", "update_listing"],
             "guest": ["browse_listings", "book_accommodation"],
         }
         return role_permissions.get(self.user.getUserType().lower(), [])
@@ -0,0 +1,298 @@
+# reports/report_service.py
+"""Pre-aggregated admin reports.
+
+Counters live in three small collections: one document per day
+(report_daily), one per property type (report_property_types) and a
+single running total (report_totals). A refresh only reads what was
+written since the previous one: every source below keeps a high-water
+mark on its timestamp field in report_meta, and the events between the
+mark and now are added to the counters with $inc upserts. Reading a
+report therefore costs the same however much history there is.
+
+New users and listings count on created_at, bookings on created_at,
+revenue on confirmed_at and cancellations on cancelled_at, so a booking
+confirmed or cancelled long after it was made still reaches the report.
+
+The cancellation rate is the share of confirmed bookings that were later
+cancelled; holds that were abandoned or cancelled before payment count
+as bookings but not in the rate.
+
+Counters and marks move in one transaction. A standalone server cannot
+run transactions; refreshes there report it on stderr and write the
+marks first, then the counters, so a crash in between skips events
+rather than counting them twice.
+
+Usage:
+    python -m reports.report_service refresh
+    python -m reports.report_service rebuild
+    python -m reports.report_service show [--days 30]
+"""
+import argparse
+import os
+import sys
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from booking.booking_archive import BookingArchive
+from booking.booking_status import CANCELLED, CONFIRMED
+from database.mongodb import (
+    BOOKING, PROPERTIES, USERS, REPORT_DAILY, REPORT_PROPERTY_TYPES, REPORT_TOTALS, REPORT_META
+)
+from database.repository import get_repository, transaction
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from property.property_service import property_id_filter
+
+# Documents stamped within this many seconds of a refresh are left for the
+# next one, so a write whose timestamp was taken just before the refresh
+# but that lands just after it is not skipped by the high-water mark
+REPORT_SETTLE_SECONDS = float(os.getenv("REPORT_SETTLE_SECONDS", "5"))
+
+TOTALS_ID = "all"
+# Legacy confirmations and cancellations are dated by created_at
+BOOKING_PROJECTION = {"property_id": 1, "property_type": 1, "total_price": 1, "confirmed_at": 1, "created_at": 1}
+COUNTERS = ("new_users", "new_listings", "bookings", "confirmed", "revenue", "cancellations",
+            "confirmed_cancellations", "cancelled_revenue")
+
+
+def _object_id_time(document):
+    """Creation time of a document without created_at, from its ObjectId"""
+    return document["_id"].generation_time.astimezone().replace(tzinfo=None)
+
+
+def _new_user(document, property_type):
+    return {"new_users": 1}, None
+
+
+def _new_listing(document, property_type):
+    return {"new_listings": 1}, document.get("type") or "unknown"
+
+
+def _booking(document, property_type):
+    return {"bookings": 1}, property_type or "unknown"
+
+
+def _confirmation(document, property_type):
+    return {"confirmed": 1, "revenue": document.get("total_price", 0)}, property_type or "unknown"
+
+
+def _cancellation(document, property_type):
+    counters = {"cancellations": 1}
+    if document.get("confirmed_at"):
+        counters["confirmed_cancellations"] = 1
+        counters["cancelled_revenue"] = document.get("total_price", 0)
+    return counters, property_type or "unknown"
+
+
+# name: (collection, timestamp field, projection, handler, legacy query).
+# Legacy documents predate their timestamp field; only rebuild counts them,
+# dated by their ObjectId or created_at.
+SOURCES = {
+    "users": (USERS, "created_at", {}, _new_user,
+              {"created_at": {"$exists": False}}),
+    "listings": (PROPERTIES, "created_at", {"type": 1}, _new_listing,
+                 {"created_at": {"$exists": False}}),
+    "bookings": (BOOKING, "created_at", BOOKING_PROJECTION, _booking, None),
+    "confirmations": (BOOKING, "confirmed_at", BOOKING_PROJECTION, _confirmation,
+                      {"status": CONFIRMED, "confirmed_at": {"$exists": False}}),
+    "cancellations": (BOOKING, "cancelled_at", BOOKING_PROJECTION, _cancellation,
+                      {"status": CANCELLED, "cancelled_at": {"$exists": False}}),
+}
+
+
+def cancellation_rate(counters):
+    """Share of confirmed bookings that were cancelled"""
+    confirmed = counters.get("confirmed", 0)
+    return counters.get("confirmed_cancellations", 0) / confirmed if confirmed else 0.0
+
+
+def atomically(write):
+    """Run write in a transaction, or without one on a server that has none.
+
+    A lost race (a duplicate key on a high-water mark) is raised either way.
+    """
+    try:
+        with transaction():
+            write()
+    except (BulkWriteError, DuplicateKeyError):
+        raise
+    except OperationFailure as e:
+        print(f"Report update without a transaction: {str(e)}", file=sys.stderr)
+        write()
+
+
+class ReportService:
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = ReportService()
+        return cls._instance
+
+    def _property_types(self):
+        """Lazy property_id -> type lookup for bookings made before property_type was stored"""
+        types = {}
+
+        def resolve(document):
+            if document.get("property_type"):
+                return document["property_type"]
+            property_id = document.get("property_id")
+            if property_id not in types:
+                prop = get_repository(PROPERTIES).find_one(property_id_filter(property_id), {"type": 1})
+                types[property_id] = prop.get("type") if prop else None
+            return types[property_id]
+        return resolve
+
+    def _collect(self, name, query, increments, property_type, timestamp=None, archived=False):
+        """Add the events of one source matching query to increments; returns their count.
+
+        With archived, bookings moved to the archive are read as well.
+        """
+        collection, field, projection, handler, _ = SOURCES[name]
+        projection = dict(projection, **{field: 1})
+        if archived and collection == BOOKING:
+            documents = BookingArchive.get_instance().find(query, projection)
+        else:
+            documents = get_repository(collection).find(query, projection)
+        count = 0
+        for document in documents:
+            moment = timestamp(document) if timestamp else document[field]
+            counters, type_key = handler(document, property_type(document) if collection == BOOKING else None)
+            increments[(REPORT_DAILY, f"{moment:%Y-%m-%d}")].update(counters)
+            increments[(REPORT_TOTALS, TOTALS_ID)].update(counters)
+            if type_key is not None:
+                increments[(REPORT_PROPERTY_TYPES, type_key)].update(counters)
+            count += 1
+        return count
+
+    def _apply(self, increments, previous_marks, mark, now):
+        # Moving a mark is conditional on it still being where this refresh
+        # started; if another refresh moved it first, the upsert collides on
+        # _id and the transaction rolls back instead of counting twice
+        marks = [
+            ({"_id": name, "high_water_mark": previous_marks.get(name)},
+             {"$set": {"high_water_mark": mark, "refreshed_at": now}}, True)
+            for name in SOURCES
+        ]
+        updates = {}
+        for (collection, key), counters in increments.items():
+            update = {"$inc": dict(counters)}
+            if collection == REPORT_DAILY:
+                update["$setOnInsert"] = {"day": datetime.strptime(key, "%Y-%m-%d")}
+            updates.setdefault(collection, []).append(({"_id": key}, update, True))
+
+        def write():
+            # Marks first and in order: without a transaction, a refresh that
+            # lost the race stops at the first mark, before touching counters
+            get_repository(REPORT_META).bulk_update(marks, ordered=True)
+            for collection, collection_updates in updates.items():
+                get_repository(collection).bulk_update(collection_updates, ordered=False)
+        # The counters and the marks move together, or a retry would count twice
+        atomically(write)
+
+    def refresh(self, now=None):
+        """Add everything written since the last refresh; returns {source: events added}.
+
+        Returns None when a concurrent refresh got there first; its
+        counters already include the same events.
+        """
+        now = now or datetime.now()
+        upper = now - timedelta(seconds=REPORT_SETTLE_SECONDS)
+        marks = {meta["_id"]: meta.get("high_water_mark") for meta in get_repository(REPORT_META).find({})}
+
+        increments = defaultdict(Counter)
+        property_type = self._property_types()
+        added = {}
+        for name, (_, field, _, _, _) in SOURCES.items():
+            query = {field: {"$lte": upper}}
+            if marks.get(name) is not None:
+                query[field]["$gt"] = marks[name]
+            added[name] = self._collect(name, query, increments, property_type)
+        try:
+            self._apply(increments, marks, upper, now)
+        except (BulkWriteError, DuplicateKeyError):
+            return None
+        return added
+
+    def rebuild(self, now=None):
+        """Recompute every report from the full history; returns {source: events counted}"""
+        now = now or datetime.now()
+        upper = now - timedelta(seconds=REPORT_SETTLE_SECONDS)
+
+        increments = defaultdict(Counter)
+        property_type = self._property_types()
+        counted = {}
+        for name, (_, field, _, _, legacy) in SOURCES.items():
+            counted[name] = self._collect(name, {field: {"$lte": upper}}, increments, property_type, archived=True)
+            if legacy is not None:
+                timestamp = _object_id_time if field == "created_at" else (lambda document: document["created_at"])
+                counted[name] += self._collect(name, legacy, increments, property_type, timestamp, archived=True)
+
+        def write():
+            for collection in (REPORT_DAILY, REPORT_PROPERTY_TYPES, REPORT_TOTALS, REPORT_META):
+                get_repository(collection).delete_many({})
+            self._apply(increments, {}, upper, now)
+        atomically(write)
+        return counted
+
+    def get_report(self, days=30, refresh=True, now=None):
+        """Totals, the last days days and the per property type breakdown.
+
+        Returns {"totals": counters, "daily": [counters with "day"],
+        "property_types": {type: counters}}; every counters dict also has a
+        cancellation_rate. With refresh, new activity is folded in first.
+        """
+        now = now or datetime.now()
+        if refresh:
+            self.refresh(now)
+        since = f"{now - timedelta(days=days - 1):%Y-%m-%d}"
+
+        def counters(document):
+            values = {name: (document or {}).get(name, 0) for name in COUNTERS}
+            values["cancellation_rate"] = cancellation_rate(values)
+            return values
+
+        return {
+            "totals": counters(get_repository(REPORT_TOTALS).find_one({"_id": TOTALS_ID})),
+            "daily": [
+                dict(counters(document), day=document["day"])
+                for document in get_repository(REPORT_DAILY).find({"_id": {"$gte": since}}, sort=[("_id", 1)])
+            ],
+            "property_types": {
+                document["_id"]: counters(document)
+                for document in get_repository(REPORT_PROPERTY_TYPES).find({}, sort=[("_id", 1)])
+            },
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m reports.report_service",
+                                     description="Maintain the admin reports")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("refresh", help="add activity since the last refresh")
+    commands.add_parser("rebuild", help="recompute the reports from the full history")
+    show_parser = commands.add_parser("show", help="refresh and print the reports")
+    show_parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    service = ReportService.get_instance()
+    if args.command == "show":
+        report = service.get_report(args.days)
+        print(f"Totals: {report['totals']}")
+        for row in report["daily"]:
+            print(f"{row['day']:%Y-%m-%d}: {row}")
+        for property_type, row in report["property_types"].items():
+            print(f"{property_type}: {row}")
+        return 0
+
+    counts = service.refresh() if args.command == "refresh" else service.rebuild()
+    if counts is None:
+        print("Another refresh was running; nothing to do.")
+        return 0
+    for name, count in counts.items():
+        print(f"{name}: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
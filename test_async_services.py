@@ -0,0 +1,107 @@
+# tests/test_async_services.py
+import asyncio
+import unittest
+from auth.async_auth_service import AsyncAuthService
+from auth.user_factory import UserFactory
+from booking.async_booking_service import AsyncBookingService
+from booking.booking_archive import BookingArchive
+from booking.booking_service import BookingService
+from datetime import datetime
+from database.indexes import ensure_indexes
+from database.repository import configure_backend
+from property.async_property_service import AsyncPropertyService
+
+
+class TestAsyncServices(unittest.TestCase):
+    def setUp(self):
+        configure_backend("memory")
+        ensure_indexes()
+        self.auth_service = AsyncAuthService()
+        self.property_service = AsyncPropertyService()
+        self.booking_service = AsyncBookingService(property_service=self.property_service)
+
+    def test_concurrent_bookings(self):
+        """Test async services share data with the sync path"""
+        async def scenario():
+            guest = UserFactory.create_user("guest", "Test Guest", "guest@example.com", "secret")
+            await self.auth_service.register_user(guest)
+            property_id, _ = await self.property_service.create_property("host@example.com", "villa", {
+                "title": "Test Villa", "location": "Miami", "price": 300
+            })
+            stays = [("2030-01-0%d" % day, "2030-01-0%d" % (day + 1)) for day in range(1, 6)]
+            return property_id, await asyncio.gather(*(
+                self.booking_service.create_booking("guest@example.com", property_id, check_in, check_out, 2)
+                for check_in, check_out in stays
+            ))
+
+        property_id, results = asyncio.run(scenario())
+        self.assertTrue(all(booking_id for booking_id, _ in results))
+        sync_bookings = BookingService().get_property_bookings(property_id)
+        self.assertEqual(len(sync_bookings), 5)
+        self.assertEqual(sync_bookings[0]["total_price"], 300)
+
+    def test_async_booking_respects_calendar(self):
+        """Test that async bookings outside availability or overlapping others are refused"""
+        async def scenario():
+            await self.auth_service.register_user(
+                UserFactory.create_user("guest", "Test Guest", "guest@example.com", "secret"))
+            property_id, _ = await self.property_service.create_property("host@example.com", "villa", {
+                "title": "Test Villa", "location": "Miami", "price": 300,
+                "availability": [{"start_date": "2030-01-01", "end_date": "2030-01-10"}]
+            })
+            book = lambda check_in, check_out: self.booking_service.create_booking(
+                "guest@example.com", property_id, check_in, check_out, 2, hold_minutes=None)
+            return [await book("2030-06-01", "2030-06-03"),
+                    await book("2030-01-02", "2030-01-05"),
+                    await book("2030-01-04", "2030-01-06")]
+
+        outside, booked, overlapping = asyncio.run(scenario())
+        self.assertEqual(outside, (None, "Property is not available for the selected dates."))
+        self.assertIsNotNone(booked[0])
+        self.assertIsNone(overlapping[0])
+
+    def test_async_expired_hold_released_on_conflict(self):
+        """Test that an async booking takes the nights of an expired, unswept hold"""
+        async def scenario():
+            await self.auth_service.register_user(
+                UserFactory.create_user("guest", "Test Guest", "guest@example.com", "secret"))
+            property_id, _ = await self.property_service.create_property("host@example.com", "villa", {
+                "title": "Test Villa", "location": "Miami", "price": 300
+            })
+            await self.booking_service.create_booking(
+                "guest@example.com", property_id, "2030-06-05", "2030-06-08", 1, hold_minutes=-1)
+            return await self.booking_service.create_booking(
+                "guest@example.com", property_id, "2030-06-06", "2030-06-07", 1)
+
+        booking_id, message = asyncio.run(scenario())
+        self.assertIsNotNone(booking_id, message)
+        self.assertTrue(message.startswith("Booking held until"))
+
+    def test_async_reads_include_archive(self):
+        """Test that async lookups see bookings moved to the archive"""
+        async def setup():
+            await self.auth_service.register_user(
+                UserFactory.create_user("guest", "Test Guest", "guest@example.com", "secret"))
+            property_id, _ = await self.property_service.create_property("host@example.com", "villa", {
+                "title": "Test Villa", "location": "Miami", "price": 300
+            })
+            booking_id, _ = await self.booking_service.create_booking(
+                "guest@example.com", property_id, "2030-01-01", "2030-01-03", 2, hold_minutes=None)
+            return property_id, booking_id
+
+        async def read(property_id, booking_id):
+            booking_data, _ = await self.booking_service.get_booking(booking_id)
+            return (booking_data,
+                    await self.booking_service.get_guest_bookings(booking_data["guest_id"]),
+                    await self.booking_service.get_property_bookings(property_id))
+
+        property_id, booking_id = asyncio.run(setup())
+        self.assertEqual(BookingArchive().run(365, now=datetime(2032, 1, 1)), {2030: 1})
+        booking_data, guest_bookings, property_bookings = asyncio.run(read(property_id, booking_id))
+        self.assertEqual(booking_data["booking_id"], booking_id)
+        self.assertEqual([b["booking_id"] for b in guest_bookings], [booking_id])
+        self.assertEqual([b["booking_id"] for b in property_bookings], [booking_id])
+
+
+if __name__ == "__main__":
+    unittest.main()
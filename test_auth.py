@@ -0,0 +1,96 @@
+# tests/test_auth.py
+import asyncio
+import os
+import unittest
+from auth.async_auth_service import AsyncAuthService
+from auth.auth_service import AuthService
+from auth.password_hasher import PasswordHasher, calibrate, MIN_N
+from auth.session_token import issue_token, read_token
+from auth.user_factory import UserFactory
+from database.indexes import ensure_indexes
+from database.mongodb import USERS
+from database.repository import configure_backend, get_repository
+
+
+class TestAuthService(unittest.TestCase):
+    def setUp(self):
+        """Set up a fresh backend and a hasher at the minimum cost"""
+        configure_backend(os.getenv("TEST_DATA_BACKEND", "memory"))
+        ensure_indexes()
+        self.hasher = PasswordHasher(n=MIN_N)
+        self.service = AuthService(hasher=self.hasher)
+
+    def test_passwords_are_hashed(self):
+        """Test that registration stores a salted hash that login verifies"""
+        print("\n=== Testing Password Hashing ===")
+        self.service.register_user(UserFactory.create_user("guest", "Test Guest", "guest@example.com", "secret"))
+        stored = get_repository(USERS).find_one({"email": "guest@example.com"})["password"]
+        self.assertTrue(stored.startswith(f"scrypt${MIN_N}$"))
+        self.assertNotIn("secret", stored)
+        self.assertNotEqual(stored, self.hasher.hash("secret"))
+
+        user, _ = self.service.get_user("guest@example.com", "secret")
+        self.assertEqual((user.getEmail(), user.getPassword()), ("guest@example.com", None))
+        self.assertIsNone(self.service.get_user("guest@example.com", "wrong")[0])
+        self.assertIsNone(self.service.get_user("nobody@example.com", "secret")[0])
+        self.assertGreaterEqual(calibrate(target_ms=1), MIN_N)
+        print(f"✓ Stored as {stored[:24]}...")
+
+    def test_legacy_records_upgraded(self):
+        """Test that plaintext and outdated hashes are rehashed on the next login"""
+        print("\n=== Testing Password Upgrade ===")
+        users = get_repository(USERS)
+        users.insert_one({"name": "Old Host", "email": "host@example.com", "password": "plain", "user_type": "host"})
+        self.assertIsNone(self.service.get_user("host@example.com", "wrong")[0])
+        self.assertEqual(users.find_one({"email": "host@example.com"})["password"], "plain")
+
+        self.assertTrue(self.service.login_user(UserFactory.create_user("host", "Old Host", "host@example.com", "plain"))[0])
+        upgraded = users.find_one({"email": "host@example.com"})["password"]
+        self.assertTrue(upgraded.startswith(f"scrypt${MIN_N}$"))
+
+        # A higher cost later on rehashes again at the next login
+        stronger = AuthService(hasher=PasswordHasher(n=2 * MIN_N))
+        self.assertIsNotNone(stronger.get_user("host@example.com", "plain")[0])
+        self.assertTrue(users.find_one({"email": "host@example.com"})["password"].startswith(f"scrypt${2 * MIN_N}$"))
+        print("✓ Plaintext and outdated records rehashed")
+
+    def test_login_issues_session_token(self):
+        """Test that login returns a signed token that resolves to the user without a query"""
+        print("\n=== Testing Session Tokens ===")
+        self.service.register_user(UserFactory.create_user("host", "Test Host", "host@example.com", "secret"))
+        self.assertEqual(self.service.login("host@example.com", "wrong")[:2], (None, None))
+
+        token, user, _ = self.service.login("host@example.com", "secret")
+        self.assertEqual(read_token(token)["email"], "host@example.com")
+        self.assertIs(self.service.user_from_token(token), user)
+
+        # Another worker rebuilds the user from the token alone
+        other = AuthService(repository=get_repository("no_users"), hasher=self.hasher)
+        resolved = other.user_from_token(token)
+        self.assertEqual((resolved.getId(), resolved.getName(), resolved.getUserType()),
+                         (user.getId(), "Test Host", "host"))
+        self.assertIs(other.user_from_token(token), resolved)
+
+        payload, signature = token.split(".")
+        self.assertIsNone(other.user_from_token(payload[:-2] + "xx." + signature))
+        self.assertIsNone(other.user_from_token("not a token"))
+        self.assertIsNone(other.user_from_token(issue_token({"sub": "1"}, ttl=-1)))
+        self.assertIsNone(read_token(token, secret=b"another secret"))
+
+        self.service.logout(token)
+        self.assertIsNot(self.service.user_from_token(token), user)
+        print("✓ Tokens resolve without a query and reject tampering and expiry")
+
+    def test_async_login_unknown_email(self):
+        """Test that the async path answers unknown emails with the pooled dummy hash"""
+        print("\n=== Testing Async Unknown Email ===")
+        service = AsyncAuthService(hasher=self.hasher)
+        self.assertEqual(asyncio.run(service.login("nobody@example.com", "secret")),
+                         (None, None, "Invalid credentials!"))
+        self.assertTrue(self.hasher._dummy.done())
+        self.assertTrue(self.hasher.dummy_hash().startswith(f"scrypt${MIN_N}$"))
+        print("✓ Dummy hash computed on the hashing pool")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,400 @@
+# tests/test_booking.py
+import os
+import threading
+import unittest
+from auth.auth_service import AuthService
+from auth.user_factory import UserFactory
+from datetime import datetime, timedelta
+from booking.booking_service import BookingService
+from booking.hold_sweeper import HoldSweeper
+from booking.host_analytics import HostAnalyticsService
+from database.indexes import ensure_indexes
+from database.mongodb import BOOKING
+from database.repository import configure_backend, get_repository
+from property.availability_calendar import AvailabilityCalendar
+from property.pricing import PricingService
+from property.property_service import PropertyService
+
+
+class TestBookingService(unittest.TestCase):
+    def setUp(self):
+        """Set up a fresh backend with one guest and one listing"""
+        configure_backend(os.getenv("TEST_DATA_BACKEND", "memory"))
+        ensure_indexes()
+        AuthService().register_user(UserFactory.create_user("guest", "Test Guest", "guest@example.com", "secret"))
+        self.property_service = PropertyService()
+        PropertyService._instance = self.property_service
+        self.property_id, _ = self.property_service.create_property("host@example.com", "house", {
+            "title": "Test House", "location": "Lisbon", "price": 80, "floors": 2, "has_garden": True,
+            "availability": [{"start_date": "2030-06-01", "end_date": "2030-06-30"}]
+        })
+        self.service = BookingService()
+
+    def tearDown(self):
+        PropertyService._instance = None
+
+    def test_availability_calendar(self):
+        """Test interval queries and incremental booking updates"""
+        print("\n=== Testing Availability Calendar ===")
+        calendar = AvailabilityCalendar([
+            {"start_date": "2030-01-01", "end_date": "2030-01-10"},
+            {"start_date": "2030-01-10", "end_date": "2030-01-20"},
+        ])
+        self.assertTrue(calendar.is_available("2030-01-05", "2030-01-15"))
+        self.assertFalse(calendar.is_available("2030-01-15", "2030-01-21"))
+
+        calendar.add_booking("a", "2030-01-03", "2030-01-05")
+        calendar.add_booking("b", "2030-01-05", "2030-01-08")
+        self.assertFalse(calendar.is_available_on("2030-01-07"))
+        self.assertTrue(calendar.is_available("2030-01-01", "2030-01-03"))
+        self.assertTrue(calendar.is_available("2030-01-08", "2030-01-09"))
+
+        calendar.remove_booking("a")
+        self.assertTrue(calendar.is_available("2030-01-01", "2030-01-05"))
+        self.assertFalse(calendar.is_available("2030-01-04", "2030-01-06"))
+        self.assertTrue(AvailabilityCalendar().is_available("2031-01-01", "2031-02-01"))
+        print("✓ Merged ranges, bookings and cancellations behave")
+
+    def test_booking_respects_calendar(self):
+        """Test that bookings outside availability or overlapping others are refused"""
+        print("\n=== Testing Booking Availability ===")
+        booking_id, message = self.service.create_booking(
+            "guest@example.com", self.property_id, "2030-06-10", "2030-06-14", 2
+        )
+        self.assertIsNotNone(booking_id, message)
+
+        for check_in, check_out in [("2030-06-12", "2030-06-16"), ("2030-06-28", "2030-07-02")]:
+            refused, message = self.service.create_booking(
+                "guest@example.com", self.property_id, check_in, check_out, 2
+            )
+            self.assertIsNone(refused)
+            print(f"✓ {check_in}..{check_out} refused: {message}")
+
+        self.assertTrue(self.service.cancel_booking(booking_id)[0])
+        self.assertTrue(self.service.is_available(self.property_id, "2030-06-12", "2030-06-16"))
+        # A fresh service builds its calendar from the stored bookings
+        self.assertTrue(BookingService().is_available(self.property_id, "2030-06-10", "2030-06-14"))
+        print("✓ Cancelled nights are free again")
+
+    def test_availability_edit_refreshes_calendar(self):
+        """Test that editing availability takes effect on cached calendars at once"""
+        print("\n=== Testing Availability Edit ===")
+        BookingService._instance = self.service
+        try:
+            self.assertFalse(self.service.is_available(self.property_id, "2030-07-02", "2030-07-05"))
+            self.property_service.update_property(self.property_id, {"availability": [
+                {"start_date": "2030-06-01", "end_date": "2030-07-31"}
+            ]})
+            self.assertTrue(self.service.is_available(self.property_id, "2030-07-02", "2030-07-05"))
+        finally:
+            BookingService._instance = None
+        print("✓ Cached calendar dropped when availability changes")
+
+    def test_booking_with_signed_in_user(self):
+        """Test that a User with an id books in a single insert"""
+        print("\n=== Testing Single-Write Booking ===")
+        guest, _ = AuthService().get_user("guest@example.com", "secret")
+        self.assertIsNotNone(guest.getId())
+        self.service.get_calendar(self.property_id)
+
+        booking_id, message = self.service.create_booking(guest, self.property_id, "2030-06-02", "2030-06-04", 2)
+        self.assertIsNotNone(booking_id, message)
+        booking, _ = self.service.get_booking(booking_id)
+        self.assertEqual(str(booking["_id"]), booking_id)
+        self.assertEqual((booking["guest_id"], booking["total_price"]), (guest.getId(), 160))
+        print(f"✓ Booking {booking_id} written with its id")
+
+    def test_concurrent_double_booking(self):
+        """Test that overlapping bookings racing each other leave exactly one winner"""
+        print("\n=== Testing Concurrent Double Booking ===")
+        # Separate services have separate calendars, so only the database can stop the race
+        services = [BookingService() for _ in range(8)]
+        for service in services:
+            service.get_calendar(self.property_id)
+        barrier = threading.Barrier(len(services))
+        results = []
+
+        def book(service, offset):
+            barrier.wait()
+            check_in = "2030-06-%02d" % (10 + offset % 3)
+            results.append(service.create_booking("guest@example.com", self.property_id, check_in, "2030-06-15", 1))
+
+        threads = [threading.Thread(target=book, args=(s, i)) for i, s in enumerate(services)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        winners = [booking_id for booking_id, _ in results if booking_id]
+        self.assertEqual(len(winners), 1)
+        self.assertEqual(
+            {message for booking_id, message in results if not booking_id},
+            {"Property is already booked for some of the selected dates."}
+        )
+        # Cancelling releases the nights for the next guest
+        self.service.cancel_booking(winners[0])
+        booking_id, _ = self.service.create_booking("guest@example.com", self.property_id, "2030-06-10", "2030-06-15", 1)
+        self.assertIsNotNone(booking_id)
+        print(f"✓ 1 of {len(services)} concurrent bookings succeeded")
+
+    def test_group_booking(self):
+        """Test that a group booking is written all or nothing"""
+        print("\n=== Testing Group Booking ===")
+        villa_id, _ = self.property_service.create_property("host@example.com", "villa", {
+            "title": "Group Villa", "location": "Faro", "price": 200, "has_pool": True, "has_private_access": True
+        })
+        stays = [
+            {"property_id": self.property_id, "check_in": "2030-06-10", "check_out": "2030-06-12", "guests": 4},
+            {"property_id": villa_id, "check_in": "2030-06-10", "check_out": "2030-06-12", "guests": 6},
+        ]
+        group, message = self.service.create_bookings_batch("guest@example.com", stays)
+        self.assertIsNotNone(group, message)
+        self.assertEqual((len(group["booking_ids"]), group["total_price"]), (2, 560))
+        # Group bookings wait for payment like single ones
+        self.assertEqual(self.service.get_booking(group["booking_ids"][0])[0]["status"], "pending")
+        print(f"✓ {message} Total: ${group['total_price']}")
+
+        # An expired, unswept hold does not block the group
+        self.service.create_booking("guest@example.com", villa_id, "2030-06-14", "2030-06-16", 1, hold_minutes=-1)
+        group, message = BookingService().create_bookings_batch("guest@example.com", [
+            {"property_id": villa_id, "check_in": "2030-06-15", "check_out": "2030-06-17"},
+        ], hold_minutes=None)
+        self.assertIsNotNone(group, message)
+        self.assertEqual(self.service.get_booking(group["booking_ids"][0])[0]["status"], "confirmed")
+
+        # A service with stale calendars only finds the conflict on insert, which rolls back the group
+        stale = BookingService()
+        stale.get_calendar(self.property_id)
+        stale.get_calendar(villa_id)
+        self.service.create_booking("guest@example.com", villa_id, "2030-06-20", "2030-06-22", 2)
+        group, message = stale.create_bookings_batch("guest@example.com", [
+            {"property_id": self.property_id, "check_in": "2030-06-20", "check_out": "2030-06-22"},
+            {"property_id": villa_id, "check_in": "2030-06-21", "check_out": "2030-06-23"},
+        ])
+        self.assertIsNone(group)
+        self.assertEqual(len(self.service.get_property_bookings(self.property_id)), 1)
+        print(f"✓ Conflicting group rolled back: {message}")
+
+    def test_guest_history_pages(self):
+        """Test paginated booking history joined with property summaries"""
+        print("\n=== Testing Booking History ===")
+        guest, _ = AuthService().get_user("guest@example.com", "secret")
+        for day in range(1, 8):
+            self.service.create_booking(guest, self.property_id, "2030-06-%02d" % (2 * day), "2030-06-%02d" % (2 * day + 1), 1)
+
+        pages, cursor = [], None
+        while True:
+            bookings, cursor = self.service.get_guest_history(guest.getId(), limit=3, cursor=cursor)
+            pages.append(bookings)
+            if cursor is None:
+                break
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        check_ins = [b["check_in"].day for page in pages for b in page]
+        self.assertEqual(check_ins, [14, 12, 10, 8, 6, 4, 2])
+        self.assertEqual(pages[0][0]["property"].title, "Test House")
+        self.assertNotIn("nights", pages[0][0])
+
+        bookings, _ = self.service.get_property_history(self.property_id, limit=10, sort="created_at")
+        self.assertEqual(len(bookings), 7)
+        print(f"✓ {len(check_ins)} bookings in {len(pages)} pages")
+
+    def test_archive_finished_bookings(self):
+        """Test that finished bookings move to the archive and stay readable"""
+        print("\n=== Testing Booking Archive ===")
+        guest, _ = AuthService().get_user("guest@example.com", "secret")
+        finished = [
+            self.service.create_booking(guest, self.property_id, "2030-06-%02d" % day, "2030-06-%02d" % (day + 1), 1,
+                                        hold_minutes=None)[0]
+            for day in (2, 4, 6)
+        ]
+        self.service.cancel_booking(finished[0])
+        # Still waiting for payment, so it stays in the booking collection
+        held, _ = self.service.create_booking(guest, self.property_id, "2030-06-08", "2030-06-09", 1)
+
+        self.assertEqual(self.service.archive.run(365, batch_size=2, now=datetime(2032, 1, 1)), {2030: 3})
+        self.assertEqual(self.service.archive.status(), {"booking": 1, "booking_archive_2030": 3})
+        self.assertEqual(self.service.get_booking(finished[1])[0]["check_in"], datetime(2030, 6, 4))
+
+        pages, cursor = [], None
+        while True:
+            bookings, cursor = self.service.get_guest_history(guest.getId(), limit=3, cursor=cursor)
+            pages.append([b["booking_id"] for b in bookings])
+            if cursor is None:
+                break
+        self.assertEqual(pages, [[held, finished[2], finished[1]], [finished[0]]])
+        self.assertEqual(len(self.service.get_property_bookings(self.property_id)), 4)
+        print("✓ Archived bookings are read back through the same queries")
+
+    def test_pending_hold_expiry(self):
+        """Test that unpaid holds expire and are swept, while paid ones are confirmed"""
+        print("\n=== Testing Pending Holds ===")
+        paid_id, message = self.service.create_booking("guest@example.com", self.property_id, "2030-06-02", "2030-06-04", 1)
+        unpaid_id, _ = self.service.create_booking("guest@example.com", self.property_id, "2030-06-05", "2030-06-08", 1)
+        print(f"✓ {message}")
+        self.assertEqual(self.service.get_booking(paid_id)[0]["status"], "pending")
+        self.assertEqual(self.service.confirm_booking(paid_id), (True, "Booking confirmed."))
+
+        # Holds still block the dates until they expire
+        self.assertFalse(self.service.is_available(self.property_id, "2030-06-06", "2030-06-07"))
+        summaries, _ = self.property_service.find_available_properties("2030-06-06", "2030-06-07")
+        self.assertEqual(summaries, [])
+
+        sweeper = HoldSweeper(self.service, batch_size=1)
+        released = sweeper.sweep(now=datetime.now() + timedelta(minutes=30))
+        self.assertEqual(released, 1)
+        stats = sweeper.stats()
+        self.assertEqual((stats["runs"], stats["released"]), (1, 1))
+        self.assertGreater(stats["last_lag"], 0)
+        print(f"✓ Sweeper stats: {stats}")
+
+        self.assertEqual(self.service.get_booking(unpaid_id)[0]["status"], "expired")
+        self.assertFalse(self.service.confirm_booking(unpaid_id)[0])
+        self.assertEqual(self.service.get_booking(paid_id)[0]["status"], "confirmed")
+        self.assertTrue(self.service.is_available(self.property_id, "2030-06-05", "2030-06-08"))
+
+    def test_hold_extended_before_payment(self):
+        """Test that payment extends a live hold and refuses an expired one before charging"""
+        print("\n=== Testing Hold Extension ===")
+        live_id, _ = self.service.create_booking("guest@example.com", self.property_id, "2030-06-02", "2030-06-04", 1,
+                                                 hold_minutes=1)
+        expired_id, _ = self.service.create_booking("guest@example.com", self.property_id, "2030-06-05", "2030-06-08", 1,
+                                                    hold_minutes=-1)
+        self.assertEqual(self.service.extend_hold(live_id, minutes=30), (True, "Booking held for payment."))
+        self.assertGreater(self.service.get_booking(live_id)[0]["expires_at"], datetime.now() + timedelta(minutes=29))
+        self.assertFalse(self.service.extend_hold(expired_id)[0])
+
+        self.service.confirm_booking(live_id)
+        self.assertEqual(self.service.extend_hold(live_id), (False, "Booking already confirmed."))
+        print("✓ Expired holds are refused before any charge")
+
+    def test_expired_hold_released_on_conflict(self):
+        """Test that a booking can take the nights of an expired, unswept hold"""
+        print("\n=== Testing Expired Hold Takeover ===")
+        self.service.create_booking("guest@example.com", self.property_id, "2030-06-05", "2030-06-08", 1,
+                                    hold_minutes=-1)
+        booking_id, message = BookingService().create_booking(
+            "guest@example.com", self.property_id, "2030-06-06", "2030-06-07", 1
+        )
+        self.assertIsNotNone(booking_id, message)
+        print("✓ Expired hold released on insert conflict")
+
+    def test_find_available_properties(self):
+        """Test the date search across listings and bookings"""
+        print("\n=== Testing Available Between Dates ===")
+        open_id, _ = self.property_service.create_property("host@example.com", "apartment", {
+            "title": "Open Apartment", "location": "Porto", "price": 60, "floor_number": 2, "has_elevator": True
+        })
+        booked_id, _ = self.property_service.create_property("host@example.com", "apartment", {
+            "title": "Booked Apartment", "location": "Porto", "price": 70, "floor_number": 1, "has_elevator": False
+        })
+        self.service.create_booking("guest@example.com", booked_id, "2030-06-05", "2030-06-12", 1)
+
+        summaries, _ = self.property_service.find_available_properties("2030-06-10", "2030-06-15")
+        self.assertEqual([s.id for s in summaries], [open_id, self.property_id])
+        # Touching stays do not overlap; the house's availability ends on June 30
+        summaries, _ = self.property_service.find_available_properties("2030-06-12", "2030-06-15")
+        self.assertEqual(len(summaries), 3)
+        summaries, _ = self.property_service.find_available_properties("2030-07-01", "2030-07-03")
+        self.assertEqual([s.id for s in summaries], [open_id, booked_id])
+
+        summaries, cursor = self.property_service.find_available_properties(
+            "2030-06-10", "2030-06-15", {"type": "apartment"}, limit=1
+        )
+        self.assertEqual(([s.id for s in summaries], cursor), ([open_id], None))
+
+        # A text search keeps the date filter
+        summaries, _, facets = self.property_service.text_search_properties(
+            "apartment", check_in="2030-06-10", check_out="2030-06-15"
+        )
+        self.assertEqual(([s.id for s in summaries], facets), ([open_id], None))
+        print("✓ Only free listings are returned")
+
+    def test_touching_availability_ranges(self):
+        """Test that search and booking agree on availability split over touching ranges"""
+        print("\n=== Testing Touching Availability Ranges ===")
+        split_id, _ = self.property_service.create_property("host@example.com", "house", {
+            "title": "Split House", "location": "Faro", "price": 90, "floors": 1, "has_garden": False,
+            "availability": [{"start_date": "2030-02-10", "end_date": "2030-02-20"},
+                             {"start_date": "2030-02-01", "end_date": "2030-02-10"}]
+        })
+        self.assertEqual(self.property_service.get_property(split_id)[0].get_details()["availability"],
+                         [{"start_date": "2030-02-01", "end_date": "2030-02-20"}])
+        self.assertTrue(self.service.is_available(split_id, "2030-02-05", "2030-02-15"))
+        summaries, _ = self.property_service.find_available_properties("2030-02-05", "2030-02-15", {"type": "house"})
+        self.assertEqual([s.id for s in summaries], [split_id])
+
+        self.property_service.update_property(split_id, {"availability": [
+            {"start_date": "2030-03-01", "end_date": "2030-03-05"}, {"start_date": "2030-03-05", "end_date": "2030-03-09"}
+        ]})
+        summaries, _ = self.property_service.find_available_properties("2030-03-02", "2030-03-08", {"type": "house"})
+        self.assertEqual([s.id for s in summaries], [split_id])
+        print("✓ Touching ranges are stored merged")
+
+    def test_booking_uses_pricing_rules(self):
+        """Test that bookings store the nightly prices of the listing's rules"""
+        print("\n=== Testing Priced Booking ===")
+        PricingService.get_instance().set_rules(self.property_id, {
+            "weekend_multiplier": 1.25, "length_of_stay": [{"min_nights": 7, "discount": 0.2}]
+        })
+        # Thursday to Sunday: Friday and Saturday nights cost more
+        booking_id, _ = self.service.create_booking("guest@example.com", self.property_id, "2030-06-06", "2030-06-09", 1)
+        booking, _ = self.service.get_booking(booking_id)
+        self.assertEqual((booking["nightly_prices"], booking["total_price"]), ([80, 100, 100], 280))
+        
+        group, _ = self.service.create_bookings_batch("guest@example.com", [
+            {"property_id": self.property_id, "check_in": "2030-06-10", "check_out": "2030-06-17"},
+        ])
+        self.assertEqual(group["total_price"], 5 * 64 + 2 * 80)
+        print("✓ Weekend and weekly pricing applied to bookings")
+
+    def test_host_earnings(self):
+        """Test that the daily rollups follow confirmations and cancellations"""
+        print("\n=== Testing Host Earnings ===")
+        analytics = HostAnalyticsService()
+        june = (datetime(2030, 6, 1), datetime(2030, 7, 1))
+        held_id, _ = self.service.create_booking("guest@example.com", self.property_id, "2030-06-10", "2030-06-14", 2)
+        self.assertEqual(analytics.get_earnings("host@example.com", *june)["totals"]["nights"], 0)
+
+        self.service.confirm_booking(held_id)
+        other_id, _ = self.service.create_booking(
+            "guest@example.com", self.property_id, "2030-06-26", "2030-06-29", 1, hold_minutes=None
+        )
+        earnings = analytics.get_earnings("host@example.com", *june)
+        self.assertEqual(earnings["totals"]["nights"], 7)
+        self.assertEqual(earnings["totals"]["revenue"], 560)
+        self.assertEqual(earnings["totals"]["arrivals"], 2)
+        self.assertAlmostEqual(earnings["totals"]["occupancy"], 7 / 30)
+        self.assertEqual(earnings["totals"]["adr"], 80)
+        self.assertEqual(earnings["by_property"][self.property_id]["title"], "Test House")
+        self.assertEqual(list(earnings["by_month"]), ["2030-06"])
+
+        stays = analytics.get_upcoming_stays("host@example.com")
+        self.assertEqual([s["booking_id"] for s in stays], [held_id, other_id])
+
+        self.service.cancel_booking(other_id)
+        earnings = analytics.get_earnings("host@example.com", *june)
+        self.assertEqual((earnings["totals"]["nights"], earnings["totals"]["arrivals"]), (4, 1))
+        self.assertEqual(analytics.rebuild(), 1)
+        self.assertEqual(analytics.get_earnings("host@example.com", *june)["totals"]["revenue"], 320)
+        print("✓ Revenue, occupancy and ADR match the confirmed nights")
+
+    def test_rebuild_then_cancel_legacy_booking(self):
+        """Test that a legacy booking counted by a rebuild leaves the rollups when cancelled"""
+        print("\n=== Testing Rebuild Then Cancel ===")
+        analytics = HostAnalyticsService()
+        june = (datetime(2030, 6, 1), datetime(2030, 7, 1))
+        booking_id, _ = self.service.create_booking(
+            "guest@example.com", self.property_id, "2030-06-10", "2030-06-12", 1, hold_minutes=None
+        )
+        # A booking written before bookings carried their host
+        get_repository(BOOKING).update_one({"booking_id": booking_id}, {"$unset": {"host_id": ""}})
+        self.assertEqual(analytics.rebuild(), 1)
+        self.assertEqual(analytics.get_earnings("host@example.com", *june)["totals"]["revenue"], 160)
+
+        self.assertTrue(self.service.cancel_booking(booking_id)[0])
+        self.assertEqual(analytics.get_earnings("host@example.com", *june)["totals"]["revenue"], 0)
+        print("✓ Cancelled legacy booking removed from the rollups")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,16 +2,28 @@
 import unittest
 from property.property_factory import PropertyFactory
 from property.property_service import PropertyService
-from database.mongodb import properties_collection
+from database.mongodb import PROPERTIES
+from database.repository import configure_backend, get_repository
+from database.indexes import ensure_indexes
+from database.cache import LRUTTLCache
+from property.property_search import PropertySearch
+from property.property_importer import read_rows
+from property.pricing import PricingService, quote_prices
+import tempfile
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Runs against the in-memory backend; set TEST_DATA_BACKEND=mongo to use MONGODB_URI
+TEST_DATA_BACKEND = os.getenv("TEST_DATA_BACKEND", "memory")
+
 class TestPropertyFunctionality(unittest.TestCase):
     def setUp(self):
         print("\n=== Setting up test environment ===")
+        configure_backend(TEST_DATA_BACKEND)
+        ensure_indexes()
         # Clean up test data from previous runs
-        deleted = properties_collection.delete_many({"title": {"$regex": "^Test"}})
+        deleted = get_repository(PROPERTIES).delete_many({"title": {"$regex": "^Test"}})
         print(f"Cleaned up {deleted.deleted_count} test properties from previous runs")
         
         # Sample property data
@@ -171,9 +183,250 @@ class TestPropertyFunctionality(unittest.TestCase):
         service.delete_property(villa_id)
         print("✓ All test properties deleted")
     
+    def test_list_properties_pagination(self):
+        """Test keyset pagination and streaming"""
+        print("\n=== Testing Property Pagination ===")
+        service = PropertyService.get_instance()
+        for price in (120, 80, 200, 80, 150):
+            service.create_property("test@example.com", "apartment", dict(self.apartment_data, price=price))
+        
+        pages = []
+        cursor = None
+        while True:
+            page, cursor = service.list_properties_page({"host_id": "test@example.com"},
+                                                        limit=2, sort="price", cursor=cursor)
+            pages.append([prop["price"] for prop in page])
+            if cursor is None:
+                break
+        self.assertEqual(pages, [[80, 80], [120, 150], [200]])
+        print(f"✓ Pages by price: {pages}")
+        
+        streamed = [prop["price"] for prop in service.iter_properties(batch_size=2, sort="-price")]
+        self.assertEqual(streamed, [200, 150, 120, 80, 80])
+        print(f"✓ Streamed by price descending: {streamed}")
+    
+    def test_property_summaries_and_count(self):
+        """Test the projected summary view and counts"""
+        print("\n=== Testing Property Summaries ===")
+        service = PropertyService.get_instance()
+        service.create_property("test@example.com", "villa", dict(self.villa_data, images=["a.jpg"]))
+        service.create_property("test@example.com", "house", self.house_data)
+        
+        summaries, cursor = service.list_property_summaries({"host_id": "test@example.com"}, sort="price")
+        self.assertIsNone(cursor)
+        self.assertEqual([summary.type for summary in summaries], ["house", "villa"])
+        self.assertTrue(summaries[1].has_pool)
+        self.assertIsNone(summaries[1].floors)
+        self.assertFalse(hasattr(summaries[1], "images"))
+        print(f"✓ Summaries: {summaries}")
+        
+        self.assertEqual(service.count_properties({"host_id": "test@example.com"}), 2)
+        self.assertEqual(service.count_properties({"type": "villa"}), 1)
+        print("✓ Counts match")
+    
+    def test_property_cache(self):
+        """Test the read-through property cache and its invalidation"""
+        print("\n=== Testing Property Cache ===")
+        service = PropertyService(cache=LRUTTLCache(max_size=2, ttl=60))
+        property_id, _ = service.create_property("test@example.com", "apartment", self.apartment_data)
+        
+        first, _ = service.get_property(property_id)
+        second, _ = service.get_property(property_id)
+        self.assertIs(first, second)
+        self.assertEqual((service.cache_stats()["hits"], service.cache_stats()["misses"]), (1, 1))
+        
+        service.update_property(property_id, {"price": 130})
+        updated, _ = service.get_property(property_id)
+        self.assertEqual(updated.get_details()["price"], 130)
+        self.assertEqual(first.get_details()["price"], 100)
+        
+        service.delete_property(property_id)
+        deleted, _ = service.get_property(property_id)
+        self.assertIsNone(deleted)
+        print(f"✓ Cache stats: {service.cache_stats()}")
+    
+    def test_update_version_conflict(self):
+        """Test partial updates and detection of concurrent edits"""
+        print("\n=== Testing Optimistic Concurrency ===")
+        service = PropertyService()
+        property_id, _ = service.create_property("test@example.com", "apartment", self.apartment_data)
+
+        # Two editors load version 0; the first save wins
+        success, _ = service.update_property(property_id, {"price": 140}, expected_version=0)
+        self.assertTrue(success)
+        success, message = service.update_property(property_id, {"title": "Stale Edit"}, expected_version=0)
+        self.assertFalse(success)
+        print(f"✓ Stale edit rejected: {message}")
+
+        property_obj, _ = service.get_property(property_id)
+        self.assertEqual(property_obj.get_version(), 1)
+        self.assertEqual(property_obj.get_details()["title"], "Test Apartment")
+
+        # Unchanged values are not written and fields of other types are refused
+        success, message = service.update_property(property_id, {"price": 140}, expected_version=1)
+        self.assertEqual((success, message), (False, "No changes made to property."))
+        success, _ = service.update_property(property_id, {"has_pool": True})
+        self.assertFalse(success)
+        success, _ = service.update_property(property_id, {"has_elevator": False}, expected_version=1)
+        self.assertTrue(success)
+
+        # Without a version or a cached copy, the stored listing decides what changed
+        for _ in range(2):
+            success, message = PropertyService().update_property(property_id, {"price": 140})
+            self.assertEqual((success, message), (False, "No changes made to property."))
+        self.assertEqual(PropertyService().get_property(property_id)[0].get_version(), 2)
+
+        # Updated values are validated like new listings
+        success, message = service.update_property(property_id, {"price": -5, "title": ""})
+        self.assertEqual((success, message), (False, "Price must be a positive number."))
+        self.assertEqual(service.update_property(property_id, {"floor_number": "3"})[1],
+                         "Floor number must be a whole number.")
+        self.assertEqual(PropertyService().get_property(property_id)[0].get_details()["price"], 140)
+        print("✓ Version checks and partial updates work")
+
+    def test_host_scoped_mutations(self):
+        """Test that hosts can only edit and delete their own listings"""
+        print("\n=== Testing Ownership-Scoped Mutations ===")
+        service = PropertyService()
+        property_id, _ = service.create_property("test@example.com", "apartment", self.apartment_data)
+
+        success, message = service.update_property_for_host("other@example.com", property_id, {"price": 90})
+        self.assertFalse(success)
+        self.assertIn("permission", message)
+        success, message = service.delete_property_for_host("other@example.com", property_id)
+        self.assertFalse(success)
+        self.assertIn("permission", message)
+        print(f"✓ Other host refused: {message}")
+
+        success, _ = service.update_property_for_host("test@example.com", property_id, {"price": 90})
+        self.assertTrue(success)
+        self.assertEqual(service.get_property(property_id)[0].get_details()["price"], 90)
+        success, _ = service.delete_property_for_host("test@example.com", property_id)
+        self.assertTrue(success)
+        success, message = service.delete_property_for_host("test@example.com", property_id)
+        self.assertEqual(message, "Property not found or could not be deleted.")
+        print("✓ Owner can update and delete")
+
+    def test_cache_eviction_and_expiry(self):
+        """Test LRU eviction and TTL expiry counters"""
+        now = [0.0]
+        cache = LRUTTLCache(max_size=2, ttl=10, clock=lambda: now[0])
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        now[0] = 11.0
+        self.assertIsNone(cache.get("c"))
+        stats = cache.stats()
+        self.assertEqual((stats["evictions"], stats["expirations"]), (1, 1))
+    
+    def test_search_properties_with_facets(self):
+        """Test typed search and facet counts"""
+        print("\n=== Testing Faceted Search ===")
+        service = PropertyService.get_instance()
+        service.create_property("test@example.com", "apartment", self.apartment_data)
+        service.create_property("test@example.com", "house", self.house_data)
+        service.create_property("test@example.com", "villa", self.villa_data)
+        service.create_property("test@example.com", "villa", dict(self.villa_data, title="Test Villa 2",
+                                                                  price=1500, has_pool=False))
+        
+        results, _, facets = service.search_properties(PropertySearch(amenities=["WiFi", "Kitchen"]))
+        self.assertEqual([r.price for r in results], [100, 150, 300, 1500])
+        self.assertEqual(facets["total"], 4)
+        self.assertEqual(facets["types"], {"villa": 2, "apartment": 1, "house": 1})
+        self.assertEqual(facets["amenities"]["Pool"], 2)
+        self.assertEqual(facets["prices"], {"100-200": 2, "200-500": 1, "1000+": 1})
+        print(f"✓ Facets: {facets}")
+        
+        results, _, facets = service.search_properties(PropertySearch(price_min=120, has_pool=True))
+        self.assertEqual([r.title for r in results], ["Test Villa"])
+        self.assertEqual(facets["total"], 1)
+        
+        results, _, _ = service.search_properties(PropertySearch(location_prefix="Los", price_max=200))
+        self.assertEqual([r.title for r in results], ["Test House"])
+        print("✓ Filters on price, flags and location prefix")
+    
+    def test_text_search_ranking(self):
+        """Test relevance-ranked full-text search"""
+        print("\n=== Testing Text Search ===")
+        service = PropertyService.get_instance()
+        service.create_property("test@example.com", "villa", dict(self.villa_data, title="Test Beach Villa"))
+        service.create_property("test@example.com", "house", dict(self.house_data, amenities=["Pool"]))
+        service.create_property("test@example.com", "apartment", dict(self.apartment_data, location="Pool Street"))
+        service.create_property("test@example.com", "apartment", self.apartment_data)
+        
+        results, cursor, facets = service.text_search_properties("beach villa pools", limit=2)
+        self.assertEqual([r.title for r in results], ["Test Beach Villa", "Test House"])
+        self.assertEqual(facets["total"], 3)
+        results, cursor, _ = service.text_search_properties("beach villa pools", limit=2, cursor=cursor)
+        self.assertEqual([r.location for r in results], ["Pool Street"])
+        self.assertIsNone(cursor)
+        print("✓ Title matches rank above amenity and location matches")
+        
+        results, _, _ = service.text_search_properties("pool", PropertySearch(property_type="house"))
+        self.assertEqual([r.title for r in results], ["Test House"])
+        print("✓ Text search combines with typed filters")
+    
+    def test_bulk_import(self):
+        """Test the batched bulk import and its per-row errors"""
+        print("\n=== Testing Bulk Import ===")
+        service = PropertyService.get_instance()
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write("type,title,location,price,floor_number,has_elevator,has_pool,amenities\n")
+            f.write("apartment,Test Loft,Berlin,90,3,yes,,WiFi;Kitchen\n")
+            f.write("villa,Test Cliff Villa,Santorini,450,,,true,Pool;Sea View\n")
+            f.write("castle,Test Castle,Edinburgh,900,,,,\n")
+            f.write("house,Test Cabin,Oslo,cheap,,,,\n")
+            f.write("house,,Oslo,120,,,,\n")
+            f.write("apartment,Test Attic,Berlin,80,top,,,\n")
+            f.write("apartment,Test Basement,Berlin,70,,,,\n")
+            f.write("villa,Test Maybe Villa,Nice,300,,,maybe,\n")
+            path = f.name
+        try:
+            report = service.create_properties_bulk("partner@example.com", read_rows(path), chunk_size=1)
+        finally:
+            os.remove(path)
+        
+        self.assertEqual(report["inserted"], 2)
+        self.assertEqual([row for row, _ in report["errors"]], [3, 4, 5, 6, 7, 8])
+        self.assertEqual(report["errors"][3][1], "Floor number must be a whole number.")
+        self.assertEqual(report["errors"][5][1], "Has pool must be true or false.")
+        print(f"✓ Report: {report}")
+        loft = service.list_properties({"title": "Test Loft"})[0]
+        self.assertEqual((loft["floor_number"], loft["has_elevator"], loft["amenities"]), (3, True, ["WiFi", "Kitchen"]))
+        self.assertEqual(loft["host_id"], "partner@example.com")
+    
+    def test_pricing_quotes(self):
+        """Test weekend, seasonal and length-of-stay pricing over a batch of listings"""
+        print("\n=== Testing Pricing Quotes ===")
+        rules = {
+            "weekend_multiplier": 1.5,
+            "seasons": [{"start_date": "2030-06-09", "end_date": "2030-06-11", "multiplier": 2}],
+            "length_of_stay": [{"min_nights": 3, "discount": 0.1}, {"min_nights": 30, "discount": 0.3}],
+        }
+        overlapping = {"seasons": [
+            {"start_date": "2030-06-01", "end_date": "2030-07-01", "multiplier": 1.2},
+            {"start_date": "2030-06-08", "end_date": "2030-06-09", "multiplier": 0.5},
+        ]}
+        # Thursday June 6 to Monday June 10
+        prices = quote_prices([100, 80, 50], [rules, None, overlapping], "2030-06-06", "2030-06-10")
+        self.assertEqual(prices.tolist(), [[90, 135, 135, 180], [80, 80, 80, 80], [60, 60, 30, 60]])
+        
+        service = PropertyService.get_instance()
+        pricing_service = PricingService()
+        apartment_id, _ = service.create_property("test@example.com", "apartment", self.apartment_data)
+        house_id, _ = service.create_property("test@example.com", "house", self.house_data)
+        self.assertEqual(pricing_service.set_rules(apartment_id, {"weekend_multiplier": -1})[0], False)
+        self.assertTrue(pricing_service.set_rules(apartment_id, rules)[0])
+        totals = pricing_service.quote_many({apartment_id: 100, house_id: 80}, "2030-06-06", "2030-06-10")
+        self.assertEqual(totals, {apartment_id: 540, house_id: 320})
+        print(f"✓ Quotes: {totals}")
+    
     def tearDown(self):
         # Clean up test data
-        deleted = properties_collection.delete_many({"title": {"$regex": "^Test"}})
+        deleted = get_repository(PROPERTIES).delete_many({"title": {"$regex": "^Test"}})
         print(f"\n=== Tear down: Removed {deleted.deleted_count} test properties ===")
 
 if __name__ == "__main__":
@@ -0,0 +1,85 @@
+# tests/test_reports.py
+import os
+import unittest
+from auth.auth_service import AuthService
+from auth.user_factory import UserFactory
+from datetime import datetime, timedelta
+from booking.booking_service import BookingService
+from database.indexes import ensure_indexes
+from database.mongodb import USERS
+from database.repository import configure_backend, get_repository
+from property.property_service import PropertyService
+from reports.report_service import ReportService, REPORT_SETTLE_SECONDS
+
+
+class TestReportService(unittest.TestCase):
+    def setUp(self):
+        """Set up a fresh backend with a guest, two listings and some bookings"""
+        configure_backend(os.getenv("TEST_DATA_BACKEND", "memory"))
+        ensure_indexes()
+        AuthService().register_user(UserFactory.create_user("guest", "Test Guest", "guest@example.com", "secret"))
+        self.property_service = PropertyService()
+        PropertyService._instance = self.property_service
+        self.villa_id, _ = self.property_service.create_property("host@example.com", "villa", {
+            "title": "Test Villa", "location": "Nice", "price": 200, "has_pool": True, "has_private_access": True
+        })
+        self.house_id, _ = self.property_service.create_property("host@example.com", "house", {
+            "title": "Test House", "location": "Nice", "price": 100, "floors": 1, "has_garden": False
+        })
+        self.booking_service = BookingService()
+        self.service = ReportService()
+
+    def tearDown(self):
+        PropertyService._instance = None
+
+    def later(self):
+        """A refresh time whose settle window ends now, covering everything written so far"""
+        return datetime.now() + timedelta(seconds=REPORT_SETTLE_SECONDS)
+
+    def test_incremental_refresh(self):
+        """Test that refreshes only add what happened since the last one"""
+        print("\n=== Testing Incremental Report Refresh ===")
+        villa_booking, _ = self.booking_service.create_booking(
+            "guest@example.com", self.villa_id, "2030-03-01", "2030-03-03", 2, hold_minutes=None
+        )
+        self.booking_service.create_booking("guest@example.com", self.house_id, "2030-03-01", "2030-03-05", 1)
+        self.assertEqual(self.service.refresh(self.later()),
+                         {"users": 1, "listings": 2, "bookings": 2, "confirmations": 1, "cancellations": 0})
+
+        self.booking_service.cancel_booking(villa_booking)
+        added = self.service.refresh(self.later())
+        self.assertEqual((added["bookings"], added["cancellations"]), (0, 1))
+
+        report = self.service.get_report(refresh=False)
+        totals = report["totals"]
+        self.assertEqual((totals["new_users"], totals["new_listings"], totals["bookings"]), (1, 2, 2))
+        self.assertEqual((totals["revenue"], totals["cancelled_revenue"]), (400, 400))
+        # The house booking is still an unpaid hold, so only the villa counts in the rate
+        self.assertEqual((totals["confirmed"], totals["confirmed_cancellations"]), (1, 1))
+        self.assertEqual(totals["cancellation_rate"], 1.0)
+        self.assertEqual(report["property_types"]["villa"]["cancellations"], 1)
+        self.assertEqual(report["property_types"]["house"]["bookings"], 1)
+        self.assertEqual(sum(row["bookings"] for row in report["daily"]), 2)
+        print("✓ Counters follow new users, bookings and cancellations")
+
+    def test_rebuild_counts_legacy_documents(self):
+        """Test that a rebuild matches the refreshes and picks up documents without timestamps"""
+        print("\n=== Testing Report Rebuild ===")
+        self.booking_service.create_booking(
+            "guest@example.com", self.house_id, "2030-04-01", "2030-04-02", 1, hold_minutes=None
+        )
+        self.service.refresh(self.later())
+        refreshed = self.service.get_report(refresh=False)
+
+        self.assertEqual(self.service.rebuild(self.later())["bookings"], 1)
+        self.assertEqual(self.service.get_report(refresh=False), refreshed)
+
+        get_repository(USERS).insert_one({"name": "Old User", "email": "old@example.com", "user_type": "guest"})
+        self.assertEqual(self.service.refresh(self.later())["users"], 0)
+        self.assertEqual(self.service.rebuild(self.later())["users"], 2)
+        self.assertEqual(self.service.get_report(refresh=False)["totals"]["new_users"], 2)
+        print("✓ Rebuild reproduces the reports and counts legacy documents")
+
+
+if __name__ == "__main__":
+    unittest.main()
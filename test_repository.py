@@ -0,0 +1,90 @@
+# tests/test_repository.py
+import unittest
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+from database.memory_repository import InMemoryBackend
+
+
+class TestInMemoryRepository(unittest.TestCase):
+    def setUp(self):
+        self.backend = InMemoryBackend()
+        self.repository = self.backend.get_repository("properties")
+        self.repository.create_index([("host_id", 1)], name="host_id")
+        self.repository.insert_many([
+            {"_id": "a", "host_id": "h1", "title": "Test Apartment", "price": 100,
+             "type": "apartment", "amenities": ["WiFi", "AC"]},
+            {"_id": "b", "host_id": "h1", "title": "Test House", "price": 150,
+             "type": "house", "amenities": ["WiFi", "Garden"]},
+            {"_id": "c", "host_id": "h2", "title": "Beach Villa", "price": 300,
+             "type": "villa", "amenities": ["Pool"]},
+        ])
+
+    def test_filters(self):
+        """Test the supported query operators"""
+        find_ids = lambda f: sorted(d["_id"] for d in self.repository.find(f))
+        self.assertEqual(find_ids({"host_id": "h1"}), ["a", "b"])
+        self.assertEqual(find_ids({"price": {"$gte": 150}}), ["b", "c"])
+        self.assertEqual(find_ids({"type": {"$in": ["villa", "house"]}}), ["b", "c"])
+        self.assertEqual(find_ids({"title": {"$regex": "^Test"}}), ["a", "b"])
+        self.assertEqual(find_ids({"amenities": "WiFi"}), ["a", "b"])
+        self.assertEqual(find_ids({"amenities": {"$all": ["WiFi", "AC"]}}), ["a"])
+        self.assertEqual(find_ids({"$or": [{"price": {"$lt": 120}}, {"host_id": "h2"}]}), ["a", "c"])
+        self.assertEqual(find_ids({"missing": {"$exists": False}, "host_id": {"$ne": "h1"}}), ["c"])
+        self.assertEqual(self.repository.count_documents({"host_id": "h1"}), 2)
+
+    def test_sort_limit_projection(self):
+        """Test find options"""
+        docs = self.repository.find({}, {"title": 1}, sort=[("price", -1)], limit=2)
+        self.assertEqual(docs, [{"_id": "c", "title": "Beach Villa"}, {"_id": "b", "title": "Test House"}])
+
+    def test_updates(self):
+        """Test update operators and upserts"""
+        result = self.repository.update_one({"_id": "a"}, {"$set": {"price": 110}, "$inc": {"version": 1}})
+        self.assertEqual(result.modified_count, 1)
+        self.assertEqual(self.repository.find_one({"_id": "a"})["version"], 1)
+        self.repository.update_many({"host_id": "h1"}, {"$push": {"amenities": "TV"}})
+        self.assertEqual(self.repository.count_documents({"amenities": "TV"}), 2)
+        result = self.repository.update_one({"_id": "d"}, {"$set": {"host_id": "h3"}}, upsert=True)
+        self.assertEqual(result.upserted_id, "d")
+        self.assertEqual(self.repository.count_documents({"host_id": "h3"}), 1)
+
+    def test_unique_index(self):
+        """Test unique constraints raise the pymongo errors"""
+        self.repository.create_index([("title", 1)], name="title_unique", unique=True)
+        with self.assertRaises(DuplicateKeyError):
+            self.repository.insert_one({"title": "Beach Villa"})
+        with self.assertRaises(BulkWriteError) as context:
+            self.repository.insert_many([{"title": "New"}, {"title": "Test House"}, {"title": "Other"}],
+                                        ordered=False)
+        self.assertEqual(context.exception.details["nInserted"], 2)
+        self.assertEqual(context.exception.details["writeErrors"][0]["index"], 1)
+
+    def test_transaction_rollback(self):
+        """Test that a failed transaction undoes its writes"""
+        with self.assertRaises(DuplicateKeyError):
+            with self.backend.transaction():
+                self.repository.insert_one({"_id": "d", "host_id": "h3"})
+                self.repository.update_one({"_id": "a"}, {"$set": {"price": 1}})
+                self.repository.delete_one({"_id": "b"})
+                self.repository.insert_one({"_id": "c"})
+        self.assertEqual(sorted(d["_id"] for d in self.repository.find({})), ["a", "b", "c"])
+        self.assertEqual(self.repository.find_one({"_id": "a"})["price"], 100)
+        self.assertEqual(self.repository.count_documents({"host_id": "h1"}), 2)
+
+        with self.backend.transaction():
+            self.repository.insert_one({"_id": "d", "host_id": "h3"})
+        self.assertEqual(self.repository.count_documents({"host_id": "h3"}), 1)
+
+    def test_aggregate(self):
+        """Test grouping in the aggregation pipeline"""
+        results = self.repository.aggregate([
+            {"$match": {"host_id": "h1"}},
+            {"$unwind": "$amenities"},
+            {"$group": {"_id": "$amenities", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+        ])
+        self.assertEqual(results[0], {"_id": "WiFi", "count": 2})
+        self.assertEqual(len(results), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
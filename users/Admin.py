@@ -4,6 +4,7 @@ from users.User import User
 from users.user_type import UserType
 # from database.mongodb import users_collection
 from property.property_service import PropertyService
+from reports.report_service import ReportService
 
 class Admin(User):
     def __init__(self, name, email, password, user_type: UserType):
@@ -12,8 +13,23 @@ class Admin(User):
     def manage_users(self):
         return f"{self.getName()} is managing user accounts."
 
-    def view_reports(self):
-        return f"{self.getName()} is viewing business reports."
+    def view_reports(self, days=7):
+        """Summarize the pre-aggregated business reports"""
+        report = ReportService.get_instance().get_report(days)
+        totals = report["totals"]
+        lines = [
+            f"Users: {totals['new_users']}, listings: {totals['new_listings']}, "
+            f"bookings: {totals['bookings']}, revenue: ${totals['revenue'] - totals['cancelled_revenue']:.2f}, "
+            f"cancellation rate: {totals['cancellation_rate']:.0%}"
+        ]
+        for property_type, row in report["property_types"].items():
+            lines.append(f"- {property_type}: {row['bookings']} bookings, "
+                         f"${row['revenue'] - row['cancelled_revenue']:.2f} revenue")
+        lines.append(f"Last {days} days:")
+        for row in report["daily"]:
+            lines.append(f"- {row['day']:%Y-%m-%d}: {row['bookings']} bookings, "
+                         f"{row['cancellations']} cancelled, {row['new_users']} new users")
+        return "\n".join(lines)
 
     def delete_account(self, user):
         return f"{self.getName()} deleted {user}'s account."
@@ -21,12 +37,12 @@ class Admin(User):
     def browse_listings(self, filters=None):
         """Browse property listings"""
         property_service = PropertyService.get_instance()
-        properties = property_service.list_properties(filters)
+        count = property_service.count_properties(filters)
         
-        if not properties:
+        if not count:
             return "No properties found."
             
-        return f"Found {len(properties)} properties as admin."
+        return f"Found {count} properties as admin."
 
         
     
\ No newline at end of file
@@ -13,9 +13,9 @@ class Guest(User):
     def browse_listings(self, filters=None):
         """Browse property listings"""
         property_service = PropertyService.get_instance()
-        properties = property_service.list_properties(filters)
+        count = property_service.count_properties(filters)
         
-        if not properties:
+        if not count:
             return "No properties found."
             
-        return f"Found {len(properties)} properties for browsing."
\ No newline at end of file
+        return f"Found {count} properties for browsing."
\ No newline at end of file
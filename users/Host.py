@@ -2,6 +2,7 @@
 from users.User import User
 from users.user_type import UserType
 from property.property_service import PropertyService
+from booking.host_analytics import HostAnalyticsService
 
 class Host(User):
     def __init__(self, name, email, password, user_type: UserType):
@@ -27,30 +28,54 @@ class Host(User):
             return f"Property listing '{property_details.get('title')}' created successfully."
         return f"Failed to create property: {message}"
 
-    def manage_bookings(self):
-        return f"{self.getName()} is managing bookings."
+    def manage_bookings(self, limit=10):
+        """Summarize the next stays at this host's listings"""
+        stays = HostAnalyticsService.get_instance().get_upcoming_stays(self.getEmail(), limit)
+        if not stays:
+            return "No upcoming stays."
+        lines = [f"{len(stays)} upcoming stays:"]
+        for stay in stays:
+            lines.append(
+                f"- {stay['check_in']:%Y-%m-%d} to {stay['check_out']:%Y-%m-%d}, "
+                f"{stay['guests']} guests, ${stay['total_price']:.2f} ({stay['status']})"
+            )
+        return "\n".join(lines)
 
-    def view_earnings(self):
-        return f"{self.getName()} is viewing earnings."
+    def view_earnings(self, start=None, end=None):
+        """Summarize revenue, occupancy and ADR, by default for the current month"""
+        earnings = HostAnalyticsService.get_instance().get_earnings(self.getEmail(), start, end)
+        totals = earnings["totals"]
+        lines = [
+            f"Revenue: ${totals['revenue']:.2f}, occupancy: {totals['occupancy']:.0%}, "
+            f"ADR: ${totals['adr']:.2f}, arrivals: {totals['arrivals']}"
+        ]
+        for metrics in earnings["by_property"].values():
+            lines.append(
+                f"- {metrics['title']}: ${metrics['revenue']:.2f}, "
+                f"{metrics['occupancy']:.0%} occupied, ADR ${metrics['adr']:.2f}"
+            )
+        return "\n".join(lines)
 
     def browse_listings(self, filters=None):
         """Browse property listings"""
         property_service = PropertyService.get_instance()
-        properties = property_service.list_properties(filters)
+        count = property_service.count_properties(filters)
         
-        if not properties:
+        if not count:
             return "No properties found."
             
-        return f"Found {len(properties)} properties."
+        return f"Found {count} properties."
         
     def delete_listing(self, property_id):
         """Delete a property listing"""
         property_service = PropertyService.get_instance()
-        host_properties = property_service.get_host_properties(self.getEmail())
-        
-        # Check if property belongs to this host
-        if not any(prop["property_id"] == property_id for prop in host_properties):
-            return "You don't have permission to delete this property."
-            
-        success, message = property_service.delete_property(property_id)
-        return message
\ No newline at end of file
+        success, message = property_service.delete_property_for_host(self.getEmail(), property_id)
+        return message
+    
+    def update_listing(self, property_id, details, expected_version=None):
+        """Update a property listing"""
+        property_service = PropertyService.get_instance()
+        success, message = property_service.update_property_for_host(
+            self.getEmail(), property_id, details, expected_version
+        )
+        return message
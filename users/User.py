@@ -1,6 +1,5 @@
 # users/User.py 
 from users.user_type import UserType
-from database.mongodb import users_collection
 class User:
     
     def __init__(self,name,email,password,user_type:UserType):
@@ -22,6 +21,8 @@ class User:
         return self.__userType.value
     def getId(self):
         return self._id
+    def setId(self, user_id):
+        self._id = user_id
     def showRooms(self):
         return "Showing rooms"
     def browse_listings(self):